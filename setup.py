@@ -26,8 +26,12 @@ setup(
                       'unicodecsv',
                       'tzlocal',
                       'PyYAML',
-                      'six'
+                      'six',
+                      'futures; python_version < "3"'
                       ],
+    extras_require={
+        'http2': ['httpx[http2]>=0.26; python_version >= "3.8"'],
+    },
     include_package_data=True,
     scripts=glob('trustar/examples/**/*.py') + glob('trustar/examples/*.py'),
     use_2to3=True
@@ -0,0 +1,338 @@
+"""
+Benchmarks of the SDK's hot paths.  These are not collected by pytest; run them with:
+
+    python -m tests.benchmarks.benchmarks --output results.json
+
+and compare a later run against a stored baseline with:
+
+    python -m tests.benchmarks.benchmarks --baseline results.json --tolerance 0.2
+
+which exits with status 1 if any benchmark is more than 20% slower than in the baseline.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from trustar import (HttpxTransport, Indicator, IndicatorSummary, InMemoryTransport, NumberedPage, Report,
+                     RequestsTransport, TruStar, get_current_time_millis, iter_concurrently, normalize_timestamp)
+from trustar.testing import Http2StandInServer, StandInApi, StandInServer
+from trustar.version import __version__
+
+BENCHMARKS = []
+
+DAY = 24 * 60 * 60 * 1000
+
+
+def benchmark(items):
+    """
+    Registers a benchmark.  The decorated function does any setup and returns the function to time, or a tuple of that
+    function and a teardown function to call once the benchmark is done, e.g. to stop a server; ``items`` is the
+    number of items that function processes per call, used to compute the throughput.  A setup function returns
+    ``None`` to skip the benchmark, e.g. when an optional dependency is missing.
+    """
+
+    def register(setup):
+        BENCHMARKS.append((setup.__name__, setup, items))
+        return setup
+
+    return register
+
+
+def report_dict(i):
+    return {'id': 'report-%d' % i, 'title': 'Report %d' % i, 'reportBody': 'Seen evil-%d.com' % i,
+            'timeBegan': 1500000000000 + i, 'created': 1500000000000 + i, 'updated': 1500000000000 + i,
+            'distributionType': 'ENCLAVE', 'enclaveIds': ['enclave-1'], 'externalTrackingId': 'external-%d' % i}
+
+
+def indicator_dict(i):
+    return {'value': 'evil-%d.com' % i, 'indicatorType': 'URL', 'priorityLevel': 'HIGH', 'correlationCount': i,
+            'whitelisted': False, 'firstSeen': 1500000000000, 'lastSeen': 1500000000000 + i,
+            'tags': [{'name': 'malware', 'guid': 'tag-1', 'enclaveId': 'enclave-1'}], 'enclaveIds': ['enclave-1']}
+
+
+def indicator_summary_dict(i):
+    return {'value': 'evil-%d.com' % i, 'type': 'URL', 'reportId': 'report-%d' % i, 'enclaveId': 'enclave-1',
+            'source': {'key': 'virustotal', 'name': 'VirusTotal'}, 'score': {'name': 'Risk', 'value': '75'},
+            'created': 1500000000000, 'updated': 1500000000000 + i, 'severityLevel': i % 4,
+            'attributes': [{'name': 'Malware Families', 'value': 'Emotet', 'logicalType': 'string'}]}
+
+
+def numbered_page_dict(items):
+    return {'items': items, 'pageNumber': 0, 'pageSize': len(items), 'totalElements': len(items), 'hasNext': False}
+
+
+@benchmark(items=1000)
+def report_from_dict():
+    dicts = [report_dict(i) for i in range(1000)]
+    return lambda: [Report.from_dict(d) for d in dicts]
+
+
+@benchmark(items=1000)
+def report_to_dict():
+    reports = [Report.from_dict(report_dict(i)) for i in range(1000)]
+    return lambda: [report.to_dict() for report in reports]
+
+
+@benchmark(items=1000)
+def indicator_from_dict():
+    dicts = [indicator_dict(i) for i in range(1000)]
+    return lambda: [Indicator.from_dict(d) for d in dicts]
+
+
+@benchmark(items=1000)
+def indicator_to_dict():
+    indicators = [Indicator.from_dict(indicator_dict(i)) for i in range(1000)]
+    return lambda: [indicator.to_dict() for indicator in indicators]
+
+
+@benchmark(items=1000)
+def indicator_summary_from_dict():
+    dicts = [indicator_summary_dict(i) for i in range(1000)]
+    return lambda: [IndicatorSummary.from_dict(d) for d in dicts]
+
+
+@benchmark(items=1000)
+def indicator_summary_to_dict():
+    summaries = [IndicatorSummary.from_dict(indicator_summary_dict(i)) for i in range(1000)]
+    return lambda: [summary.to_dict() for summary in summaries]
+
+
+@benchmark(items=1000)
+def numbered_page_from_dict():
+    page = numbered_page_dict([indicator_dict(i) for i in range(1000)])
+    return lambda: NumberedPage.from_dict(page, content_type=Indicator)
+
+
+@benchmark(items=3000)
+def normalize_timestamps():
+    now = int(time.time())
+    values = [now - i for i in range(1000)] + [(now - i) * 1000 for i in range(1000)] + \
+             ["2017-02-23T23:01:%02d+0000" % (i % 60) for i in range(1000)]
+    return lambda: [normalize_timestamp(value) for value in values]
+
+
+def in_memory_client(api):
+    ts = TruStar(config=api.get_config())
+    ts.set_transport(InMemoryTransport(api))
+    ts.ping()
+    return ts
+
+
+@benchmark(items=10000)
+def time_based_page_generator():
+    # 100 pages of 100 reports, each page requested with a narrower time window than the previous one
+    api = StandInApi(seed=1, reports_page_size=100)
+    api.populate(reports=10000, time_span=DAY)
+    ts = in_memory_client(api)
+    to_time = get_current_time_millis()
+    return lambda: sum(1 for _ in ts.get_reports(from_time=to_time - DAY - 1000, to_time=to_time))
+
+
+@benchmark(items=10000)
+def cursor_page_generator():
+    # 100 pages of 100 phishing indicators
+    api = StandInApi(seed=1, default_page_size=100)
+    api.populate(submissions=10000)
+    ts = in_memory_client(api)
+    scores = [0, 1, 2, 3]
+    return lambda: sum(1 for _ in ts.get_phishing_indicators(normalized_indicator_score=scores,
+                                                             priority_event_score=scores))
+
+
+def served(api, transport=None, server=None):
+    """
+    :return: a |TruStar| object connected to a server of the given API (by default, a |StandInServer|), and the
+        function that stops both
+    """
+
+    if server is None:
+        server = StandInServer(api)
+    server.start()
+    ts = TruStar(config=server.get_config())
+    if transport is not None:
+        ts.set_transport(transport)
+    ts.ping()
+
+    def teardown():
+        ts._client.transport.close()
+        server.stop()
+
+    return ts, teardown
+
+
+@benchmark(items=10000)
+def get_indicators_end_to_end():
+    api = StandInApi(seed=1)
+    api.populate(indicators=10000)
+    ts, teardown = served(api)
+    return lambda: sum(1 for _ in ts.get_indicators(page_size=1000)), teardown
+
+
+@benchmark(items=10000)
+def get_indicators_in_memory():
+    # the same as get_indicators_end_to_end without sockets, to separate the cost of the SDK from that of HTTP
+    api = StandInApi(seed=1)
+    api.populate(indicators=10000)
+    ts = in_memory_client(api)
+    return lambda: sum(1 for _ in ts.get_indicators(page_size=1000))
+
+
+def fan_out(transport, server=None):
+    # 20 pages of 500 indicators fetched by 8 threads, as the SDK's concurrent page fan-out does
+    api = StandInApi(seed=1)
+    api.populate(indicators=10000)
+    ts, teardown = served(api, transport, server(api) if server is not None else None)
+
+    def get_page(page_number):
+        return ts.get_indicators_page(page_number=page_number, page_size=500)
+
+    return lambda: sum(len(page.items) for _, page, _ in iter_concurrently(get_page, range(20), max_workers=8)), \
+        teardown
+
+
+@benchmark(items=10000)
+def fan_out_requests():
+    return fan_out(RequestsTransport())
+
+
+@benchmark(items=10000)
+def fan_out_httpx():
+    # skipped unless the optional http2 dependencies are installed.  Over the HTTP/1.1 stand-in server, this compares
+    # the clients; fan_out_httpx_http2 measures multiplexing.
+    try:
+        return fan_out(HttpxTransport())
+    except ImportError:
+        return None
+
+
+@benchmark(items=10000)
+def fan_out_httpx_http2():
+    # the same requests multiplexed over a single HTTP/2 connection, with TLS.  Skipped unless the optional http2
+    # dependencies and trustme, to issue the certificate of the server, are installed.
+    try:
+        import h2
+        import trustme
+        transport = HttpxTransport()
+    except ImportError:
+        return None
+
+    directory = tempfile.mkdtemp()
+    certfile = os.path.join(directory, 'cert.pem')
+    trustme.CA().issue_cert('127.0.0.1').private_key_and_cert_chain_pem.write_to_path(certfile)
+    func, teardown = fan_out(transport, lambda api: Http2StandInServer(api, certfile=certfile))
+
+    def cleanup():
+        teardown()
+        shutil.rmtree(directory)
+
+    return func, cleanup
+
+
+def run_benchmarks(names=None, repeat=5):
+    """
+    :param names: the names of the benchmarks to run (by default, all of them)
+    :param int repeat: the number of timed calls of each benchmark
+    :return: the results, as a dictionary
+    """
+
+    results = {}
+    for name, setup, items in BENCHMARKS:
+        if names and name not in names:
+            continue
+
+        func = setup()
+        if func is None:
+            print("%-32s skipped" % name)
+            continue
+        teardown = None
+        if isinstance(func, tuple):
+            func, teardown = func
+
+        try:
+            # warm up, e.g. so that connections are established and caches are filled
+            func()
+
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                func()
+                timings.append(time.perf_counter() - start)
+        finally:
+            if teardown is not None:
+                teardown()
+
+        median = statistics.median(timings)
+        results[name] = {
+            'min': min(timings),
+            'median': median,
+            'mean': statistics.mean(timings),
+            'items': items,
+            'itemsPerSecond': items / median if median else None,
+        }
+        print("%-32s %10.2f ms %14.0f items/s" % (name, median * 1000, results[name]['itemsPerSecond'] or 0))
+
+    return {
+        'meta': {
+            'sdkVersion': __version__,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': get_current_time_millis(),
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    :param dict results: the results of a run
+    :param dict baseline: the results of a previous run
+    :param float tolerance: the allowed relative slowdown, e.g. 0.2 for 20%
+    :return: the names of the benchmarks that regressed
+    """
+
+    regressions = []
+    for name, result in sorted(results['results'].items()):
+        previous = baseline['results'].get(name)
+        if previous is None:
+            continue
+        ratio = result['median'] / previous['median']
+        regressed = ratio > 1 + tolerance
+        if regressed:
+            regressions.append(name)
+        print("%-32s %6.2fx baseline%s" % (name, ratio, "  REGRESSION" if regressed else ""))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the hot paths of the TruSTAR SDK.")
+    parser.add_argument('names', nargs='*', help="The benchmarks to run (by default, all of them).")
+    parser.add_argument('--repeat', type=int, default=5, help="The number of timed calls of each benchmark.")
+    parser.add_argument('--output', help="The path of a JSON file to write the results to.")
+    parser.add_argument('--baseline', help="The path of the JSON results of a previous run to compare against.")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="The allowed relative slowdown compared to the baseline.")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.names, repeat=args.repeat)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
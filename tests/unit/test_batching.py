@@ -0,0 +1,81 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from tests.conftest import BASE_URL
+from trustar import MicroBatcher
+
+
+def test_lookups_are_merged_into_batches():
+    batches = []
+
+    def batch_func(keys):
+        batches.append(keys)
+        return dict((key, key * 2) for key in keys if key != 3)
+
+    batcher = MicroBatcher(batch_func, max_batch_size=4, max_delay=0.05)
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        results = list(executor.map(batcher.load, [1, 2, 3, 1, 2, 5, 6, 7]))
+
+    assert results == [2, 4, None, 2, 4, 10, 12, 14]
+    assert sorted(key for batch in batches for key in batch) == [1, 2, 3, 5, 6, 7]
+    assert all(len(batch) <= 4 for batch in batches)
+    assert batcher.loads == 8 and batcher.batches == len(batches) < 8
+
+
+def test_batch_errors_reach_every_caller():
+    def batch_func(keys):
+        raise IOError("down")
+
+    batcher = MicroBatcher(batch_func, max_delay=0.01)
+    futures = [batcher.submit(key) for key in "ab"]
+    batcher.flush()
+    for future in futures:
+        with pytest.raises(IOError):
+            future.result()
+
+
+def test_invalid_batch_results_reach_every_caller():
+    batcher = MicroBatcher(lambda keys: None, max_delay=0.01)
+    futures = [batcher.submit(key) for key in "ab"]
+    batcher.flush()
+    for future in futures:
+        with pytest.raises(AttributeError):
+            future.result(timeout=1)
+
+
+def test_load_async():
+    batcher = MicroBatcher(lambda keys: dict((key, key.upper()) for key in keys), max_delay=0.01)
+
+    async def main():
+        return await asyncio.gather(*[batcher.load_async(key) for key in ["a", "b", "c"]])
+
+    assert asyncio.run(main()) == ["A", "B", "C"]
+    assert batcher.batches == 1
+
+
+def test_indicator_batchers(mocked_request, trustar):
+    details = mocked_request.get(f"{BASE_URL}/indicators/details",
+                                 json=[{"value": "evil.com", "indicatorType": "URL"}])
+    metadata = mocked_request.post(f"{BASE_URL}/indicators/metadata",
+                                   json=[{"value": "1.2.3.4", "indicatorType": "IP", "correlationCount": 3}])
+
+    batcher = trustar.get_indicator_details_batcher(max_delay=0.05)
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        results = list(executor.map(batcher.load, ["evil.com", "good.com", "evil.com"]))
+    assert [indicator and indicator.type for indicator in results] == ["URL", None, "URL"]
+    assert details.call_count == 1
+    assert sorted(details.last_request.qs["indicatorvalues"]) == ["evil.com", "good.com"]
+
+    batcher = trustar.get_indicator_metadata_batcher(max_delay=0.01)
+    assert batcher.load_many(["1.2.3.4", "5.6.7.8"])[0].correlation_count == 3
+    assert [item["value"] for item in json.loads(metadata.last_request.text)] == ["1.2.3.4", "5.6.7.8"]
+
+
+def test_indicator_batchers_key_results_by_requested_value(mocked_request, trustar):
+    mocked_request.get(f"{BASE_URL}/indicators/details", json=[{"value": "evil.com", "indicatorType": "URL"}])
+    batcher = trustar.get_indicator_details_batcher(max_delay=0.01)
+    assert [indicator and indicator.value for indicator in batcher.load_many(["Evil.com.", "good.com"])] \
+        == ["evil.com", None]
@@ -0,0 +1,111 @@
+import time
+
+import pytest
+from requests.exceptions import ConnectionError
+
+from tests.conftest import BASE_URL
+from trustar import CircuitBreaker, CircuitOpenError, Transport
+
+
+def test_circuit_opens_and_fails_fast(mocked_request, trustar):
+    breaker = CircuitBreaker(failure_threshold=0.5, minimum_requests=4, open_duration=60)
+    changes = []
+    breaker.add_listener(lambda template, old, new: changes.append((template, old, new)))
+    trustar.set_circuit_breaker(breaker)
+    trustar.get_metrics().enabled = True
+
+    matcher = mocked_request.get(f"{BASE_URL}/reports/abc", status_code=503, json={"message": "down"})
+    mocked_request.get(f"{BASE_URL}/reports/def", json={"id": "def"})
+    mocked_request.get(f"{BASE_URL}/ping", text="pong")
+
+    for _ in range(4):
+        with pytest.raises(Exception):
+            trustar.get_report_details("abc")
+    assert breaker.get_state("reports/{id}") == CircuitBreaker.OPEN
+    assert changes == [("reports/{id}", CircuitBreaker.CLOSED, CircuitBreaker.OPEN)]
+
+    # fails without a request, for every report, but not for other endpoints
+    with pytest.raises(CircuitOpenError) as e:
+        trustar.get_report_details("def")
+    assert isinstance(e.value, ConnectionError) and e.value.template == "reports/{id}"
+    assert matcher.call_count == 4
+    assert trustar.ping() == "pong"
+
+    snapshot = trustar.get_metrics().snapshot()
+    assert snapshot["circuitStateChanges"] == {"reports/{id} open": 1}
+    assert 'trustar_sdk_circuit_state_changes_total{path="reports/{id}",state="open"} 1' \
+           in trustar.get_metrics().to_prometheus()
+
+
+def test_half_open_probe():
+    breaker = CircuitBreaker(minimum_requests=2, open_duration=0.05, half_open_probes=1)
+    for _ in range(2):
+        breaker.before_request("ping")
+        breaker.record("ping", False)
+    assert breaker.get_state("ping") == CircuitBreaker.OPEN
+
+    time.sleep(0.06)
+    breaker.before_request("ping")
+    assert breaker.get_state("ping") == CircuitBreaker.HALF_OPEN
+    # only one probe at a time
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request("ping")
+
+    # a failed probe opens the circuit again
+    breaker.record("ping", False)
+    assert breaker.get_state("ping") == CircuitBreaker.OPEN
+
+    time.sleep(0.06)
+    breaker.before_request("ping")
+    breaker.record("ping", True)
+    assert breaker.get_states() == {"ping": CircuitBreaker.CLOSED}
+
+
+def test_slow_calls_count_as_failures():
+    breaker = CircuitBreaker(minimum_requests=3, failure_threshold=1.0, slow_call_threshold=0.5)
+    for latency in (1, 2, 0.1):
+        breaker.record("reports", True, latency)
+    assert breaker.get_state("reports") == CircuitBreaker.CLOSED
+    breaker.record("reports", True, 1)
+    breaker.record("reports", False)
+    assert breaker.get_state("reports") == CircuitBreaker.CLOSED
+    breaker.record("reports", True, 3)
+    assert breaker.get_state("reports") == CircuitBreaker.CLOSED
+
+    breaker = CircuitBreaker(minimum_requests=3, failure_threshold=1.0, slow_call_threshold=0.5)
+    for latency in (1, 2, 3):
+        breaker.record("reports", True, latency)
+    assert breaker.get_state("reports") == CircuitBreaker.OPEN
+
+
+def test_client_errors_do_not_open_circuit(mocked_request, trustar):
+    breaker = CircuitBreaker(minimum_requests=2)
+    trustar.set_circuit_breaker(breaker)
+    mocked_request.get(f"{BASE_URL}/reports/abc", status_code=404, json={"message": "not found"})
+    for _ in range(3):
+        with pytest.raises(Exception):
+            trustar.get_report_details("abc")
+    assert breaker.get_state("reports/{id}") == CircuitBreaker.CLOSED
+
+
+def test_circuit_breaker_config(trustar):
+    assert trustar.get_circuit_breaker() is None
+
+
+def test_probe_that_raises_releases_its_slot(trustar):
+    class BrokenTransport(Transport):
+        def send(self, request, **kwargs):
+            raise ValueError("bug")
+
+    breaker = CircuitBreaker(minimum_requests=1, open_duration=0)
+    trustar.set_circuit_breaker(breaker)
+    breaker.record("ping", False)
+    assert breaker.get_state("ping") == CircuitBreaker.OPEN
+
+    trustar._client.token = "token"
+    trustar.set_transport(BrokenTransport())
+    for _ in range(2):
+        # the probe fails without a verdict on the endpoint, and the next call may probe again
+        with pytest.raises(ValueError):
+            trustar.ping()
+    assert breaker.get_state("ping") == CircuitBreaker.HALF_OPEN
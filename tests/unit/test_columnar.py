@@ -0,0 +1,62 @@
+from tests.conftest import BASE_URL
+from trustar import PhishingIndicator, PhishingIndicatorTable, PhishingSubmissionTable
+
+INDICATORS = [
+    {"indicatorType": "URL", "value": "a.com/x", "sourceKey": "vt", "normalizedIndicatorScore": 3,
+     "originalIndicatorScore": "90"},
+    {"indicatorType": "URL", "value": "b.com/y", "sourceKey": "cs", "normalizedIndicatorScore": 1,
+     "originalIndicatorScore": "Low"},
+    {"indicatorType": "IP", "value": "1.2.3.4", "sourceKey": "vt", "normalizedIndicatorScore": 2},
+    {"indicatorType": "IP", "value": "5.6.7.8", "sourceKey": "vt", "normalizedIndicatorScore": None},
+]
+
+
+def test_group_by_and_histogram():
+    table = PhishingIndicatorTable(INDICATORS[:2])
+    table.extend(PhishingIndicator.from_dict(item) for item in INDICATORS[2:])
+    assert len(table) == 4
+    assert table.columns["source_key"].values == ["vt", "cs"]
+    assert table.group_by("source_key", "normalized_indicator_score", "mean") == {"vt": 2.5, "cs": 1.0}
+    assert table.group_by("indicator_type", "normalized_indicator_score", "count") == {"URL": 2, "IP": 1}
+    assert table.group_by("source_key", "original_indicator_score", "max") == {"vt": 90.0}
+    assert table.histogram("normalized_indicator_score") == {3: 1, 1: 1, 2: 1}
+    assert table.histogram("normalized_indicator_score", bins=[0, 2, 4]) == [1, 2]
+    assert table.histogram("normalized_indicator_score", by="indicator_type") == {"URL": {3: 1, 1: 1}, "IP": {2: 1}}
+
+
+def test_top_k():
+    table = PhishingIndicatorTable()
+    table.extend_pages([{"items": INDICATORS}])
+    assert [row["value"] for row in table.top_k("normalized_indicator_score", k=2)] == ["a.com/x", "1.2.3.4"]
+    top = table.top_k("normalized_indicator_score", k=1, by="indicator_type")
+    assert {key: [row["value"] for row in rows] for key, rows in top.items()} == {"URL": ["a.com/x"],
+                                                                                   "IP": ["1.2.3.4"]}
+    assert table.get_row(3)["normalized_indicator_score"] is None
+
+    submissions = PhishingSubmissionTable([{"submissionId": "1", "status": "UNRESOLVED", "priorityEventScore": 3},
+                                           {"submissionId": "2", "status": "IGNORED", "priorityEventScore": 0}])
+    assert submissions.group_by("status", "priority_event_score", "max") == {"UNRESOLVED": 3.0, "IGNORED": 0.0}
+
+
+def test_indicator_summary_pivots(mocked_request, trustar):
+    def summary(value, source, severity, score=None):
+        return {"value": value, "type": "URL", "source": {"key": source, "name": source.upper()},
+                "severityLevel": severity, "score": {"name": "Risk", "value": score}, "updated": 1000}
+
+    pages = [
+        {"items": [summary("a.com", "vt", 3, "90"), summary("a.com", "cs", 1, "High")],
+         "pageNumber": 0, "pageSize": 2, "totalElements": 3, "hasNext": True},
+        {"items": [summary("b.com", "vt", 2, "40")], "pageNumber": 1, "pageSize": 2, "totalElements": 3,
+         "hasNext": False},
+    ]
+    mocked_request.post(f"{BASE_URL}/indicators/summaries",
+                        json=lambda request, context: pages[int(request.qs["pagenumber"][0])])
+
+    table = trustar.get_indicator_summaries_table(["a.com", "b.com"], page_size=2)
+    assert len(table) == 3
+    assert table.get_max_severity_per_value() == {"a.com": 3.0, "b.com": 2.0}
+    assert table.get_source_coverage() == {"vt": 2, "cs": 1}
+    assert table.pivot("value", "source_key", "severity_level") == {"a.com": {"vt": 3.0, "cs": 1.0},
+                                                                     "b.com": {"vt": 2.0}}
+    assert table.group_by("source_key", "score", "count") == {"vt": 2, "cs": 0}
+    assert table.get_row(1)["score_name"] == "Risk" and table.get_row(1)["score"] is None
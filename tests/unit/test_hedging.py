@@ -0,0 +1,104 @@
+import threading
+import time
+
+import pytest
+
+from tests.conftest import BASE_URL
+from trustar import Hedger, MetricsRegistry
+
+
+def make_send(delays):
+    # each call sleeps for the next delay, then returns its own index
+    calls = []
+    lock = threading.Lock()
+
+    def send():
+        with lock:
+            index = len(calls)
+            calls.append(index)
+        time.sleep(delays[index])
+        return index
+
+    return send, calls
+
+
+def test_hedge_wins_when_primary_is_slow():
+    hedger = Hedger(max_delay=0.05, budget=1, burst=1)
+    hedger.metrics = MetricsRegistry(enabled=True)
+    send, calls = make_send([1.0, 0])
+    start = time.time()
+    assert hedger.send("GET", "reports/{id}", send) == 1
+    assert time.time() - start < 0.5
+    assert calls == [0, 1]
+    assert hedger.get_stats() == {"requests": 1, "hedges": 1, "hedgeWins": 1, "hedgeRate": 1.0,
+                                  "budgetExhausted": 0}
+    endpoint = hedger.metrics.snapshot()["endpoints"]["GET reports/{id}"]
+    assert endpoint["hedges"] == 1 and endpoint["hedgeWins"] == 1
+
+
+def test_fast_requests_are_not_hedged():
+    hedger = Hedger(max_delay=0.5, budget=1, burst=1)
+    send, calls = make_send([0, 0])
+    assert hedger.send("GET", "ping", send) == 0
+    assert calls == [0]
+    assert hedger.get_stats()["hedges"] == 0
+
+
+def test_budget_caps_hedges():
+    hedger = Hedger(max_delay=0.01, budget=0.5, burst=1)
+    for _ in range(4):
+        send, calls = make_send([0.05, 0.05])
+        hedger.send("GET", "ping", send)
+    stats = hedger.get_stats()
+    assert stats["requests"] == 4 and stats["hedges"] == 2 and stats["budgetExhausted"] == 2
+
+
+def test_failed_primary_falls_back_to_hedge():
+    hedger = Hedger(max_delay=0.01, budget=1, burst=1)
+
+    def fail():
+        time.sleep(0.05)
+        raise IOError("reset")
+
+    attempts = iter([fail, lambda: "ok"])
+    assert hedger.send("GET", "ping", lambda: next(attempts)()) == "ok"
+
+    attempts = iter([fail, fail])
+    with pytest.raises(IOError):
+        hedger.send("GET", "ping", lambda: next(attempts)())
+
+
+def test_delay_follows_latency_percentile():
+    hedger = Hedger(percentile=0.9, min_delay=0.01, max_delay=1.0, min_samples=10)
+    assert hedger.get_delay("ping") == 1.0
+    for i in range(100):
+        hedger._record_latency("ping", i / 1000.0)
+    assert hedger.get_delay("ping") == pytest.approx(0.09)
+    assert hedger.is_idempotent("GET", "reports/{id}") and hedger.is_idempotent("POST", "indicators/metadata")
+    assert not hedger.is_idempotent("POST", "reports") and not hedger.is_idempotent("DELETE", "reports/{id}")
+
+
+def test_client_hedges_reads_only(mocked_request, trustar):
+    hedger = Hedger(max_delay=0.5)
+    trustar.set_hedger(hedger)
+    mocked_request.get(f"{BASE_URL}/reports/abc", json={"id": "abc"})
+    mocked_request.delete(f"{BASE_URL}/reports/abc", status_code=200)
+    assert trustar.get_report_details("abc").id == "abc"
+    trustar.delete_report("abc")
+    assert hedger.get_stats()["requests"] == 1
+
+
+def test_requests_without_budget_are_sent_inline():
+    hedger = Hedger(max_delay=0.01, budget=0.1, burst=1)
+    threads = []
+
+    def send():
+        threads.append(threading.current_thread())
+        raise IOError("reset")
+
+    with pytest.raises(IOError):
+        hedger.send("GET", "ping", send)
+    # no hedge was available, so the request never left the calling thread, and its failure was still timed
+    assert threads == [threading.current_thread()]
+    assert hedger._executor is None
+    assert len(hedger._latencies["ping"]) == 1
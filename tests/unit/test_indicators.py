@@ -1,7 +1,8 @@
 import pytest
+import requests
 
 from tests.conftest import BASE_URL
-from trustar import IndicatorType, NumberedPage, Indicator, Tag
+from trustar import IndicatorType, NumberedPage, Indicator, Tag, TagIndex
 
 URL_ENDPOINT = BASE_URL + "/indicators"
 URL_ENDPOINT_WHITELIST = BASE_URL + "/whitelist"
@@ -129,3 +130,103 @@ def test_delete_tag_from_indicator(mocked_request, trustar):
     tag_id = 12345
     mocked_request.delete(url=f"{URL_ENDPOINT}/tags/{tag_id}?value={metadata}")
     trustar.delete_indicator_tag(metadata, tag_id=tag_id)
+
+
+def test_get_related_indicators_graph(mocked_request, trustar):
+    related = {"evil.com": ["1.2.3.4", "bad.net"], "1.2.3.4": ["evil.com", "5.6.7.8"],
+               "bad.net": ["evil.com"], "5.6.7.8": ["9.9.9.9"]}
+
+    def callback(request, context):
+        value = request.qs["indicators"][0]
+        items = [{"value": v, "indicatorType": "IP"} for v in related.get(value, [])]
+        return {"items": items, "pageNumber": 0, "pageSize": 25, "totalElements": len(items), "hasNext": False}
+
+    mocked_request.get(url=f"{URL_ENDPOINT}/related", json=callback)
+    graph = trustar.get_related_indicators_graph(["evil.com"], max_depth=2)
+    assert set(graph.nodes) == {"evil.com", "1.2.3.4", "bad.net", "5.6.7.8"}
+    assert graph.depths["5.6.7.8"] == 2
+    assert graph.edges["1.2.3.4"] == {"evil.com", "5.6.7.8"}
+    # each node is only expanded once, and nodes on the last hop are not expanded
+    assert len([r for r in mocked_request.request_history if r.path.endswith("/related")]) == 3
+    assert not graph.truncated
+
+    graph = trustar.get_related_indicators_graph(["evil.com"], max_depth=2, max_nodes=2)
+    assert len(graph) == 2
+    assert graph.truncated
+
+
+def test_get_related_indicators_graph_errors(mocked_request, trustar):
+    # a server error truncates the graph, but a bad request is raised
+    mocked_request.get(url=f"{URL_ENDPOINT}/related", status_code=503, json={"message": "unavailable"})
+    graph = trustar.get_related_indicators_graph(["evil.com"])
+    assert set(graph.nodes) == {"evil.com"} and graph.truncated
+
+    mocked_request.get(url=f"{URL_ENDPOINT}/related", status_code=400, json={"message": "invalid"})
+    with pytest.raises(requests.HTTPError, match="400"):
+        trustar.get_related_indicators_graph(["evil.com"])
+
+
+def test_search_indicators_fan_out(mocked_request, trustar):
+    indicators = {"e1": ["a.com", "b.com"], "e2": ["b.com", "c.com"]}
+
+    def callback(request, context):
+        items = [{"value": v, "indicatorType": "URL"} for v in indicators[request.qs["enclaveids"][0]]]
+        return {"items": items, "pageNumber": 0, "pageSize": 25, "totalElements": len(items), "hasNext": False}
+
+    mocked_request.post(f"{URL_ENDPOINT}/search", json=callback)
+    result = trustar.search_indicators("abc", enclave_ids=["e1", "e2"], fan_out=True)
+    assert sorted(i.value for i in result) == ["a.com", "b.com", "c.com"]
+
+
+def test_add_indicator_tags(mocked_request, trustar):
+    mocked_request.post(f"{URL_ENDPOINT}/tags", json={"name": "t", "guid": "g1", "enclaveId": "e1"})
+    items = [("a.com", "t", "e1"), ("b.com", "t", "e1"), ("a.com", "t", "e1")]
+    results = list(trustar.add_indicator_tags(items))
+    assert sorted(r.key for r in results) == [("a.com", "t", "e1"), ("b.com", "t", "e1")]
+    assert all(r.result.id == "g1" for r in results)
+
+
+def test_add_indicator_tags_updates_matching_indexes(mocked_request, trustar):
+    mocked_request.post(f"{URL_ENDPOINT}/tags", json={"name": "t", "guid": "g1", "enclaveId": "e1"})
+    trustar._tag_indexes = {("e1", "e2"): TagIndex(), ("e2",): TagIndex()}
+    list(trustar.add_indicator_tags([("a.com", "t", "e1")]))
+    assert trustar._tag_indexes[("e1", "e2")].get_indicator_tag_id("t", "e1") == "g1"
+    assert trustar._tag_indexes[("e2",)].get_indicator_tag_id("t") is None
+
+
+def test_add_indicator_tags_via_submit(mocked_request, trustar):
+    mocked_request.post(f"{URL_ENDPOINT}")
+    items = [("a.com", "t1", "e1"), ("a.com", "t2", "e1"), ("b.com", "t1", "e1"), ("c.com", "t1", "e2")]
+    results = list(trustar.add_indicator_tags(items, via_submit=True, chunk_size=1))
+    assert len(results) == 4 and all(r.succeeded for r in results)
+    bodies = [r.json() for r in mocked_request.request_history if r.path.endswith("/indicators")]
+    assert len(bodies) == 3
+    a_com = [b for b in bodies if b["content"][0]["value"] == "a.com"][0]
+    assert a_com["enclaveIds"] == ["e1"]
+    assert [t["name"] for t in a_com["content"][0]["tags"]] == ["t1", "t2"]
+
+    # an indicator can only be submitted to an enclave
+    results = list(trustar.add_indicator_tags([("d.com", "t1", None)], via_submit=True))
+    assert isinstance(results[0].error, ValueError)
+    assert len([r for r in mocked_request.request_history if r.path.endswith("/indicators")]) == 3
+
+
+def test_delete_indicator_tags(mocked_request, trustar):
+    mocked_request.get(f"{BASE_URL}/reports/tags", json=[])
+    mocked_request.get(f"{URL_ENDPOINT}/tags", json=[{"name": "t", "guid": "g1", "enclaveId": "e1"}])
+    mocked_request.delete(f"{URL_ENDPOINT}/tags/g1")
+    results = list(trustar.delete_indicator_tags([("a.com", "t", "e1"), ("a.com", "unknown", "e1")]))
+    assert {r.key[1]: r.succeeded for r in results} == {"t": True, "unknown": False}
+
+
+def test_delete_indicator_tags_without_enclave(mocked_request, trustar):
+    mocked_request.get(f"{BASE_URL}/reports/tags", json=[])
+    mocked_request.get(f"{URL_ENDPOINT}/tags", json=[{"name": "t", "guid": "g1", "enclaveId": "e1"},
+                                                     {"name": "dup", "guid": "g2", "enclaveId": "e1"},
+                                                     {"name": "dup", "guid": "g3", "enclaveId": "e2"}])
+    deleted = mocked_request.delete(f"{URL_ENDPOINT}/tags/g1")
+    items = [("a.com", "t", "e1"), ("b.com", "t", None), ("c.com", "dup", None)]
+    results = {r.key: r for r in trustar.delete_indicator_tags(items)}
+    assert results[("a.com", "t", "e1")].succeeded and results[("b.com", "t", None)].succeeded
+    assert isinstance(results[("c.com", "dup", None)].error, ValueError)
+    assert deleted.call_count == 2
@@ -0,0 +1,38 @@
+from tests.conftest import BASE_URL
+from trustar import MetricsRegistry, get_path_template
+
+
+def test_get_path_template():
+    assert get_path_template("reports/4d1fcaee-5009-4620-b239-2b22c3992b80/tags") == "reports/{id}/tags"
+    assert get_path_template("triage/submissions/1234/status") == "triage/submissions/{id}/status"
+    assert get_path_template("indicators/search") == "indicators/search"
+
+
+def test_request_metrics(mocked_request, trustar):
+    metrics = trustar.get_metrics()
+    assert not metrics.enabled
+    mocked_request.get(f"{BASE_URL}/reports/abc", json={"id": "abc"})
+    trustar.get_report_details("abc")
+    assert metrics.snapshot()["endpoints"] == {}
+
+    metrics.enabled = True
+    mocked_request.get(f"{BASE_URL}/reports/def", [{"status_code": 429, "json": {"waitTime": 0}},
+                                                   {"json": {"id": "def"}}])
+    trustar.get_report_details("abc")
+    trustar.get_report_details("def")
+    endpoint = metrics.snapshot()["endpoints"]["GET reports/{id}"]
+    assert endpoint["requests"] == {200: 2, 429: 1}
+    assert endpoint["retries"] == 1 and endpoint["latency"]["count"] == 3
+    assert endpoint["bytesReceived"] == 2 * len('{"id": "abc"}') + len('{"waitTime": 0}')
+
+    text = metrics.to_prometheus()
+    assert 'trustar_sdk_requests_total{method="GET",path="reports/{id}",status="429"} 1' in text
+    assert 'trustar_sdk_request_duration_seconds_bucket{method="GET",path="reports/{id}",le="+Inf"} 3' in text
+
+
+def test_disabled_registry_records_nothing():
+    metrics = MetricsRegistry()
+    metrics.record_request("GET", "ping", 200, 0.1)
+    metrics.record_token_refresh()
+    assert metrics.snapshot() == {"endpoints": {}, "tokenRefreshes": 0, "rateLimitWaitTime": 0.0,
+                                  "circuitStateChanges": {}}
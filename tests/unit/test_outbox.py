@@ -0,0 +1,88 @@
+import threading
+
+import pytest
+
+from tests.conftest import BASE_URL
+from trustar import Indicator, Outbox, Report
+
+REPORTS_URL = BASE_URL + "/reports"
+INDICATORS_URL = BASE_URL + "/indicators"
+
+
+@pytest.fixture
+def outbox(trustar, tmp_path):
+    o = Outbox(trustar, str(tmp_path / "outbox.db"), retry_delay=0, max_attempts=2, batch_size=2)
+    yield o
+    o.close()
+
+
+def test_enqueue_is_idempotent(outbox, trustar, current_time_millis):
+    report = Report(title="a", body="b", time_began=current_time_millis, external_id="ext-1",
+                    enclave_ids=trustar.enclave_ids)
+    assert outbox.enqueue_report(report) == outbox.enqueue_report(report) == "submit_report:external:ext-1"
+    outbox.enqueue_report_tags("id-1", ["tag"], [])
+    outbox.enqueue_report_tags("id-1", ["tag"], [])
+    assert outbox.get_pending_count() == 2
+
+
+def test_drain_batches_and_dead_letters(mocked_request, outbox, trustar, current_time_millis):
+    mocked_request.post(url=INDICATORS_URL)
+    mocked_request.post(url=REPORTS_URL, status_code=500, json={"message": "unavailable"})
+    outbox.enqueue_indicators([Indicator(value=v) for v in ("a.com", "b.com", "c.com")])
+    outbox.enqueue_report(Report(title="a", body="b", time_began=current_time_millis, enclave_ids=trustar.enclave_ids))
+
+    counts = outbox.drain()
+    # three indicators are submitted in two batches, and the report fails twice before being dead-lettered
+    assert counts == {"succeeded": 2, "retried": 1, "failed": 1}
+    assert len([r for r in mocked_request.request_history if r.path.endswith("/indicators")]) == 2
+    assert outbox.get_pending_count() == 0
+    dead_letters = outbox.get_dead_letters()
+    assert len(dead_letters) == 1 and dead_letters[0]["operation"] == "submit_report"
+
+    # content hashes only deduplicate queued entries, so submitting a completed indicator again queues it again
+    outbox.enqueue_indicators([Indicator(value="a.com")])
+    assert outbox.get_pending_count() == 1
+    assert outbox.requeue_dead_letters() == 1
+    assert outbox.get_pending_count() == 2
+
+
+def test_repeated_operations_are_not_suppressed(mocked_request, outbox):
+    matcher = mocked_request.post(url=REPORTS_URL + "/id-1/alter-tags", json={"id": "id-1"})
+    for added, removed in ((["x"], []), ([], ["x"]), (["x"], [])):
+        outbox.enqueue_report_tags("id-1", added, removed)
+        outbox.drain()
+    assert matcher.call_count == 3
+
+    # an explicit key is remembered once completed, until the retention period has passed
+    outbox.enqueue_report_tags("id-1", ["y"], [], idempotency_key="change-1")
+    outbox.drain()
+    outbox.enqueue_report_tags("id-1", ["y"], [], idempotency_key="change-1")
+    assert outbox.get_pending_count() == 0
+
+    outbox.retention = 0
+    assert outbox.prune() == 3
+    outbox.enqueue_report_tags("id-1", ["y"], [], idempotency_key="change-1")
+    assert outbox.get_pending_count() == 1
+
+
+def test_stop_that_times_out_keeps_the_thread(outbox):
+    release = threading.Event()
+    drains = []
+
+    def drain(max_workers):
+        drains.append(threading.current_thread())
+        release.wait(5)
+
+    outbox.drain = drain
+    outbox.start(poll_interval=0.01)
+    outbox.stop(timeout=0.05)
+    thread = outbox._thread
+    assert thread is not None and thread.is_alive()
+
+    # starting again resumes the same thread instead of starting a second one
+    outbox.start(poll_interval=0.01)
+    assert outbox._thread is thread
+    release.set()
+    outbox.stop(timeout=5)
+    assert outbox._thread is None and not thread.is_alive()
+    assert set(drains) == {thread}
@@ -1,5 +1,5 @@
 from tests.conftest import BASE_URL
-from trustar import CursorPage
+from trustar import CursorPage, TriageTail
 
 PRIORITY_EVENT_SCORE = (3, 2, 1)
 NORMALIZED_INDICATOR_SCORE = (3, 2, 1)
@@ -33,3 +33,50 @@ def test_get_phishing_indicators_page(mocked_request, trustar):
     expected = {'items': [{'indicatorType': 'IP', 'value': '220.178.71.156', 'sourceKey': 'alienvault_otx'}],
                 'responseMetadata': {'nextCursor': ''}}
     assert expected == page.to_dict(remove_nones=True)
+
+
+def test_mark_triage_statuses(mocked_request, trustar):
+    mocked_request.post(url=f"{URL_ENDPOINT}/submissions/1/status")
+    mocked_request.post(url=f"{URL_ENDPOINT}/submissions/2/status", status_code=500)
+    progress = []
+    results = trustar.mark_triage_statuses([("1", "IGNORED"), (2, "IGNORED"), ("1", "CONFIRMED")],
+                                           progress=lambda done, total, result: progress.append((done, total)))
+    assert {r.key: (r.succeeded, r.result) for r in results} == {"1": (True, "CONFIRMED"), "2": (False, None)}
+    assert sorted(progress) == [(1, 2), (2, 2)]
+    statuses = [r.qs["status"] for r in mocked_request.request_history if r.path.endswith("/1/status")]
+    assert statuses == [["confirmed"]]
+
+
+def test_mark_triage_statuses_where(mocked_request, trustar):
+    mocked_request.post(url=f"{URL_ENDPOINT}/submissions", json={
+        "items": [{"submissionId": "1", "priorityEventScore": 0}, {"submissionId": "2", "priorityEventScore": 3}],
+        "responseMetadata": {"nextCursor": ""}})
+    mocked_request.post(url=f"{URL_ENDPOINT}/submissions/1/status")
+    results = trustar.mark_triage_statuses_where(lambda s: s.priority_event_score == 0, "IGNORED")
+    assert [r.key for r in results] == ["1"] and results[0].succeeded
+
+
+def test_triage_tail(mocked_request, trustar, tmp_path):
+    def submissions(request, context):
+        body = request.json()
+        if body.get("cursor") == "c1":
+            return {"items": [{"submissionId": "2"}, {"submissionId": "3"}], "responseMetadata": {"nextCursor": ""}}
+        return {"items": [{"submissionId": "1"}, {"submissionId": "2"}], "responseMetadata": {"nextCursor": "c1"}}
+
+    mocked_request.post(url=f"{URL_ENDPOINT}/submissions", json=submissions)
+    state_path = str(tmp_path / "tail.json")
+    received = []
+    tail = TriageTail(trustar, state_path=state_path, from_time=1000, overlap=100, min_interval=1, max_interval=8)
+    tail.on_submission(lambda submission: received.append(submission.submission_id))
+
+    assert tail.poll() == 3 and received == ["1", "2", "3"] and tail.interval == 1
+    requests = [r for r in mocked_request.request_history if r.path.endswith("/submissions")]
+    assert requests[0].json()["from"] == 900
+    high_water = tail.get_high_water_mark()
+
+    # a restarted tail resumes from the saved position, and skips the items it already delivered
+    tail = TriageTail(trustar, state_path=state_path)
+    tail.on_submission(lambda submission: received.append(submission.submission_id))
+    assert tail.poll() == 0 and len(received) == 3 and tail.interval == 2
+    requests = [r for r in mocked_request.request_history if r.path.endswith("/submissions")]
+    assert requests[-2].json()["from"] == high_water - 60000
@@ -0,0 +1,30 @@
+from tests.conftest import BASE_URL
+from trustar import Redactor, Report
+
+
+def test_leftmost_longest_matches():
+    redactor = Redactor(["xy", "yzw", "zw", "acme", "Acme Corp"])
+    assert redactor.find("xyzw") == [(0, 2), (2, 4)]
+    assert redactor.redact_text("ACME CORP and acme.com") == "[REDACTED] and [REDACTED].com"
+    assert Redactor(["acme"], whole_words=True).redact_text("acme acmeville") == "[REDACTED] acmeville"
+    assert Redactor(["acme"], case_sensitive=True).redact_text("ACME acme") == "ACME [REDACTED]"
+    assert redactor.redact_text("") == "" and redactor.redact_text(None) is None
+
+
+def test_redact_many():
+    redactor = Redactor(["secret"], replacement="***")
+    reports = [Report(title="secret %d" % i, body="a secret body") for i in range(5)] + [("t", "secret")]
+    redacted = redactor.redact_many(reports, processes=2, chunk_size=2)
+    assert [r.title for r in redacted] == ["*** %d" % i for i in range(5)] + ["t"]
+    assert redacted[-1].body == "***"
+
+
+def test_get_redactor(mocked_request, trustar):
+    mocked_request.get(f"{BASE_URL}/whitelist", json={"items": [{"value": "10.0.0.1", "indicatorType": "IP"}],
+                                                      "pageNumber": 0, "pageSize": 25, "hasNext": False})
+    mocked_request.post(f"{BASE_URL}/redaction/report", json={"title": "[REDACTED] alert",
+                                                              "reportBody": "seen on [REDACTED]"})
+    redactor = trustar.get_redactor(terms=["Acme"])
+    redacted = trustar.redact_report(title="Acme alert", report_body="seen on 10.0.0.1", redactor=redactor)
+    assert (redacted.title, redacted.body) == ("[REDACTED] alert", "seen on [REDACTED]")
+    assert redactor.verify(trustar, title="Acme alert", report_body="seen on 10.0.0.1")[2]
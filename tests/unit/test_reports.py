@@ -1,6 +1,8 @@
+import re
+
 import pytest
 
-from trustar import Report, IdType
+from trustar import Report, ReportCache, IdType, Tag, TagIndex
 from tests.conftest import BASE_URL, mocked_request
 
 FAKE_REPORT_ID = 45
@@ -137,3 +139,198 @@ def test_get_report_status(trustar, mocked_request):
     mocked_request = mocked_request.get(url=f"{URL_ENDPOINT}/{lookup}/status", json=expected)
     result = trustar.get_report_status(lookup)
     assert result['status'] == "SUBMISSION_SUCCESS"
+
+
+def test_submit_reports(mocked_request, trustar, current_time_millis):
+    def callback(request, context):
+        title = request.json()["title"]
+        if title == "too big":
+            context.status_code = 413
+            return '{"message": "Too many indicators"}'
+        return "id-" + title
+
+    mocked_request.post(url=URL_ENDPOINT, text=callback)
+    reports = (Report(title=title, body="body", time_began=current_time_millis, enclave_ids=trustar.enclave_ids)
+               for title in ("a", "too big", "b"))
+    results = list(trustar.submit_reports(reports, max_workers=2))
+    assert len(results) == 3
+    assert {r.key.id for r in results if r.succeeded} == {"id-a", "id-b"}
+    failed = [r for r in results if not r.succeeded]
+    assert len(failed) == 1 and failed[0].status_code == 413 and failed[0].key.title == "too big"
+
+
+def test_wait_for_reports(mocked_request, trustar):
+    statuses = {"a": ["SUBMISSION_SUCCESS"],
+                "b": ["SUBMISSION_PROCESSING", "UNKNOWN", "SUBMISSION_FAILURE"],
+                "c": ["SUBMISSION_PROCESSING"] * 100}
+
+    def callback(request, context):
+        report_id = request.path.split("/")[-2]
+        return {"id": report_id, "status": statuses[report_id].pop(0), "errorMessage": ""}
+
+    mocked_request.get(url=f"{URL_ENDPOINT}/a/status", json=callback)
+    mocked_request.get(url=f"{URL_ENDPOINT}/b/status", json=callback)
+    mocked_request.get(url=f"{URL_ENDPOINT}/c/status", json=callback)
+    results = list(trustar.wait_for_reports(["a", "b", "c"], initial_interval=0, max_requests=10))
+    assert [(r["id"], r["status"]) for r in results] == [("a", "SUBMISSION_SUCCESS"), ("b", "SUBMISSION_FAILURE")]
+    assert len(statuses["c"]) == 100 - (10 - 1 - 3)
+
+
+def test_wait_for_reports_unknown_and_duplicate_ids(mocked_request, trustar):
+    mocked_request.get(url=f"{URL_ENDPOINT}/a/status", json={"id": "a", "status": "SUBMISSION_SUCCESS"})
+    mocked_request.get(url=f"{URL_ENDPOINT}/gone/status", status_code=404, json={"message": "not found"})
+    flaky = mocked_request.get(url=f"{URL_ENDPOINT}/flaky/status", status_code=503, json={"message": "down"})
+
+    # without a timeout, an unknown ID must not be polled forever
+    results = list(trustar.wait_for_reports(["a", "gone", "a", "flaky"], initial_interval=0, max_errors=3))
+    assert sorted((r["id"], r["status"]) for r in results) == [("a", "SUBMISSION_SUCCESS"),
+                                                               ("a", "SUBMISSION_SUCCESS"),
+                                                               ("flaky", "SUBMISSION_FAILURE"),
+                                                               ("gone", "SUBMISSION_FAILURE")]
+    assert [r["statusCode"] for r in results if r["id"] == "gone"] == [404]
+    assert flaky.call_count == 3
+
+
+def test_wait_for_reports_retries_rate_limited_status(mocked_request, trustar):
+    trustar._client.retry = False
+    limited = mocked_request.get(url=f"{URL_ENDPOINT}/a/status",
+                                 response_list=[{"status_code": 429, "json": {"waitTime": 1000}},
+                                                {"json": {"id": "a", "status": "SUBMISSION_SUCCESS"}}])
+    results = list(trustar.wait_for_reports(["a"], initial_interval=0))
+    assert [r["status"] for r in results] == ["SUBMISSION_SUCCESS"]
+    assert limited.call_count == 2
+
+
+def test_get_reports_details(mocked_request, trustar):
+    def callback(request, context):
+        report_id = request.path.split("/")[-1]
+        if report_id == "missing":
+            context.status_code = 404
+            return {"message": "not found"}
+        return {"id": report_id, "title": report_id, "updated": 2}
+
+    mocked_request.get(url=re.compile(f"{URL_ENDPOINT}/[a-z]+$"), json=callback)
+    cache = ReportCache()
+    cache.put(Report(id="cached", title="old", updated=1))
+    results = trustar.get_reports_details(["a", "missing", "b", "a", Report(id="cached", updated=1)], cache=cache)
+    assert [r.key for r in results] == ["a", "missing", "b", "a", "cached"]
+    assert [r.succeeded for r in results] == [True, False, True, True, True]
+    assert results[1].status_code == 404
+    assert results[4].result.title == "old"
+    # duplicate and cached ids are not requested again
+    assert len([r for r in mocked_request.request_history if r.method == "GET"]) == 3
+
+    # a listing with a newer timestamp invalidates the cached copy
+    results = trustar.get_reports_details([Report(id="cached", updated=2)], cache=cache)
+    assert results[0].result.title == "cached"
+    assert cache.get("a", updated=2).title == "a"
+
+
+def test_update_report_sends_changes_only(mocked_request, trustar, copied_report):
+    report = Report.from_dict(copied_report)
+    assert report.get_changes() == {}
+    report.enclave_ids.append("other")
+    assert list(report.get_changes()) == ["enclaveIds"]
+    report.enclave_ids.pop()
+    report.title = "New title"
+
+    mocked_request.put(url=f"{URL_ENDPOINT}/{report.id}")
+    trustar.update_report(report)
+    assert mocked_request.last_request.json() == {"title": "New title"}
+
+    # nothing changed since the last update, so no request is made
+    request_count = mocked_request.call_count
+    results = list(trustar.update_reports([report]))
+    assert results[0].succeeded
+    assert mocked_request.call_count == request_count
+
+
+def test_get_reports_fan_out(mocked_request, trustar):
+    reports = {"e1": [("r5", 50), ("r3", 30), ("r1", 10)],
+               "e2": [("r4", 40), ("r3", 30), ("r2", 20)]}
+
+    def callback(request, context):
+        from_time, to_time = int(request.qs["from"][0]), int(request.qs["to"][0])
+        items = [{"id": report_id, "updated": updated} for report_id, updated in reports[request.qs["enclaveids"][0]]
+                 if from_time <= updated <= to_time]
+        return {"items": items[:2], "hasNext": False}
+
+    mocked_request.get(url=URL_ENDPOINT, json=callback)
+    result = trustar.get_reports(is_enclave=True, enclave_ids=["e1", "e2"], from_time=0, to_time=100, fan_out=True)
+    assert [report.id for report in result] == ["r5", "r4", "r3", "r2", "r1"]
+
+
+def test_alter_reports_tags(mocked_request, trustar):
+    mocked_request.post(url=re.compile(f"{URL_ENDPOINT}/.+/alter-tags"), json={"id": "x"})
+    changes = [("r1", ["a"], []), ("r2", ["a"], ["b"]), ("r1", ["b"], ["a"]), ("r3", [], [])]
+    results = list(trustar.alter_reports_tags(changes))
+    assert sorted(r.key for r in results) == ["r1", "r2", "r3"]
+    # no call is made for a report without changes
+    assert [r.result for r in results if r.key == "r3"] == [None]
+    assert len([r for r in mocked_request.request_history if r.path.endswith("alter-tags")]) == 2
+    bodies = {r.path.split("/")[-2]: r.json() for r in mocked_request.request_history if r.path.endswith("alter-tags")}
+    assert bodies["r1"] == {"addedTags": [{"name": "b"}], "removedTags": [{"name": "a"}]}
+    assert bodies["r2"] == {"addedTags": [{"name": "a"}], "removedTags": [{"name": "b"}]}
+
+
+def test_report_cache_returns_copies():
+    cache = ReportCache()
+    report = Report(id="r1", title="old", updated=1, enclave_ids=["e1"])
+    cache.put(report)
+    report.title = "changed by the caller"
+    cached = cache.get("r1")
+    cached.enclave_ids.append("e2")
+    assert cache.get("r1").title == "old" and cache.get("r1").enclave_ids == ["e1"]
+    assert cache.get("r1") is not cached
+
+
+def test_get_tag_index(mocked_request, trustar):
+    enclave_id = trustar.enclave_ids[0]
+    mocked_request.get(url=f"{URL_ENDPOINT}/tags", json=[{"name": "phishing", "enclaveId": enclave_id}])
+    mocked_request.get(url=f"{BASE_URL}/indicators/tags", json=[{"name": "bad", "guid": "g1", "enclaveId": enclave_id}])
+    index = trustar.get_tag_index()
+    assert index.get_indicator_tag_id("bad", enclave_id) == "g1"
+    assert index.get_report_tag_names() == {"phishing"}
+    # the index is cached until it is refreshed
+    request_count = mocked_request.call_count
+    assert trustar.get_tag_index() is index
+    assert trustar.get_tag_index(refresh=True) is not index
+    assert mocked_request.call_count == request_count + 2
+
+
+def test_tag_index_names_in_several_enclaves():
+    index = TagIndex(indicator_tags=[Tag(name="bad", id="g1", enclave_id="e1"),
+                                     Tag(name="bad", id="g2", enclave_id="e2"),
+                                     Tag(name="good", id="g3", enclave_id="e2")])
+    assert index.get_indicator_tag_id("bad", "e2") == "g2"
+    assert index.get_indicator_tag_id("good") == "g3"
+    with pytest.raises(ValueError, match="specify the enclave"):
+        index.get_indicator_tag_id("bad")
+
+
+def test_delete_reports_resumes_from_checkpoint(mocked_request, trustar, tmp_path):
+    checkpoint = str(tmp_path / "deleted.txt")
+    mocked_request.delete(re.compile(f"{URL_ENDPOINT}/r[12]$"))
+    mocked_request.delete(f"{URL_ENDPOINT}/r3", status_code=500)
+    results = trustar.delete_reports(["r1", Report(id="r2"), "r3", "r1"], checkpoint=checkpoint)
+    assert {r.key: r.succeeded for r in results} == {"r1": True, "r2": True, "r3": False}
+
+    mocked_request.delete(f"{URL_ENDPOINT}/r3")
+    results = trustar.delete_reports(["r1", "r2", "r3"], checkpoint=checkpoint)
+    assert [r.key for r in results] == ["r3"] and results[0].succeeded
+    assert sorted(line.split("\t")[0] for line in open(checkpoint).read().splitlines()) == ["r1", "r2", "r3"]
+
+
+def test_copy_reports(mocked_request, trustar):
+    mocked_request.post(re.compile(f"{URL_ENDPOINT}/copy/"),
+                        json=lambda request, context: {"id": "copy-" + request.path.rsplit("/", 1)[1]})
+    results = trustar.copy_reports(["a", "b"], "dest")
+    assert sorted((r.key, r.result) for r in results) == [("a", "copy-a"), ("b", "copy-b")]
+
+
+def test_move_reports_by_external_id(mocked_request, trustar):
+    matcher = mocked_request.post(re.compile(f"{URL_ENDPOINT}/move/"), json={"id": "x"})
+    results = trustar.move_reports([Report(id="a", external_id="ext-a")], "dest", id_type=IdType.EXTERNAL)
+    assert [r.key for r in results] == ["ext-a"] and results[0].succeeded
+    assert matcher.last_request.path.endswith("/move/ext-a")
+    assert matcher.last_request.qs["idtype"] == [IdType.EXTERNAL.lower()]
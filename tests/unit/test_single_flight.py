@@ -0,0 +1,75 @@
+import threading
+import time
+
+import pytest
+from requests import HTTPError
+
+from tests.conftest import BASE_URL
+from trustar import SingleFlight, TruStar
+from trustar.api_client import ApiClient
+
+
+def slow(status_code, body):
+    def respond(request, context):
+        time.sleep(0.3)
+        context.status_code = status_code
+        return body
+    return respond
+
+
+def run_concurrently(func, count=5):
+    results = []
+    barrier = threading.Barrier(count)
+
+    def run():
+        barrier.wait()
+        try:
+            results.append(func())
+        except Exception as e:
+            results.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_identical_gets_share_one_request(mocked_request, trustar):
+    trustar._client.single_flight = SingleFlight()
+    trustar.get_metrics().enabled = True
+    matcher = mocked_request.get(f"{BASE_URL}/reports/abc", json=slow(200, {"id": "abc"}))
+
+    results = run_concurrently(lambda: trustar.get_report_details("abc"))
+    assert [report.id for report in results] == ["abc"] * 5
+    assert matcher.call_count == 1
+    assert trustar._client.single_flight.saved == 4
+    assert trustar.get_metrics().snapshot()["endpoints"]["GET reports/{id}"]["coalesced"] == 4
+
+    # nothing is cached once the request has finished
+    trustar.get_report_details("abc")
+    assert matcher.call_count == 2
+
+
+def test_errors_are_shared(mocked_request, trustar):
+    trustar._client.single_flight = SingleFlight()
+    matcher = mocked_request.get(f"{BASE_URL}/reports/abc", json=slow(404, {"message": "not found"}))
+    results = run_concurrently(lambda: trustar.get_report_details("abc"), count=3)
+    assert all(isinstance(result, HTTPError) for result in results)
+    assert matcher.call_count == 1
+
+
+def test_coalescing_key():
+    get_key = ApiClient._get_coalescing_key
+    assert get_key("GET", "reports", None, {"b": 1, "a": [1, 2]}, None, {}) == \
+        get_key("GET", "reports", None, {"a": [1, 2], "b": 1}, None, {})
+    assert get_key("GET", "reports", None, {"a": 1}, None, {}) != get_key("GET", "reports", None, {"a": 2}, None, {})
+    assert get_key("POST", "reports", None, None, "{}", {}) is None
+    assert get_key("GET", "reports", None, None, None, {"stream": True}) is None
+
+
+def test_coalescing_config():
+    config = {"user_api_key": "key", "user_api_secret": "secret", "client_metatag": "test"}
+    assert TruStar(config=config)._client.single_flight is None
+    assert isinstance(TruStar(config={**config, "coalesce_requests": "true"})._client.single_flight, SingleFlight)
@@ -0,0 +1,40 @@
+import pytest
+
+from trustar import TruStar, get_current_time_millis
+from trustar.testing import StandInApi, StandInServer
+
+
+@pytest.fixture
+def server():
+    api = StandInApi(seed=1, reports_page_size=50)
+    api.populate(reports=120, indicators=60, submissions=30)
+    with StandInServer(api) as s:
+        yield s
+
+
+def test_pagination(server):
+    ts = TruStar(config=server.get_config())
+    assert ts.ping() == "pong"
+    reports = list(ts.get_reports(from_time=get_current_time_millis() - 8 * 24 * 60 * 60 * 1000))
+    assert len(reports) == 120 and len(set(r.id for r in reports)) == 120
+    assert len(list(ts.get_indicators(page_size=25))) == 60
+    submissions = list(ts.get_phishing_submissions(priority_event_score=[0, 1, 2, 3]))
+    assert len(submissions) == 30
+
+
+def test_token_expiry_and_quota(server):
+    ts = TruStar(config=server.get_config())
+    ts.ping()
+    server.api.expire_tokens()
+    assert ts.ping() == "pong"
+
+    server.api.quota = 2
+    server.api.quota_window = 1
+    for _ in range(3):
+        ts.ping()
+    assert server.api.stats[429] >= 1
+
+    server.api.quota = None
+    server.api.error_rate = 1
+    with pytest.raises(Exception, match="503"):
+        ts.ping()
@@ -0,0 +1,52 @@
+import threading
+
+import pytest
+
+from tests.conftest import BASE_URL
+from trustar import InMemoryTracer, set_tracer
+
+
+@pytest.fixture
+def tracer():
+    tracer = InMemoryTracer()
+    set_tracer(tracer)
+    yield tracer
+    set_tracer(None)
+
+
+def test_page_spans_nest_requests(mocked_request, trustar, tracer):
+    def page(request, context):
+        context.headers["Trace-Id"] = "trace-" + request.qs["pagenumber"][0]
+        has_next = request.qs["pagenumber"] == ["0"]
+        return {"items": [{"value": "a.com"}], "pageNumber": 0, "pageSize": 1, "totalElements": 2, "hasNext": has_next}
+
+    mocked_request.get(f"{BASE_URL}/indicators", json=page)
+    with tracer.start_span("caller"):
+        assert len(list(trustar.get_indicators(page_size=1))) == 2
+
+    [root] = [span for span in tracer.get_root_spans() if span.name == "caller"]
+    [pages] = root.children
+    assert pages.name == "trustar.pages" and pages.attributes == {"function": "get_indicators_page", "pages": 2}
+    assert [(p.name, p.attributes["page_number"]) for p in pages.children] == [("trustar.page", 0), ("trustar.page", 1)]
+    requests = [p.children[-1] for p in pages.children]
+    assert [r.attributes["trace_id"] for r in requests] == ["trace-0", "trace-1"]
+    assert all(r.name == "trustar.request" and r.attributes["attempts"] == 1 for r in requests)
+    assert pages.duration >= sum(p.duration for p in pages.children) >= 0
+
+
+def test_last_response_is_per_thread(mocked_request, trustar):
+    mocked_request.get(f"{BASE_URL}/ping", text="pong", headers={"Trace-Id": "main"})
+    trustar.ping()
+
+    mocked_request.get(f"{BASE_URL}/version", text="1.3", headers={"Trace-Id": "other"})
+    trace_ids = []
+
+    def other():
+        trustar.get_version()
+        trace_ids.append(trustar._client.get_last_trace_id())
+
+    thread = threading.Thread(target=other)
+    thread.start()
+    thread.join()
+    assert trace_ids == ["other"]
+    assert trustar._client.get_last_trace_id() == "main"
@@ -0,0 +1,204 @@
+import socket
+import ssl
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+import requests
+
+from tests.conftest import BASE_URL
+from trustar import HttpxTransport, InMemoryTransport, RequestsTransport, TruStar, iter_concurrently
+from trustar.testing import Http2StandInServer, StandInApi, StandInServer
+
+
+@pytest.fixture
+def api():
+    api = StandInApi(seed=1)
+    api.populate(indicators=60)
+    return api
+
+
+def test_in_memory_transport(api):
+    ts = TruStar(config=api.get_config(metrics=True))
+    ts.set_transport(InMemoryTransport(api))
+    assert ts.ping() == "pong"
+    assert len(list(ts.get_indicators(page_size=25))) == 60
+
+    # token refreshes, retries and metrics work the same over any transport
+    api.expire_tokens()
+    assert ts.ping() == "pong"
+    assert ts.get_metrics().snapshot()["tokenRefreshes"] == 2
+
+    api.error_rate = 1
+    with pytest.raises(requests.HTTPError, match="503 Server Error"):
+        ts.ping()
+
+
+def test_in_memory_response(api):
+    transport = InMemoryTransport(api)
+    request = transport.prepare(requests.Request("POST", "http://stand-in/oauth/token",
+                                                 auth=(api.api_key, api.api_secret),
+                                                 data={"grant_type": "client_credentials"}))
+    response = transport.send(request)
+    assert response.status_code == 200 and response.reason == "OK"
+    assert response.headers["content-type"] == "application/json"
+    assert "access_token" in response.json() and response.request is request
+
+
+def test_requests_transport_reuses_session(mocked_request, trustar):
+    transport = RequestsTransport()
+    trustar.set_transport(transport)
+    mocked_request.get(f"{BASE_URL}/ping", text="pong")
+    assert trustar.ping() == "pong"
+    assert trustar._client.transport is transport
+    trustar.set_transport(None)
+    assert isinstance(trustar._client.transport, RequestsTransport) and trustar._client.transport is not transport
+
+
+def test_httpx_transport_requires_httpx():
+    try:
+        import httpx
+    except ImportError:
+        with pytest.raises(ImportError, match="trustar\\[http2\\]"):
+            HttpxTransport()
+    else:
+        assert HttpxTransport().http2
+
+
+def test_httpx_transport(api):
+    pytest.importorskip("httpx")
+    with StandInServer(api) as server:
+        ts = TruStar(config=server.get_config())
+        transport = HttpxTransport(http2=False)
+        ts.set_transport(transport)
+        assert ts.ping() == "pong"
+        assert len(list(ts.get_indicators(page_size=25))) == 60
+        transport.close()
+
+
+def serve_h2(listener, context, body):
+    # a minimal HTTP/2 server, which negotiates h2 with ALPN and answers every request with the same body
+    from h2.config import H2Configuration
+    from h2.connection import H2Connection
+    from h2.events import RequestReceived
+
+    sock = context.wrap_socket(listener.accept()[0], server_side=True)
+    connection = H2Connection(config=H2Configuration(client_side=False))
+    connection.initiate_connection()
+    sock.sendall(connection.data_to_send())
+    try:
+        while True:
+            data = sock.recv(65535)
+            if not data:
+                break
+            for event in connection.receive_data(data):
+                if isinstance(event, RequestReceived):
+                    connection.send_headers(event.stream_id, [(":status", "200"), ("content-type", "text/plain"),
+                                                              ("content-length", str(len(body)))])
+                    connection.send_data(event.stream_id, body, end_stream=True)
+            sock.sendall(connection.data_to_send())
+    except (OSError, ssl.SSLError):
+        pass
+    finally:
+        sock.close()
+
+
+def test_httpx_transport_negotiates_http2(tmp_path):
+    pytest.importorskip("httpx")
+    pytest.importorskip("h2")
+    trustme = pytest.importorskip("trustme")
+
+    ca = trustme.CA()
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    ca.issue_cert("localhost").configure_cert(context)
+    context.set_alpn_protocols(["h2"])
+    ca_path = str(tmp_path / "ca.pem")
+    ca.cert_pem.write_to_path(ca_path)
+
+    listener = socket.socket()
+    listener.bind(("localhost", 0))
+    listener.listen(1)
+    thread = threading.Thread(target=serve_h2, args=(listener, context, b"pong"))
+    thread.daemon = True
+    thread.start()
+
+    transport = HttpxTransport()
+    try:
+        url = "https://localhost:%d/api/1.3/ping" % listener.getsockname()[1]
+        response = transport.send(transport.prepare(requests.Request("GET", url)), verify=ca_path, timeout=5)
+        assert response.status_code == 200 and response.text == "pong"
+        assert response.http_version == "HTTP/2"
+    finally:
+        transport.close()
+        listener.close()
+        thread.join(5)
+
+
+class CookieHandler(BaseHTTPRequestHandler):
+    # sets a cookie, and answers with the cookies it received
+
+    def do_GET(self):
+        body = (self.headers.get("Cookie") or "").encode("utf-8")
+        self.send_response(200)
+        self.send_header("Set-Cookie", "session=abc; Path=/")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_requests_transport_ignores_cookies():
+    server = HTTPServer(("127.0.0.1", 0), CookieHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    transport = RequestsTransport()
+    try:
+        url = "http://127.0.0.1:%d/" % server.server_port
+        for _ in range(2):
+            response = transport.send(transport.prepare(requests.Request("GET", url)), timeout=5)
+            assert response.status_code == 200 and response.text == ""
+        assert len(transport.session.cookies) == 0
+    finally:
+        transport.close()
+        server.shutdown()
+        server.server_close()
+
+
+def test_set_transport_closes_owned_transport(trustar, api):
+    closed = []
+    default = trustar._client.transport
+    default.close = lambda: closed.append(default)
+    transport = InMemoryTransport(api)
+    transport.close = lambda: closed.append(transport)
+
+    trustar.set_transport(transport)
+    trustar.set_transport(None)
+    # only the transport created by the client is closed; the caller owns the other one
+    assert closed == [default]
+
+
+def test_httpx_transport_over_http2_stand_in(tmp_path):
+    pytest.importorskip("httpx")
+    pytest.importorskip("h2")
+    trustme = pytest.importorskip("trustme")
+
+    cert = trustme.CA().issue_cert("127.0.0.1")
+    certfile = str(tmp_path / "cert.pem")
+    cert.private_key_and_cert_chain_pem.write_to_path(certfile)
+    api = StandInApi(seed=1)
+    api.populate(indicators=3000)
+
+    with Http2StandInServer(api, certfile=certfile) as server:
+        ts = TruStar(config=server.get_config())
+        transport = HttpxTransport()
+        ts.set_transport(transport)
+        assert ts.ping() == "pong"
+        assert ts._client.last_response.http_version == "HTTP/2"
+        # pages larger than the flow control window, fetched concurrently over the same connection
+        pages = list(iter_concurrently(lambda n: ts.get_indicators_page(page_number=n, page_size=1000), range(3)))
+        assert sum(len(page.items) for _, page, _ in pages) == 3000
+        assert len(transport._clients) == 1
+        transport.close()
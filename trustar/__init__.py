@@ -1,6 +1,19 @@
 from __future__ import absolute_import
 
 from .trustar import TruStar
+from .outbox import Outbox
+from .triage_tail import TriageTail
+from .redaction import Redactor
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .hedging import Hedger
+from .single_flight import SingleFlight
+from .batching import MicroBatcher
+from .transport import HttpxTransport, InMemoryTransport, RequestsTransport, Transport
+from .cache import ReportCache, TagIndex
+from .metrics import MetricsRegistry, get_path_template
+from .tracing import InMemoryTracer, Span, Tracer, get_tracer, set_tracer
+from .columnar import (ColumnarTable, DictionaryColumn, IndicatorSummaryTable, PhishingIndicatorTable,
+                       PhishingSubmissionTable)
 from .models import *
 from .utils import *
 
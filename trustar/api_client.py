@@ -4,14 +4,22 @@ from future import standard_library
 from six import string_types
 
 # external imports
+import functools
 import requests
 import requests.auth
+import threading
 import time
 from math import ceil
 from requests import HTTPError
 
 # local imports
+from .circuit_breaker import CircuitBreaker
+from .hedging import Hedger
 from .log import get_logger
+from .metrics import MetricsRegistry, get_path_template
+from .single_flight import SingleFlight
+from .tracing import get_tracer
+from .transport import RequestsTransport
 
 
 class ApiClient(object):
@@ -21,6 +29,9 @@ class ApiClient(object):
 
     logger = get_logger(__name__)
 
+    # the keyword arguments of requests.request that describe the request rather than how to send it
+    REQUEST_KWARGS = ('headers', 'params', 'data', 'json', 'files', 'auth', 'cookies')
+
     def __init__(self, config=None):
         """
         Constructs and configures the instance.  Initially attempts to use ``config``; if it is ``None``,
@@ -60,6 +71,14 @@ class ApiClient(object):
         +-------------------------+--------------------------------------------------------+
         | ``https_proxy``         | https proxy being used - http(s)://user:pwd@{ip}:{port}|
         +-------------------------+--------------------------------------------------------+
+        | ``metrics``             | whether to record request metrics                      |
+        +-------------------------+--------------------------------------------------------+
+        | ``circuit_breaker``     | whether to fail fast on endpoints that keep failing    |
+        +-------------------------+--------------------------------------------------------+
+        | ``hedging``             | whether to hedge slow idempotent requests              |
+        +-------------------------+--------------------------------------------------------+
+        | ``coalesce_requests``   | whether concurrent identical GETs share one request    |
+        +-------------------------+--------------------------------------------------------+
 
         :param dict config: A dictionary of configuration options.
         """
@@ -86,8 +105,88 @@ class ApiClient(object):
 
         # initialize token property
         self.token = None
-        # initialize last_response property
-        self.last_response = None
+        # the last response is kept per thread, see the last_response property
+        self._local = threading.local()
+
+        # time (in seconds since epoch) before which no request should be sent, shared by all threads using this
+        # client so that a 429 received by one of them pauses all of them
+        self._retry_after = 0
+        self._retry_after_lock = threading.Lock()
+
+        # sends the prepared requests
+        self.transport = None
+        self._owns_transport = False
+        self.set_transport(None)
+
+        # request metrics, which cost nothing more than a check of this flag while disabled
+        self.metrics = MetricsRegistry(enabled=bool(config.get('metrics')))
+
+        self.circuit_breaker = None
+        if config.get('circuit_breaker'):
+            self.set_circuit_breaker(CircuitBreaker())
+
+        self.hedger = None
+        if config.get('hedging'):
+            self.set_hedger(Hedger())
+
+        # concurrent identical GETs share one request
+        self.single_flight = SingleFlight() if config.get('coalesce_requests') else None
+
+    def set_circuit_breaker(self, circuit_breaker):
+        """
+        :param circuit_breaker: the |CircuitBreaker| to check before each request, or ``None``
+        """
+
+        if circuit_breaker is not None:
+            circuit_breaker.metrics = self.metrics
+        self.circuit_breaker = circuit_breaker
+
+    def set_hedger(self, hedger):
+        """
+        :param hedger: the |Hedger| of slow idempotent requests, or ``None``
+        """
+
+        if hedger is not None:
+            hedger.metrics = self.metrics
+        self.hedger = hedger
+
+    @property
+    def last_response(self):
+        """
+        The most recent response received by the current thread.
+        """
+
+        return getattr(self._local, 'last_response', None)
+
+    @last_response.setter
+    def last_response(self, response):
+        self._local.last_response = response
+
+    def set_transport(self, transport):
+        """
+        :param transport: the |Transport| to send requests through, or ``None`` for a new |RequestsTransport|.  The
+            transport replaced is closed if it was created by this client.
+        """
+
+        previous, owned = self.transport, self._owns_transport
+        self.transport = transport if transport is not None else RequestsTransport()
+        self._owns_transport = transport is None
+        if owned and previous is not None and previous is not self.transport:
+            previous.close()
+
+    def _prepare(self, method, url, **kwargs):
+        """
+        Prepares a request for the transport.
+
+        :param str method: the method of the request
+        :param str url: the URL of the request
+        :param kwargs: the keyword arguments of ``requests.request``, e.g. ``params``, ``json`` or ``timeout``
+        :return: a function without arguments that sends the request and returns its response
+        """
+
+        request_kwargs = dict((key, kwargs.pop(key)) for key in self.REQUEST_KWARGS if key in kwargs)
+        request = self.transport.prepare(requests.Request(method=method, url=url, **request_kwargs))
+        return functools.partial(self.transport.send, request, verify=self.verify, proxies=self.proxies, **kwargs)
 
     def _get_token(self):
         """
@@ -111,8 +210,12 @@ class ApiClient(object):
 
         # make request
         post_data = {"grant_type": "client_credentials"}
-        response = requests.post(self.auth, auth=client_auth, data=post_data, verify=self.verify, proxies=self.proxies)
+        with get_tracer().start_span('trustar.token') as span:
+            response = self._prepare("POST", self.auth, auth=client_auth, data=post_data)()
+            span.set_attribute('status_code', response.status_code)
+            span.set_attribute('trace_id', self._get_trace_id(response))
         self.last_response = response
+        self.metrics.record_token_refresh()
 
         # raise exception if status code indicates an error
         if 400 <= response.status_code < 600:
@@ -149,6 +252,26 @@ class ApiClient(object):
 
         return headers
 
+    def _defer_requests(self, wait_time):
+        """
+        Prevents any request from being sent by this client, from any thread, for the given amount of time.
+
+        :param wait_time: the number of seconds to wait
+        """
+
+        with self._retry_after_lock:
+            self._retry_after = max(self._retry_after, time.time() + wait_time)
+
+    def _wait_for_rate_limit(self):
+        """
+        Blocks until the rate limit wait time imposed by the most recent 429 response (if any) has passed.
+        """
+
+        wait_time = self._retry_after - time.time()
+        if wait_time > 0:
+            time.sleep(wait_time)
+            self.metrics.record_rate_limit_wait(wait_time)
+
     @classmethod
     def _is_expired_token_response(cls, response):
         """
@@ -172,19 +295,70 @@ class ApiClient(object):
 
     def request(self, method, path, headers=None, params=None, data=None, **kwargs):
         """
-        A wrapper around ``requests.request`` that handles boilerplate code specific to TruStar's API.
+        Sends a request through the |Transport| of this client, handling boilerplate code specific to TruStar's API.
 
         :param str method: The method of the request (``GET``, ``PUT``, ``POST``, or ``DELETE``)
         :param str path: The path of the request, i.e. the piece of the URL after the base URL
         :param dict headers: A dictionary of headers that will be merged with the base headers for the SDK
-        :param kwargs: Any extra keyword arguments.  These will be forwarded to the call to ``requests.request``.
+        :param kwargs: Any extra keyword arguments.  These are the keyword arguments of ``requests.request``.
         :return: The response object.
         """
 
+        with get_tracer().start_span('trustar.request', method=method, path=path) as span:
+            key = self._get_coalescing_key(method, path, headers, params, data, kwargs) \
+                if self.single_flight is not None else None
+            if key is None:
+                return self._request(span, method, path, headers=headers, params=params, data=data, **kwargs)
+
+            response, shared = self.single_flight.do(key, lambda: self._request(span, method, path, headers=headers,
+                                                                                 params=params, **kwargs))
+            if shared:
+                span.set_attribute('coalesced', True)
+                self.last_response = response
+                self.metrics.record_coalesced(method, get_path_template(path))
+            return response
+
+    @staticmethod
+    def _get_coalescing_key(method, path, headers, params, data, kwargs):
+        """
+        :return: a key identifying a request among concurrent identical requests, or ``None`` if the request must not
+            be coalesced with others
+        """
+
+        # only requests without side effects and fully described by their path, params and headers
+        if method != 'GET' or data is not None or set(kwargs) - {'timeout'}:
+            return None
+
+        def freeze(values):
+            if values is None:
+                return None
+            items = values.items() if isinstance(values, dict) else values
+            return tuple(sorted((key, tuple(value) if isinstance(value, list) else value) for key, value in items))
+
+        try:
+            key = (method, path, freeze(params), freeze(headers))
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def _request(self, span, method, path, headers=None, params=None, data=None, **kwargs):
+        """
+        Makes a request, retrying it as needed, and records the attempts on the given tracing span.  See |request|.
+        """
+
+        trace_ids = []
         retry = self.retry
         attempted = False
+        breaker = self.circuit_breaker
+        hedger = self.hedger
+        template = get_path_template(path) if self.metrics.enabled or breaker is not None or hedger is not None \
+            else None
         while not attempted or retry:
 
+            if attempted and self.metrics.enabled:
+                self.metrics.record_retry(method, template)
+
             # get headers and merge with headers from method parameter if it exists
             base_headers = self._get_headers(is_json=method in ["POST", "PUT"])
             if headers is not None:
@@ -192,21 +366,53 @@ class ApiClient(object):
 
             url = "{}/{}".format(self.base, path)
 
+            # wait if another request has recently been told to back off
+            self._wait_for_rate_limit()
+
             # make request
-            response = requests.request(method=method,
-                                        url=url,
-                                        headers=base_headers,
-                                        verify=self.verify,
-                                        params=params,
-                                        data=data,
-                                        proxies=self.proxies,
-                                        **kwargs)
+            send = self._prepare(method, url, headers=base_headers, params=params, data=data, **kwargs)
+
+            # fail fast if this endpoint keeps failing
+            if breaker is not None:
+                breaker.before_request(template)
+
+            start = time.time()
+            # whether the endpoint answered properly; None if the request failed for a reason unrelated to the endpoint
+            healthy = None
+            try:
+                if hedger is not None and hedger.is_idempotent(method, template):
+                    response = hedger.send(method, template, send)
+                else:
+                    response = send()
+                healthy = response.status_code < 500
+            except requests.exceptions.RequestException:
+                healthy = False
+                raise
+            finally:
+                # always record the outcome, or at least release the slot of a half-open probe
+                if breaker is not None:
+                    if healthy is None:
+                        breaker.release(template)
+                    else:
+                        breaker.record(template, healthy, time.time() - start)
             self.last_response = response
             attempted = True
 
+            if self.metrics.enabled:
+                body = getattr(response.request, 'body', None)
+                self.metrics.record_request(method, template, response.status_code, time.time() - start,
+                                            bytes_sent=len(body) if body else 0,
+                                            bytes_received=len(response.content))
+
             # log request
             self.logger.debug("%s %s. Trace-Id: %s. Params: %s", method, url, response.headers.get('Trace-Id'), params)
 
+            trace_ids.append(self._get_trace_id(response))
+            span.set_attribute('attempts', len(trace_ids))
+            span.set_attribute('trace_ids', trace_ids)
+            span.set_attribute('trace_id', trace_ids[-1])
+            span.set_attribute('status_code', response.status_code)
+
             # refresh token if expired
             if self._is_expired_token_response(response):
                 self._refresh_token()
@@ -218,7 +424,7 @@ class ApiClient(object):
 
                 # if wait time exceeds max wait time, allow the exception to be thrown
                 if wait_time <= self.max_wait_time:
-                    time.sleep(wait_time)
+                    self._defer_requests(wait_time)
                 else:
                     retry = False
 
@@ -258,9 +464,8 @@ class ApiClient(object):
         against all logs for a request across TruSTAR's platform.  This method returns the trace ID for the most recent
         request made by this SDK.
 
-        :return: The trace ID.
-
-        .. warning:: This method is not thread-safe.  Do not use the same instance of this class in multiple threads.
+        :return: The trace ID of the most recent request made by the current thread.  To correlate the trace IDs of
+            concurrent requests, install a |Tracer| with |set_tracer| instead.
         """
         # find the last response stored in the thread context
         if self.last_response is None:
@@ -280,7 +485,7 @@ class ApiClient(object):
         Convenience method for making ``GET`` calls.
 
         :param str path: The path of the request, i.e. the piece of the URL after the base URL.
-        :param kwargs: Any extra keyword arguments.  These will be forwarded to the call to ``requests.request``.
+        :param kwargs: Any extra keyword arguments.  These are the keyword arguments of ``requests.request``.
         :return: The response object.
         """
 
@@ -291,7 +496,7 @@ class ApiClient(object):
         Convenience method for making ``PUT`` calls.
 
         :param str path: The path of the request, i.e. the piece of the URL after the base URL.
-        :param kwargs: Any extra keyword arguments.  These will be forwarded to the call to ``requests.request``.
+        :param kwargs: Any extra keyword arguments.  These are the keyword arguments of ``requests.request``.
         :return: The response object.
         """
 
@@ -302,7 +507,7 @@ class ApiClient(object):
         Convenience method for making ``POST`` calls.
 
         :param str path: The path of the request, i.e. the piece of the URL after the base URL.
-        :param kwargs: Any extra keyword arguments.  These will be forwarded to the call to ``requests.request``.
+        :param kwargs: Any extra keyword arguments.  These are the keyword arguments of ``requests.request``.
         :return: The response object.
         """
 
@@ -313,7 +518,7 @@ class ApiClient(object):
         Convenience method for making ``DELETE`` calls.
 
         :param str path: The path of the request, i.e. the piece of the URL after the base URL.
-        :param kwargs: Any extra keyword arguments.  These will be forwarded to the call to ``requests.request``.
+        :param kwargs: Any extra keyword arguments.  These are the keyword arguments of ``requests.request``.
         :return: The response object.
         """
 
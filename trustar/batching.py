@@ -0,0 +1,153 @@
+# python 2 backwards compatibility
+from __future__ import print_function
+from builtins import object
+
+# external imports
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# package imports
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+
+class MicroBatcher(object):
+    """
+    Merges single-item lookups made from anywhere in an application into bulk requests.  A lookup waits up to
+    ``max_delay`` seconds for others to join it, or until ``max_batch_size`` distinct keys are waiting, then all of
+    them are passed to ``batch_func`` at once and each caller gets back the result for its own key.
+
+    It can be used from threads, with |load|, and from ``asyncio`` coroutines, with |load_async|.  See
+    |get_indicator_metadata_batcher| and |get_indicator_details_batcher|.
+
+    Example:
+
+    >>> batcher = ts.get_indicator_details_batcher()
+    >>> # called from many threads at once, these make a single request
+    >>> indicator = batcher.load('evil.com')
+    """
+
+    def __init__(self, batch_func, max_batch_size=100, max_delay=0.01, default=None):
+        """
+        :param batch_func: a function that takes a list of distinct keys, and returns a dictionary from keys to results
+        :param int max_batch_size: the maximum number of keys passed to ``batch_func`` at once
+        :param float max_delay: the maximum number of seconds a lookup waits for others to join it
+        :param default: the result for keys missing from the dictionary returned by ``batch_func``
+        """
+
+        self.batch_func = batch_func
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.default = default
+
+        self.batches = 0
+        self.loads = 0
+
+        # keys waiting to be sent, each with the futures of their callers
+        self._pending = OrderedDict()
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def submit(self, key):
+        """
+        Adds a lookup to the current batch.
+
+        :param key: the key to look up
+        :return: a ``concurrent.futures.Future`` of its result
+        """
+
+        future = Future()
+        batch = None
+        with self._lock:
+            self.loads += 1
+            self._pending.setdefault(key, []).append(future)
+            if len(self._pending) >= self.max_batch_size:
+                batch = self._take_batch()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.max_delay, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+        if batch is not None:
+            self._dispatch(batch)
+        return future
+
+    def load(self, key):
+        """
+        Looks up a key, blocking until the batch it is part of has been sent.
+
+        :param key: the key to look up
+        :return: its result
+        """
+
+        return self.submit(key).result()
+
+    def load_many(self, keys):
+        """
+        :param keys: the keys to look up
+        :return: their results, in the same order
+        """
+
+        futures = [self.submit(key) for key in keys]
+        return [future.result() for future in futures]
+
+    def load_async(self, key):
+        """
+        Looks up a key from a coroutine, without blocking the event loop.
+
+        :param key: the key to look up
+        :return: an ``asyncio`` future of its result
+        """
+
+        import asyncio
+        return asyncio.wrap_future(self.submit(key))
+
+    def flush(self):
+        """
+        Sends the current batch now, without waiting for ``max_delay`` or ``max_batch_size``.
+        """
+
+        self._flush()
+
+    def _take_batch(self):
+        # called with the lock held
+        batch = self._pending
+        self._pending = OrderedDict()
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def _flush(self):
+        with self._lock:
+            batch = self._take_batch()
+        if batch:
+            self._run(batch)
+
+    def _dispatch(self, batch):
+        # the caller that filled the batch should not wait for the whole batch to be sent before getting its future
+        thread = threading.Thread(target=self._run, args=(batch,))
+        thread.daemon = True
+        thread.start()
+
+    def _run(self, batch):
+        with self._lock:
+            self.batches += 1
+        try:
+            results = self.batch_func(list(batch))
+            resolved = [(futures, results.get(key, self.default)) for key, futures in batch.items()]
+        except Exception as e:
+            # including a batch_func that does not return a dictionary; no caller may be left waiting
+            logger.debug("Batch of %d keys failed: %s" % (len(batch), e))
+            for futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+
+        for futures, result in resolved:
+            for future in futures:
+                if not future.done():
+                    future.set_result(result)
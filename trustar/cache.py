@@ -0,0 +1,199 @@
+# python 2 backwards compatibility
+from __future__ import print_function
+from builtins import object
+
+# external imports
+import copy
+import threading
+from collections import OrderedDict
+
+# package imports
+from .models import IdType
+
+
+class ReportCache(object):
+    """
+    A thread-safe, size-bounded cache of |Report| objects, keyed by report ID and ``updated`` timestamp.  A lookup
+    that gives an ``updated`` timestamp only hits if the cached copy is at least that recent, so a listing of reports
+    (e.g. from |get_reports|) can be used to decide which cached report bodies are still current.  When the cache is
+    full, the least recently used report is evicted.  The cache stores and returns copies, so that callers can modify
+    the reports they get without affecting each other.
+
+    Example:
+
+    >>> cache = ReportCache(max_size=50000)
+    >>> results = ts.get_reports_details(report_ids, cache=cache)
+    """
+
+    def __init__(self, max_size=10000):
+        """
+        :param int max_size: the maximum number of reports to keep
+        """
+
+        self.max_size = max_size
+        self._reports = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._reports)
+
+    @staticmethod
+    def _copy(report):
+        # deep, so that lists such as the enclave IDs are not shared either
+        return copy.deepcopy(report)
+
+    @staticmethod
+    def _key(report_id, id_type=None):
+        return (id_type or IdType.INTERNAL, report_id)
+
+    def get(self, report_id, id_type=None, updated=None):
+        """
+        Looks up a report.
+
+        :param report_id: the ID of the report
+        :param id_type: indicates whether the ID is internal or external
+        :param int updated: if given, only a cached report updated at or after this time (in milliseconds since epoch)
+            is returned
+        :return: a copy of the |Report| object, or ``None`` if there is no suitable cached copy
+        """
+
+        key = self._key(report_id, id_type)
+        with self._lock:
+            report = self._reports.get(key)
+            if report is None:
+                return None
+            if updated is not None and (report.updated is None or report.updated < updated):
+                return None
+            # mark as most recently used
+            self._reports[key] = self._reports.pop(key)
+        return self._copy(report)
+
+    def put(self, report):
+        """
+        Stores a report under its internal ID, and under its external ID if it has one.  A report is never replaced
+        by an older copy of itself.
+
+        :param report: the |Report| object, of which a copy is stored
+        """
+
+        report = self._copy(report)
+        keys = []
+        if report.id is not None:
+            keys.append(self._key(report.id))
+        if report.external_id is not None:
+            keys.append(self._key(report.external_id, IdType.EXTERNAL))
+
+        with self._lock:
+            for key in keys:
+                existing = self._reports.get(key)
+                if existing is not None and existing.updated is not None and report.updated is not None \
+                        and existing.updated > report.updated:
+                    continue
+                self._reports.pop(key, None)
+                self._reports[key] = report
+
+            while len(self._reports) > self.max_size:
+                self._reports.popitem(last=False)
+
+    def clear(self):
+        """
+        Removes all reports from the cache.
+        """
+
+        with self._lock:
+            self._reports.clear()
+
+
+class TagIndex(object):
+    """
+    An index of the report tags and indicator tags of a set of enclaves, by enclave ID and tag name.  Obtain one with
+    |get_tag_index|, which caches it, rather than scanning the lists returned by |get_all_enclave_tags| and
+    |get_all_indicator_tags|.
+
+    Example:
+
+    >>> index = ts.get_tag_index()
+    >>> tag_id = index.get_indicator_tag_id("malicious", enclave_id)
+    """
+
+    def __init__(self, report_tags=None, indicator_tags=None):
+        """
+        :param list(Tag) report_tags: the report tags, as returned by |get_all_enclave_tags|
+        :param list(Tag) indicator_tags: the indicator tags, as returned by |get_all_indicator_tags|
+        """
+
+        self._report_tags = {}
+        self._indicator_tags = {}
+        self._lock = threading.Lock()
+
+        for tag in report_tags or []:
+            self._add(self._report_tags, tag)
+        for tag in indicator_tags or []:
+            self._add(self._indicator_tags, tag)
+
+    @staticmethod
+    def _add(tags, tag):
+        tags.setdefault(tag.enclave_id, {})[tag.name] = tag
+
+    @staticmethod
+    def _get(tags, name, enclave_id=None):
+        if enclave_id is not None:
+            return tags.get(enclave_id, {}).get(name)
+
+        # without an enclave, the name must identify a single tag
+        matches = [enclave_tags[name] for enclave_tags in tags.values() if name in enclave_tags]
+        if len(matches) > 1:
+            raise ValueError("There are tags named '%s' in %d enclaves; specify the enclave ID."
+                             % (name, len(matches)))
+        return matches[0] if matches else None
+
+    def get_report_tag(self, name, enclave_id=None):
+        """
+        :param str name: the name of the tag
+        :param str enclave_id: the ID of the enclave of the tag (optional - by default, any enclave)
+        :return: the |Tag| object, or ``None`` if there is no such report tag
+        :raises ValueError: if no enclave is given, and tags with this name exist in several enclaves
+        """
+
+        return self._get(self._report_tags, name, enclave_id)
+
+    def get_indicator_tag(self, name, enclave_id=None):
+        """
+        :param str name: the name of the tag
+        :param str enclave_id: the ID of the enclave of the tag (optional - by default, any enclave)
+        :return: the |Tag| object, or ``None`` if there is no such indicator tag
+        :raises ValueError: if no enclave is given, and tags with this name exist in several enclaves
+        """
+
+        return self._get(self._indicator_tags, name, enclave_id)
+
+    def get_indicator_tag_id(self, name, enclave_id=None):
+        """
+        :param str name: the name of the tag
+        :param str enclave_id: the ID of the enclave of the tag (optional - by default, any enclave)
+        :return: the ID of the indicator tag, or ``None`` if there is no such indicator tag
+        :raises ValueError: if no enclave is given, and tags with this name exist in several enclaves
+        """
+
+        tag = self.get_indicator_tag(name, enclave_id)
+        return tag.id if tag is not None else None
+
+    def get_report_tag_names(self, enclave_id=None):
+        """
+        :param str enclave_id: the ID of an enclave (optional - by default, all enclaves)
+        :return: the set of names of the report tags
+        """
+
+        if enclave_id is not None:
+            return set(self._report_tags.get(enclave_id, {}))
+        return set(name for enclave_tags in self._report_tags.values() for name in enclave_tags)
+
+    def add_indicator_tag(self, tag):
+        """
+        Adds an indicator tag to the index, i.e. after creating it with |add_indicator_tag|.
+
+        :param tag: the |Tag| object
+        """
+
+        with self._lock:
+            self._add(self._indicator_tags, tag)
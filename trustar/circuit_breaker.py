@@ -0,0 +1,221 @@
+# python 2 backwards compatibility
+from __future__ import print_function
+from builtins import object
+
+# external imports
+import threading
+import time
+from collections import deque
+from requests.exceptions import ConnectionError
+
+# package imports
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+
+class CircuitOpenError(ConnectionError):
+    """
+    Raised instead of making a request to an endpoint whose circuit is open.  It is a ``ConnectionError``, so code that
+    retries connection failures later (such as the |Outbox|) handles it the same way.
+    """
+
+    def __init__(self, template, retry_after):
+        super(CircuitOpenError, self).__init__("Circuit open for %s; not retrying for %.1f seconds."
+                                               % (template, retry_after))
+        self.template = template
+        self.retry_after = retry_after
+
+
+class _Circuit(object):
+
+    def __init__(self, window_size):
+        self.state = CircuitBreaker.CLOSED
+        self.outcomes = deque(maxlen=window_size)
+        self.opened_at = None
+        self.probes_in_flight = 0
+        self.probe_successes = 0
+
+
+class CircuitBreaker(object):
+    """
+    Tracks the health of each endpoint, by path template (see |get_path_template|), and stops sending requests to an
+    endpoint that keeps failing.
+
+    A request fails if it raises a connection error or a timeout, gets a 5xx response, or takes longer than
+    ``slow_call_threshold`` seconds.  When at least ``minimum_requests`` of the last ``window_size`` requests to an
+    endpoint were made, and the proportion of failures among them reaches ``failure_threshold``, the circuit of that
+    endpoint opens:  requests to it raise a |CircuitOpenError| immediately, without being sent.  After
+    ``open_duration`` seconds, the circuit is half-open, and lets up to ``half_open_probes`` requests through.  If
+    they all succeed, the circuit closes again; if any of them fails, it opens again.
+
+    Enable the default circuit breaker with the ``circuit_breaker`` config key of |TruStar|, or install a configured
+    one with |set_circuit_breaker|.  State changes are logged, counted by the |MetricsRegistry|, and passed to the
+    listeners registered with |CircuitBreaker.add_listener|.
+
+    Example:
+
+    >>> breaker = CircuitBreaker(failure_threshold=0.5, slow_call_threshold=10, open_duration=30)
+    >>> breaker.add_listener(lambda template, old, new: print(template, old, "->", new))
+    >>> ts.set_circuit_breaker(breaker)
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=0.5, minimum_requests=10, window_size=50, slow_call_threshold=None,
+                 open_duration=30, half_open_probes=1):
+        """
+        :param float failure_threshold: the proportion of failed requests at which the circuit opens
+        :param int minimum_requests: the number of recent requests needed before the circuit can open
+        :param int window_size: the number of recent requests of each endpoint considered
+        :param slow_call_threshold: the number of seconds after which a request counts as failed (optional)
+        :param open_duration: the number of seconds a circuit stays open before letting probe requests through
+        :param int half_open_probes: the number of probe requests that must succeed to close the circuit
+        """
+
+        self.failure_threshold = failure_threshold
+        self.minimum_requests = minimum_requests
+        self.window_size = window_size
+        self.slow_call_threshold = slow_call_threshold
+        self.open_duration = open_duration
+        self.half_open_probes = half_open_probes
+
+        # set by the ApiClient that uses this breaker, to count state changes
+        self.metrics = None
+
+        self._circuits = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener):
+        """
+        Registers a function to be called on every state change, as ``listener(template, old_state, new_state)``.
+
+        :param listener: the function
+        """
+
+        self._listeners.append(listener)
+
+    def get_state(self, template):
+        """
+        :param str template: a path template
+        :return: the state of the circuit of the endpoint:  ``CircuitBreaker.CLOSED``, ``OPEN`` or ``HALF_OPEN``
+        """
+
+        with self._lock:
+            circuit = self._circuits.get(template)
+            return circuit.state if circuit is not None else self.CLOSED
+
+    def get_states(self):
+        """
+        :return: a dictionary from each path template that has been requested to the state of its circuit
+        """
+
+        with self._lock:
+            return dict((template, circuit.state) for template, circuit in self._circuits.items())
+
+    def _get_circuit(self, template):
+        circuit = self._circuits.get(template)
+        if circuit is None:
+            circuit = self._circuits[template] = _Circuit(self.window_size)
+        return circuit
+
+    def _transition(self, template, circuit, state, changes):
+        # called with the lock held; the listeners are called once it is released
+        if circuit.state == state:
+            return
+        changes.append((template, circuit.state, state))
+        circuit.state = state
+        if state == self.OPEN:
+            circuit.opened_at = time.time()
+        elif state == self.CLOSED:
+            circuit.outcomes.clear()
+        circuit.probes_in_flight = 0
+        circuit.probe_successes = 0
+
+    def _notify(self, changes):
+        for template, old_state, new_state in changes:
+            logger.warning("Circuit for %s changed from %s to %s." % (template, old_state, new_state))
+            if self.metrics is not None:
+                self.metrics.record_circuit_state_change(template, new_state)
+            for listener in self._listeners:
+                try:
+                    listener(template, old_state, new_state)
+                except Exception as e:
+                    logger.error("Error in circuit breaker listener: %s" % e)
+
+    def before_request(self, template):
+        """
+        Must be called before each request.
+
+        :param str template: the path template of the request
+        :raises CircuitOpenError: if the circuit of the endpoint is open, or half-open with all probes in flight
+        """
+
+        changes = []
+        try:
+            with self._lock:
+                circuit = self._get_circuit(template)
+
+                if circuit.state == self.OPEN:
+                    remaining = circuit.opened_at + self.open_duration - time.time()
+                    if remaining > 0:
+                        raise CircuitOpenError(template, remaining)
+                    self._transition(template, circuit, self.HALF_OPEN, changes)
+
+                if circuit.state == self.HALF_OPEN:
+                    if circuit.probes_in_flight + circuit.probe_successes >= self.half_open_probes:
+                        raise CircuitOpenError(template, 0)
+                    circuit.probes_in_flight += 1
+        finally:
+            self._notify(changes)
+
+    def release(self, template):
+        """
+        Must be called instead of :meth:`record` after a request that :meth:`before_request` let through, if the
+        request failed for a reason that says nothing about the health of the endpoint, e.g. a bug in the caller.
+
+        :param str template: the path template of the request
+        """
+
+        with self._lock:
+            circuit = self._get_circuit(template)
+            if circuit.state == self.HALF_OPEN:
+                circuit.probes_in_flight = max(0, circuit.probes_in_flight - 1)
+
+    def record(self, template, success, latency=None):
+        """
+        Must be called after each request that :meth:`before_request` let through, unless :meth:`release` is.
+
+        :param str template: the path template of the request
+        :param boolean success: ``False`` if the request raised a connection error or got a 5xx response
+        :param float latency: the duration of the request, in seconds
+        """
+
+        if success and self.slow_call_threshold is not None and latency is not None \
+                and latency > self.slow_call_threshold:
+            success = False
+
+        changes = []
+        with self._lock:
+            circuit = self._get_circuit(template)
+
+            if circuit.state == self.HALF_OPEN:
+                circuit.probes_in_flight = max(0, circuit.probes_in_flight - 1)
+                if not success:
+                    self._transition(template, circuit, self.OPEN, changes)
+                else:
+                    circuit.probe_successes += 1
+                    if circuit.probe_successes >= self.half_open_probes:
+                        self._transition(template, circuit, self.CLOSED, changes)
+
+            elif circuit.state == self.CLOSED:
+                circuit.outcomes.append(success)
+                failures = sum(1 for outcome in circuit.outcomes if not outcome)
+                if len(circuit.outcomes) >= self.minimum_requests \
+                        and failures >= self.failure_threshold * len(circuit.outcomes):
+                    self._transition(template, circuit, self.OPEN, changes)
+
+        self._notify(changes)
@@ -0,0 +1,441 @@
+# python 2 backwards compatibility
+from __future__ import print_function, division
+from builtins import object, range
+
+# external imports
+import bisect
+import heapq
+import math
+from array import array
+
+# package imports
+from .models import ModelBase
+
+NAN = float('nan')
+
+
+class DictionaryColumn(object):
+    """
+    A column of repetitive values, such as indicator types or source keys, stored as an array of integer codes into a
+    dictionary of the distinct values.  Group-by operations work on the codes, and never compare the values themselves.
+    """
+
+    def __init__(self):
+        self.values = []
+        self.codes = array('l')
+        self._index = {}
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, i):
+        return self.values[self.codes[i]]
+
+    def encode(self, value):
+        """
+        :param value: a value
+        :return: the code of the value, which is added to the dictionary if it is not in it yet
+        """
+
+        code = self._index.get(value)
+        if code is None:
+            code = len(self.values)
+            self._index[value] = code
+            self.values.append(value)
+        return code
+
+    def get_code(self, value):
+        """
+        :param value: a value
+        :return: the code of the value, or ``None`` if the column does not contain it
+        """
+
+        return self._index.get(value)
+
+    def append(self, value):
+        self.codes.append(self.encode(value))
+
+
+class ColumnarTable(object):
+    """
+    A table of items, such as the items of the pages returned by the phishing triage endpoints, stored column by
+    column:  repetitive string fields are dictionary-encoded (see |DictionaryColumn|), numeric fields are stored in
+    arrays of floats (missing or non-numeric values are stored as NaN, and ignored by the aggregations), and any other
+    fields are stored in lists.  Items can be given either as model objects or as the dictionaries returned by the API,
+    in which case no model objects are built at all.
+
+    Subclasses declare their columns in ``DICTIONARY_COLUMNS``, ``NUMERIC_COLUMNS`` and ``OBJECT_COLUMNS``, as
+    ``(column name, dictionary key)`` tuples.  The key of a field of a nested dictionary is a tuple of keys.
+    """
+
+    DICTIONARY_COLUMNS = ()
+    NUMERIC_COLUMNS = ()
+    OBJECT_COLUMNS = ()
+
+    def __init__(self, items=None):
+        """
+        :param items: an iterable of items to add to the table (optional)
+        """
+
+        self.columns = {}
+        for name, _ in self.DICTIONARY_COLUMNS:
+            self.columns[name] = DictionaryColumn()
+        for name, _ in self.NUMERIC_COLUMNS:
+            self.columns[name] = array('d')
+        for name, _ in self.OBJECT_COLUMNS:
+            self.columns[name] = []
+        self._length = 0
+
+        if items is not None:
+            self.extend(items)
+
+    def __len__(self):
+        return self._length
+
+    @staticmethod
+    def _to_number(value):
+        if value is None:
+            return NAN
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return NAN
+
+    @staticmethod
+    def _get(item, key):
+        if not isinstance(key, tuple):
+            return item.get(key)
+        for k in key:
+            item = item.get(k) if item is not None else None
+        return item
+
+    def append(self, item):
+        """
+        Adds an item to the table.
+
+        :param item: a model object, or its dictionary representation
+        """
+
+        if isinstance(item, ModelBase):
+            item = item.to_dict()
+
+        for name, key in self.DICTIONARY_COLUMNS:
+            self.columns[name].append(self._get(item, key))
+        for name, key in self.NUMERIC_COLUMNS:
+            self.columns[name].append(self._to_number(self._get(item, key)))
+        for name, key in self.OBJECT_COLUMNS:
+            self.columns[name].append(self._get(item, key))
+        self._length += 1
+
+    def extend(self, items):
+        """
+        Adds items to the table.
+
+        :param items: an iterable of model objects, or of their dictionary representations
+        """
+
+        for item in items:
+            self.append(item)
+
+    def extend_pages(self, pages):
+        """
+        Adds the items of pages to the table.
+
+        :param pages: an iterable of |Page| objects, or of page dictionaries as returned by the API
+        """
+
+        for page in pages:
+            self.extend(page.get('items', []) if isinstance(page, dict) else page.items)
+
+    def get_row(self, i):
+        """
+        :param int i: the index of a row
+        :return: the row, as a dictionary from column name to value
+        """
+
+        row = {}
+        for name, column in self.columns.items():
+            value = column[i]
+            row[name] = None if isinstance(value, float) and math.isnan(value) else value
+        return row
+
+    def _get_dictionary_column(self, name):
+        column = self.columns.get(name)
+        if not isinstance(column, DictionaryColumn):
+            raise ValueError("'%s' is not a dictionary-encoded column of this table." % name)
+        return column
+
+    def _get_numeric_column(self, name):
+        column = self.columns.get(name)
+        if not isinstance(column, array) or column.typecode != 'd':
+            raise ValueError("'%s' is not a numeric column of this table." % name)
+        return column
+
+    def group_by(self, by, column, aggregate='mean'):
+        """
+        Aggregates a numeric column for each value of a dictionary-encoded column.
+
+        :param str by: the name of the dictionary-encoded column to group by
+        :param str column: the name of the numeric column to aggregate
+        :param str aggregate: one of ``count``, ``sum``, ``mean``, ``min`` or ``max``
+        :return: a dictionary from each value of ``by`` to the aggregate of ``column`` over the rows with that value;
+            groups whose values are all missing are omitted (except from ``count``, where they are 0)
+
+        Example:
+
+        >>> table = PhishingIndicatorTable(ts.get_phishing_indicators())
+        >>> table.group_by('source_key', 'normalized_indicator_score', 'mean')
+        {'virustotal': 2.4, 'crowdstrike_indicator': 1.75}
+        """
+
+        if aggregate not in ('count', 'sum', 'mean', 'min', 'max'):
+            raise ValueError("Unknown aggregate '%s'." % aggregate)
+
+        groups = self._get_dictionary_column(by)
+        values = self._get_numeric_column(column)
+
+        size = len(groups.values)
+        counts = array('l', [0]) * size
+        sums = array('d', [0.0]) * size
+        mins = array('d', [float('inf')]) * size
+        maxes = array('d', [float('-inf')]) * size
+
+        for code, value in zip(groups.codes, values):
+            if value != value:
+                # NaN, i.e. a missing value
+                continue
+            counts[code] += 1
+            sums[code] += value
+            if value < mins[code]:
+                mins[code] = value
+            if value > maxes[code]:
+                maxes[code] = value
+
+        result = {}
+        for code, group in enumerate(groups.values):
+            if aggregate == 'count':
+                result[group] = counts[code]
+            elif counts[code] == 0:
+                continue
+            elif aggregate == 'sum':
+                result[group] = sums[code]
+            elif aggregate == 'mean':
+                result[group] = sums[code] / counts[code]
+            elif aggregate == 'min':
+                result[group] = mins[code]
+            else:
+                result[group] = maxes[code]
+        return result
+
+    def pivot(self, index, columns, values, aggregate='max'):
+        """
+        Aggregates a numeric column for each pair of values of two dictionary-encoded columns.
+
+        :param str index: the name of the dictionary-encoded column whose values are the keys of the result
+        :param str columns: the name of the dictionary-encoded column whose values are the keys of each inner dictionary
+        :param str values: the name of the numeric column to aggregate
+        :param str aggregate: one of ``count``, ``sum``, ``min`` or ``max``
+        :return: a dictionary from each value of ``index`` to a dictionary from each value of ``columns`` to the
+            aggregate; pairs without any non-missing value are omitted
+
+        Example:
+
+        >>> table.pivot('value', 'source_key', 'severity_level')
+        {'evil.com': {'virustotal': 3.0, 'crowdstrike': 2.0}}
+        """
+
+        if aggregate not in ('count', 'sum', 'min', 'max'):
+            raise ValueError("Unknown aggregate '%s'." % aggregate)
+
+        rows = self._get_dictionary_column(index)
+        cols = self._get_dictionary_column(columns)
+        numbers = self._get_numeric_column(values)
+
+        # aggregate by a single integer per pair of codes
+        width = len(cols.values)
+        cells = {}
+        for row_code, col_code, value in zip(rows.codes, cols.codes, numbers):
+            if value != value:
+                continue
+            cell = row_code * width + col_code
+            current = cells.get(cell)
+            if current is None:
+                cells[cell] = 1 if aggregate == 'count' else value
+            elif aggregate == 'count':
+                cells[cell] = current + 1
+            elif aggregate == 'sum':
+                cells[cell] = current + value
+            elif aggregate == 'min':
+                cells[cell] = min(current, value)
+            else:
+                cells[cell] = max(current, value)
+
+        result = {}
+        for cell, value in cells.items():
+            row_code, col_code = divmod(cell, width)
+            result.setdefault(rows.values[row_code], {})[cols.values[col_code]] = value
+        return result
+
+    def count_distinct(self, by, column):
+        """
+        Counts the distinct values of a dictionary-encoded column for each value of another.
+
+        :param str by: the name of the dictionary-encoded column to group by
+        :param str column: the name of the dictionary-encoded column whose distinct values are counted
+        :return: a dictionary from each value of ``by`` to the number of distinct values of ``column`` in its rows
+        """
+
+        groups = self._get_dictionary_column(by)
+        counted = self._get_dictionary_column(column)
+
+        pairs = set(zip(groups.codes, counted.codes))
+        counts = [0] * len(groups.values)
+        for code, _ in pairs:
+            counts[code] += 1
+        return {group: counts[code] for code, group in enumerate(groups.values) if counts[code]}
+
+    def histogram(self, column, by=None, bins=None):
+        """
+        Counts the values of a numeric column.
+
+        :param str column: the name of the numeric column
+        :param str by: the name of a dictionary-encoded column to compute a histogram for each value of (optional)
+        :param list bins: the ascending edges of the bins; if given, the histogram is a list of counts, where the
+            count at ``i`` is the number of values ``v`` with ``bins[i] <= v < bins[i + 1]`` (values outside the edges
+            are not counted).  By default, each distinct value is counted, which suits the 0-3 scores.
+        :return: a dictionary from each value to its count (or a list of counts per bin), or, if ``by`` is given, a
+            dictionary from each value of ``by`` to its histogram
+        """
+
+        values = self._get_numeric_column(column)
+        groups = self._get_dictionary_column(by).codes if by is not None else None
+
+        def new_histogram():
+            return [0] * (len(bins) - 1) if bins is not None else {}
+
+        histograms = {}
+        for i, value in enumerate(values):
+            if value != value:
+                continue
+            code = groups[i] if groups is not None else None
+            histogram = histograms.get(code)
+            if histogram is None:
+                histogram = histograms[code] = new_histogram()
+
+            if bins is None:
+                value = int(value) if value.is_integer() else value
+                histogram[value] = histogram.get(value, 0) + 1
+            else:
+                b = bisect.bisect_right(bins, value) - 1
+                if 0 <= b < len(bins) - 1:
+                    histogram[b] += 1
+
+        if groups is None:
+            return histograms.get(None, new_histogram())
+        dictionary = self.columns[by].values
+        return {dictionary[code]: histogram for code, histogram in histograms.items()}
+
+    def top_k(self, column, k=10, by=None):
+        """
+        Finds the rows with the highest values of a numeric column.  Rows where the value is missing are ignored.
+
+        :param str column: the name of the numeric column
+        :param int k: the number of rows to return
+        :param str by: the name of a dictionary-encoded column to find the top rows for each value of (optional)
+        :return: a list of at most ``k`` rows, as dictionaries, in descending order of ``column``, or, if ``by`` is
+            given, a dictionary from each value of ``by`` to such a list
+        """
+
+        values = self._get_numeric_column(column)
+
+        if by is None:
+            indexes = heapq.nlargest(k, (i for i in range(len(values)) if values[i] == values[i]),
+                                     key=values.__getitem__)
+            return [self.get_row(i) for i in indexes]
+
+        groups = self._get_dictionary_column(by)
+        heaps = {}
+        for i, (code, value) in enumerate(zip(groups.codes, values)):
+            if value != value:
+                continue
+            heap = heaps.setdefault(code, [])
+            # keep a min-heap of the k largest values of each group
+            if len(heap) < k:
+                heapq.heappush(heap, (value, -i))
+            elif value > heap[0][0]:
+                heapq.heapreplace(heap, (value, -i))
+
+        return {groups.values[code]: [self.get_row(-i) for _, i in sorted(heap, reverse=True)]
+                for code, heap in heaps.items()}
+
+
+class PhishingIndicatorTable(ColumnarTable):
+    """
+    A |ColumnarTable| of |PhishingIndicator| objects, e.g. as returned by |get_phishing_indicators|.
+
+    Example:
+
+    >>> table = PhishingIndicatorTable()
+    >>> table.extend(ts.get_phishing_indicators(from_time=from_time))
+    >>> table.histogram('normalized_indicator_score', by='indicator_type')
+    {'URL': {3: 120, 2: 48}, 'IP': {3: 12, 1: 4}}
+    """
+
+    DICTIONARY_COLUMNS = (('indicator_type', 'indicatorType'),
+                          ('source_key', 'sourceKey'))
+    NUMERIC_COLUMNS = (('normalized_indicator_score', 'normalizedIndicatorScore'),
+                       ('original_indicator_score', 'originalIndicatorScore'))
+    OBJECT_COLUMNS = (('value', 'value'),)
+
+
+class PhishingSubmissionTable(ColumnarTable):
+    """
+    A |ColumnarTable| of |PhishingSubmission| objects, e.g. as returned by |get_phishing_submissions|.
+    """
+
+    DICTIONARY_COLUMNS = (('status', 'status'),)
+    NUMERIC_COLUMNS = (('priority_event_score', 'priorityEventScore'),)
+    OBJECT_COLUMNS = (('submission_id', 'submissionId'),
+                      ('title', 'title'))
+
+
+class IndicatorSummaryTable(ColumnarTable):
+    """
+    A |ColumnarTable| of |IndicatorSummary| objects, with one row per indicator and intelligence source.  The nested
+    source and score are flattened into columns, and the attributes are not kept.  Use |get_indicator_summaries_table|
+    to decode the pages returned by the API straight into a table, without building any |IndicatorSummary| objects.
+    Score values that are not numeric, e.g. "High", are stored as missing.
+
+    Example:
+
+    >>> table = ts.get_indicator_summaries_table(values)
+    >>> table.get_max_severity_per_value()
+    {'evil.com': 3.0, '10.0.0.1': 1.0}
+    >>> table.pivot('value', 'source_key', 'severity_level')
+    {'evil.com': {'virustotal': 3.0, 'crowdstrike': 2.0}, '10.0.0.1': {'virustotal': 1.0}}
+    """
+
+    DICTIONARY_COLUMNS = (('value', 'value'),
+                          ('indicator_type', 'type'),
+                          ('source_key', ('source', 'key')),
+                          ('enclave_id', 'enclaveId'),
+                          ('score_name', ('score', 'name')))
+    NUMERIC_COLUMNS = (('severity_level', 'severityLevel'),
+                       ('score', ('score', 'value')),
+                       ('created', 'created'),
+                       ('updated', 'updated'))
+    OBJECT_COLUMNS = (('report_id', 'reportId'),)
+
+    def get_max_severity_per_value(self):
+        """
+        :return: a dictionary from each indicator value to its highest severity level across all sources
+        """
+
+        return self.group_by('value', 'severity_level', 'max')
+
+    def get_source_coverage(self):
+        """
+        :return: a dictionary from each source key to the number of distinct indicator values it has a summary for
+        """
+
+        return self.count_distinct('source_key', 'value')
@@ -13,8 +13,6 @@ from __future__ import print_function
 
 import argparse
 import os
-import time
-import json
 import pdfminer.pdfinterp
 
 from pdfminer.pdfpage import PDFPage
@@ -82,6 +80,8 @@ def main():
     parser.add_argument('--ts_config', '-c', help='Path containing trustar api config', nargs='?', default="./trustar.conf")
     parser.add_argument('-i', '--ignore', dest='ignore', action='store_true',
                         help='Ignore history and resubmit already procesed files')
+    parser.add_argument('-w', '--workers', type=int, default=4,
+                        help='Number of reports to submit concurrently')
 
     args = parser.parse_args()
     source_report_dir = args.dir
@@ -100,7 +100,10 @@ def main():
 
     skipped_files_file = os.path.join(source_report_dir, "skipped_files.log")
 
-    with open(processed_files_file, 'a', 0) as pf:
+    def get_reports():
+        """
+        Generates a report for each file in the directory that has not been processed yet.
+        """
         for (dirpath, dirnames, filenames) in os.walk(source_report_dir):
             for source_file in filenames:
 
@@ -117,41 +120,47 @@ def main():
                 try:
                     path = os.path.join(source_report_dir, source_file)
                     report_body = process_file(path)
-                    if not report_body:
-                        logger.debug("File {} ignored for no data".format(source_file))
-                        raise
-
-                    # response_json = ts.submit_report(token, report_body, "COMMUNITY: " + file)
-                    logger.info("Report {}".format(report_body))
-                    try:
-                        report = Report(title="ENCLAVE: %s" % source_file,
-                                        body=report_body,
-                                        is_enclave=True,
-                                        enclave_ids=ts.enclave_ids)
-                        report = ts.submit_report(report)
-                        logger.info("SUCCESSFULLY SUBMITTED REPORT, " +
-                                    "TRUSTAR REPORT as Incident Report ID %s" % report.id)
-                        pf.write("%s\n" % source_file)
-
-                        if report.indicators is not None:
-                            print("Extracted the following indicators: {}"
-                                  .format(json.dumps([x.to_dict() for x in report.indicators], indent=2)))
-                        else:
-                            print("No indicators returned from  report id {0}".format(report.id))
-                    except Exception as e:
-                        if '413' in e.message:
-                            logger.warn("Could not submit file {}. Contains more indicators than currently supported."
-                                        .format(source_file))
-                        else:
-                            raise
-
                 except Exception as e:
                     logger.error("Problem with file %s, exception: %s " % (source_file, e))
-                    with open(skipped_files_file, 'w', 0) as sf:
-                        sf.write("{}\n".format(source_file))
+                    skip_file(source_file)
+                    continue
+
+                if not report_body:
+                    logger.debug("File {} ignored for no data".format(source_file))
+                    skip_file(source_file)
                     continue
 
-                time.sleep(2)
+                logger.info("Report {}".format(report_body))
+                report = Report(title="ENCLAVE: %s" % source_file,
+                                body=report_body,
+                                is_enclave=True,
+                                enclave_ids=ts.enclave_ids)
+                source_files[id(report)] = source_file
+                yield report
+
+    def skip_file(source_file):
+        with open(skipped_files_file, 'a') as sf:
+            sf.write("{}\n".format(source_file))
+
+    # map each report object to the file it was read from
+    source_files = {}
+
+    # submit the reports concurrently; the SDK waits on 429s so no manual throttling is needed
+    with open(processed_files_file, 'a') as pf:
+        for result in ts.submit_reports(get_reports(), max_workers=args.workers):
+            source_file = source_files.pop(id(result.key))
+            if result.succeeded:
+                logger.info("SUCCESSFULLY SUBMITTED REPORT, " +
+                            "TRUSTAR REPORT as Incident Report ID %s" % result.key.id)
+                pf.write("%s\n" % source_file)
+                pf.flush()
+            elif result.status_code == 413:
+                logger.warn("Could not submit file {}. Contains more indicators than currently supported."
+                            .format(source_file))
+                skip_file(source_file)
+            else:
+                logger.error("Problem with file %s, exception: %s " % (source_file, result.error))
+                skip_file(source_file)
 
 
 if __name__ == '__main__':
@@ -21,31 +21,18 @@ from_time = to_time - timedelta(days=1)
 to_time = datetime_to_millis(to_time)
 from_time = datetime_to_millis(from_time)
 
-# keep a count of how many reports have been deleted
-count = 0
-
-# initialize reports list to None
-reports = None
-
-# Loop until no reports remain.  We can use the "get_reports_page" method
-# without adjusting the time frame on subsequent calls, since we know that
-# no reports will be repeated (because they are being deleted).
-while reports is None or len(reports) > 0:
-    try:
-
-        # get all reports from the specified enclaves and in the given time interval
-        reports = ts.get_reports_page(from_time=from_time,
-                                      to_time=to_time,
-                                      is_enclave=True,
-                                      enclave_ids=ts.enclave_ids)
-
-        # delete each report in the page
-        for report in reports:
-            logger.info("Deleting report %s" % report.id)
-            ts.delete_report(report_id=report.id)
-            count += 1
-
-    except Exception as e:
-        logger.error("Error: %s" % e)
-
-logger.info("Deleted %d reports." % count)
+# get all reports from the specified enclaves and in the given time interval, and delete them concurrently.
+# Deleted report IDs are recorded in the checkpoint file, so if the script is interrupted, running it again
+# resumes where it stopped.
+reports = ts.get_reports(from_time=from_time,
+                         to_time=to_time,
+                         is_enclave=True,
+                         enclave_ids=ts.enclave_ids)
+
+results = ts.delete_reports(reports, max_workers=8, checkpoint="deleted_reports.txt")
+
+for result in results:
+    if not result.succeeded:
+        logger.error("Error deleting report %s: %s" % (result.key, result.error))
+
+logger.info("Deleted %d reports." % sum(1 for result in results if result.succeeded))
@@ -0,0 +1,207 @@
+# python 2 backwards compatibility
+from __future__ import print_function
+from builtins import object
+
+# external imports
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# package imports
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+
+class Hedger(object):
+    """
+    Sends a duplicate of an idempotent request when the first attempt is slower than usual, and uses whichever response
+    arrives first.  This cuts the tail latency of interactive lookups, e.g. |get_report_details| or
+    |get_indicators_metadata|, at the cost of a few extra requests.
+
+    The delay before hedging is a percentile (by default, the 95th) of the recent latencies of the endpoint, by path
+    template (see |get_path_template|), clamped between ``min_delay`` and ``max_delay``.  Until ``min_samples``
+    latencies are known, ``max_delay`` is used.  The extra load is capped by a budget:  each request earns
+    ``budget`` hedges, up to ``burst``, so that at most about ``budget`` of all requests are hedged.  Requests are only
+    handed to worker threads while a hedge is available, so most requests are sent from the calling thread.
+
+    Only ``GET`` requests, and ``POST`` requests to the read-only endpoints in ``idempotent_posts``, are hedged.
+
+    Enable the default hedger with the ``hedging`` config key of |TruStar|, or install a configured one with
+    |set_hedger|.  The hedges sent, and those that won, are counted by |get_stats| and by the |MetricsRegistry|.
+
+    Example:
+
+    >>> ts.set_hedger(Hedger(percentile=0.9, budget=0.1))
+    >>> details = ts.get_report_details(report_id)
+    >>> ts.get_hedger().get_stats()
+    {'requests': 1, 'hedges': 0, 'hedgeWins': 0, 'hedgeRate': 0.0, 'budgetExhausted': 0}
+    """
+
+    IDEMPOTENT_POSTS = frozenset(['indicators/metadata', 'indicators/summaries', 'indicators/search',
+                                  'reports/search', 'triage/indicators', 'triage/submissions'])
+
+    def __init__(self, percentile=0.95, min_delay=0.05, max_delay=2.0, min_samples=20, history_size=200,
+                 budget=0.05, burst=5, idempotent_posts=None, max_workers=16):
+        """
+        :param float percentile: the percentile of recent latencies after which a request is hedged
+        :param float min_delay: the minimum number of seconds before hedging
+        :param float max_delay: the maximum number of seconds before hedging
+        :param int min_samples: the number of latencies of an endpoint needed before using their percentile
+        :param int history_size: the number of recent latencies of each endpoint kept
+        :param float budget: the proportion of requests that can be hedged
+        :param int burst: the maximum number of hedges that can be saved up
+        :param idempotent_posts: the path templates of the ``POST`` endpoints that are safe to hedge (by default,
+            ``Hedger.IDEMPOTENT_POSTS``)
+        :param int max_workers: the maximum number of attempts run by the worker threads of the hedger at once
+        """
+
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self.history_size = history_size
+        self.budget = budget
+        self.burst = burst
+        self.idempotent_posts = frozenset(idempotent_posts) if idempotent_posts is not None \
+            else self.IDEMPOTENT_POSTS
+
+        # set by the ApiClient that uses this hedger, to count hedges
+        self.metrics = None
+
+        self.max_workers = max_workers
+
+        self._latencies = {}
+        self._tokens = 0.0
+        # attempts that can be hedged run in a shared pool, created on first use
+        self._executor = None
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._stats = {'requests': 0, 'hedges': 0, 'hedgeWins': 0, 'budgetExhausted': 0}
+
+    def is_idempotent(self, method, template):
+        """
+        :param str method: the method of a request
+        :param str template: the path template of the request
+        :return: whether the request may be hedged
+        """
+
+        return method == 'GET' or (method == 'POST' and template in self.idempotent_posts)
+
+    def get_delay(self, template):
+        """
+        :param str template: a path template
+        :return: the number of seconds to wait for a response from the endpoint before hedging
+        """
+
+        with self._lock:
+            latencies = self._latencies.get(template)
+            if latencies is None or len(latencies) < self.min_samples:
+                return self.max_delay
+            latencies = sorted(latencies)
+
+        index = min(len(latencies) - 1, int(self.percentile * len(latencies)))
+        return min(self.max_delay, max(self.min_delay, latencies[index]))
+
+    def get_stats(self):
+        """
+        :return: a dictionary of the number of hedgeable ``requests``, the ``hedges`` sent, the ``hedgeWins`` (hedges
+            that answered first), the ``hedgeRate`` and the number of hedges skipped because the budget was exhausted
+        """
+
+        with self._lock:
+            stats = dict(self._stats)
+        stats['hedgeRate'] = float(stats['hedges']) / stats['requests'] if stats['requests'] else 0.0
+        return stats
+
+    def _record_latency(self, template, latency):
+        with self._lock:
+            latencies = self._latencies.get(template)
+            if latencies is None:
+                latencies = self._latencies[template] = deque(maxlen=self.history_size)
+            latencies.append(latency)
+
+    def _timed(self, template, send, pooled):
+        # failures are timed too, so that slow failures count towards the percentile
+        start = time.time()
+        try:
+            return send()
+        finally:
+            self._record_latency(template, time.time() - start)
+            if pooled:
+                with self._lock:
+                    self._in_flight -= 1
+
+    def _submit(self, template, send):
+        # called with the lock held
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self._in_flight += 1
+        return self._executor.submit(self._timed, template, send, True)
+
+    def send(self, method, template, send):
+        """
+        Sends a request, and hedges it if it is too slow and the budget allows.
+
+        A request can only be hedged if its attempts run in the worker threads of the hedger.  When the budget has no
+        hedge to spare, or the workers are busy, the request is simply sent from the calling thread.
+
+        :param str method: the method of the request
+        :param str template: the path template of the request
+        :param send: a function without arguments that sends the request and returns its response
+        :return: the first response received.  If every attempt raised an exception, the exception of the first attempt
+            is raised.
+        """
+
+        delay = self.get_delay(template)
+        with self._lock:
+            self._stats['requests'] += 1
+            self._tokens = min(self.burst, self._tokens + self.budget)
+            # room for the primary attempt and a hedge
+            hedgeable = self._tokens >= 1 and self._in_flight + 2 <= self.max_workers
+            primary = self._submit(template, send) if hedgeable else None
+
+        if primary is None:
+            start = time.time()
+            try:
+                return self._timed(template, send, False)
+            finally:
+                if time.time() - start > delay:
+                    with self._lock:
+                        self._stats['budgetExhausted'] += 1
+
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        with self._lock:
+            # the budget may have been spent by other requests in the meantime
+            if self._tokens < 1:
+                self._stats['budgetExhausted'] += 1
+                hedge = None
+            else:
+                self._tokens -= 1
+                hedge = self._submit(template, send)
+        if hedge is None:
+            return primary.result()
+
+        logger.debug("Hedging %s %s after %.3f seconds." % (method, template, delay))
+        winner = None
+        pending = set([primary, hedge])
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            succeeded = [future for future in done if future.exception() is None]
+            if succeeded:
+                # if both answered at once, prefer the primary
+                winner = primary if primary in succeeded else hedge
+
+        won = winner is hedge
+        with self._lock:
+            self._stats['hedges'] += 1
+            if won:
+                self._stats['hedgeWins'] += 1
+        if self.metrics is not None:
+            self.metrics.record_hedge(method, template, won)
+
+        return (winner or primary).result()
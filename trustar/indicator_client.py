@@ -7,10 +7,16 @@ from six import string_types
 # external imports
 import functools
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from requests.exceptions import ConnectionError, HTTPError, Timeout
 
 # package imports
+from .batching import MicroBatcher
 from .log import get_logger
-from .models import Indicator, NumberedPage, Tag, IndicatorSummary
+from .models import Indicator, IndicatorGraph, NumberedPage, Tag, IndicatorSummary
+from .columnar import IndicatorSummaryTable
+from .utils import merge_page_generators
 
 # python 2 backwards compatibility
 standard_library.install_aliases()
@@ -18,6 +24,31 @@ standard_library.install_aliases()
 logger = get_logger(__name__)
 
 
+def _normalize_value(value):
+    # the server may return an indicator value in a different form than it was requested in
+    return value.strip().rstrip('.').lower() if value else value
+
+
+def _by_requested_value(values, indicators):
+    """
+    :param values: the requested indicator values
+    :param indicators: the |Indicator| objects returned for them
+    :return: a dictionary from each requested value that was found to its |Indicator|
+    """
+
+    found = {}
+    for indicator in indicators:
+        found.setdefault(indicator.value, indicator)
+        found.setdefault(_normalize_value(indicator.value), indicator)
+
+    results = {}
+    for value in values:
+        indicator = found.get(value) or found.get(_normalize_value(value))
+        if indicator is not None:
+            results[value] = indicator
+    return results
+
+
 class IndicatorClient(object):
 
     def submit_indicators(self, indicators, enclave_ids=None, tags=None):
@@ -81,7 +112,7 @@ class IndicatorClient(object):
 
     def get_indicators(self, from_time=None, to_time=None, enclave_ids=None,
                        included_tag_ids=None, excluded_tag_ids=None,
-                       start_page=0, page_size=None):
+                       start_page=0, page_size=None, fan_out=False, max_workers=8):
         """
         Creates a generator from the |get_indicators_page| method that returns each successive indicator as an
         |Indicator| object containing values for the 'value' and 'type' attributes only; all
@@ -96,10 +127,27 @@ class IndicatorClient(object):
         :param int page_size: Passing the integer 1000 as the argument to this parameter should result in your script 
         making fewer API calls because it returns the largest quantity of indicators with each API call.  An API call 
         has to be made to fetch each |NumberedPage|.   
+        :param boolean fan_out: if ``True``, each enclave in ``enclave_ids`` (by default, the configured enclaves, or
+            else all of the user's enclaves) is queried separately and concurrently, and the pages of results are
+            interleaved, with each indicator returned only once.
+        :param int max_workers: when ``fan_out`` is ``True``, the maximum number of requests in flight at the same time
         :return: A generator of |Indicator| objects containing values for the "value" and "type" attributes only.
         All other attributes of the |Indicator| object will contain Null values. 
         
         """
+        if fan_out:
+            page_generators = [self._get_indicators_page_generator(from_time=from_time,
+                                                                   to_time=to_time,
+                                                                   enclave_ids=[enclave_id],
+                                                                   included_tag_ids=included_tag_ids,
+                                                                   excluded_tag_ids=excluded_tag_ids,
+                                                                   page_number=start_page,
+                                                                   page_size=page_size)
+                               for enclave_id in self._get_fan_out_enclave_ids(enclave_ids)]
+            return merge_page_generators(page_generators,
+                                         unique_key=lambda indicator: (indicator.value, indicator.type),
+                                         max_workers=max_workers)
+
         indicators_page_generator = self._get_indicators_page_generator(
             from_time=from_time,
             to_time=to_time,
@@ -178,7 +226,9 @@ class IndicatorClient(object):
                           to_time=None,
                           indicator_types=None,
                           tags=None,
-                          excluded_tags=None):
+                          excluded_tags=None,
+                          fan_out=False,
+                          max_workers=8):
         """
         Uses the |search_indicators_page| method to create a generator that returns each successive indicator.
 
@@ -192,9 +242,21 @@ class IndicatorClient(object):
         :param list(str) tags: Name (or list of names) of tag(s) to filter indicators by.  Only indicators containing
             ALL of these tags will be returned. (optional)
         :param list(str) excluded_tags: Indicators containing ANY of these tags will be excluded from the results.
+        :param boolean fan_out: if ``True``, each enclave in ``enclave_ids`` (by default, the configured enclaves, or
+            else all of the user's enclaves) is searched separately and concurrently, and the pages of results are
+            interleaved, with each indicator returned only once.
+        :param int max_workers: when ``fan_out`` is ``True``, the maximum number of requests in flight at the same time
         :return: The generator.
         """
 
+        if fan_out:
+            page_generators = [self._search_indicators_page_generator(search_term, [enclave_id], from_time, to_time,
+                                                                      indicator_types, tags, excluded_tags)
+                               for enclave_id in self._get_fan_out_enclave_ids(enclave_ids)]
+            return merge_page_generators(page_generators,
+                                         unique_key=lambda indicator: (indicator.value, indicator.type),
+                                         max_workers=max_workers)
+
         return NumberedPage.get_generator(page_generator=self._search_indicators_page_generator(search_term, enclave_ids,
                                                                                         from_time, to_time,
                                                                                         indicator_types, tags,
@@ -288,6 +350,100 @@ class IndicatorClient(object):
 
         return NumberedPage.get_generator(page_generator=self._get_related_indicators_page_generator(indicators, enclave_ids))
 
+    def get_related_indicators_graph(self, indicators, enclave_ids=None, max_depth=2, max_nodes=1000,
+                                     max_requests=200, max_workers=8, page_size=None):
+        """
+        Expands the related indicators of the given indicators hop by hop, using a breadth-first search.  All
+        indicators on the same hop are expanded concurrently, and each indicator is only expanded once, no matter how
+        many times it is reached.
+
+        :param list(string) indicators: list of indicator values to start from
+        :param list(string) enclave_ids: list of GUIDs of enclaves to search in
+        :param int max_depth: the maximum number of hops from the starting indicators
+        :param int max_nodes: the maximum number of indicators in the graph, including the starting indicators
+        :param int max_requests: the maximum number of requests (one per page of related indicators) that will be made
+        :param int max_workers: the maximum number of requests that will be in flight at the same time
+        :param int page_size: the size of each page of related indicators
+        :return: An |IndicatorGraph| object.  Its ``truncated`` attribute is ``True`` if any limit was reached, or if
+            the related indicators of an indicator could not be retrieved because of a connection error, a timeout, or
+            a 429 or 5xx response.  Any other error is raised.
+
+        Example:
+
+        >>> graph = ts.get_related_indicators_graph(["evil.com"], max_depth=3)
+        >>> for indicator in graph.get_related("evil.com"): print(indicator.value, indicator.type)
+        """
+
+        if isinstance(indicators, string_types):
+            indicators = [indicators]
+
+        graph = IndicatorGraph()
+        for value in indicators:
+            graph.add_node(Indicator(value=value), depth=0)
+
+        # the request budget is shared by all workers
+        lock = threading.Lock()
+        budget = {'remaining': max_requests}
+
+        def acquire_request():
+            with lock:
+                if budget['remaining'] <= 0:
+                    return False
+                budget['remaining'] -= 1
+                return True
+
+        def expand(value):
+            """
+            Retrieves every page of indicators related to a single value.
+
+            :return: a tuple of the list of related |Indicator| objects and whether all pages were retrieved
+            """
+
+            related = []
+            page_number = 0
+            while True:
+                if not acquire_request():
+                    return related, False
+                try:
+                    page = self.get_related_indicators_page(indicators=[value],
+                                                            enclave_ids=enclave_ids,
+                                                            page_size=page_size,
+                                                            page_number=page_number)
+                except (ConnectionError, Timeout, HTTPError) as e:
+                    # only transient errors and rate limits truncate the graph; e.g. a bad request is a bug
+                    if isinstance(e, HTTPError) and e.response is not None \
+                            and e.response.status_code != 429 and e.response.status_code < 500:
+                        raise
+                    logger.warning("Failed to get indicators related to %s: %s" % (value, e))
+                    return related, False
+                related.extend(page.items)
+                if not page.has_more_pages():
+                    return related, True
+                page_number += 1
+
+        frontier = list(graph.nodes)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for depth in range(1, max_depth + 1):
+                if not frontier:
+                    break
+
+                next_frontier = []
+                for value, (related, complete) in zip(frontier, executor.map(expand, frontier)):
+                    if not complete:
+                        graph.truncated = True
+                    for indicator in related:
+                        if indicator.value not in graph:
+                            if len(graph) >= max_nodes:
+                                graph.truncated = True
+                                continue
+                            next_frontier.append(indicator.value)
+                        graph.add_node(indicator, depth=depth)
+                        graph.add_edge(value, indicator.value)
+
+                frontier = next_frontier
+
+        return graph
+
     def get_indicators_for_report(self, report_id):
         """
         Creates a generator that returns each successive indicator for a given report.
@@ -409,6 +565,16 @@ class IndicatorClient(object):
         :return: A generator of |IndicatorSummary| objects.
         """
 
+        return self._get_indicator_summaries_page(values, enclave_ids=enclave_ids, page_number=page_number,
+                                                  page_size=page_size, content_type=IndicatorSummary)
+
+    def _get_indicator_summaries_page(self, values, enclave_ids=None, page_number=0, page_size=None,
+                                      content_type=None):
+        """
+        Gets a page of indicator summaries.  If ``content_type`` is ``None``, the items of the page are left as the
+        dictionaries returned by the API.
+        """
+
         params = {
             'enclaveIds': enclave_ids,
             'pageNumber': page_number,
@@ -417,7 +583,27 @@ class IndicatorClient(object):
 
         resp = self._client.post("indicators/summaries", json=values, params=params)
 
-        return NumberedPage.from_dict(resp.json(), IndicatorSummary)
+        return NumberedPage.from_dict(resp.json(), content_type)
+
+    def get_indicator_summaries_table(self, values, enclave_ids=None, page_size=None):
+        """
+        Gets the summaries of indicators as an |IndicatorSummaryTable|, with one row per indicator and intelligence
+        source.  The pages returned by the API are decoded straight into the columns of the table, which is much
+        cheaper than building an |IndicatorSummary| object (and its nested objects) for every summary.
+
+        :param values: The list of indicator values to get summaries for.  The values must match indicators in the
+            TruSTAR system exactly.
+        :param enclave_ids: The enclaves to search for indicator summaries in.  Optional, defaults to all of the
+            user's enclaves.
+        :param page_size: The size of the pages to request.
+        :return: An |IndicatorSummaryTable| of the summaries.
+        """
+
+        get_page = functools.partial(self._get_indicator_summaries_page, values=values, enclave_ids=enclave_ids)
+
+        table = IndicatorSummaryTable()
+        table.extend_pages(NumberedPage.get_page_generator(get_page, 0, page_size))
+        return table
 
     def get_indicator_details(self, indicators, enclave_ids=None):
         """
@@ -446,6 +632,48 @@ class IndicatorClient(object):
 
         return [Indicator.from_dict(indicator) for indicator in resp.json()]
 
+    def get_indicator_metadata_batcher(self, enclave_ids=None, max_batch_size=100, max_delay=0.01):
+        """
+        Creates a |MicroBatcher| that merges concurrent single-indicator metadata lookups into |get_indicators_metadata|
+        requests.
+
+        :param enclave_ids: a list of enclave IDs to restrict to.  By default, uses all of the user's enclaves.
+        :param int max_batch_size: the maximum number of indicators per request
+        :param float max_delay: the maximum number of seconds a lookup waits for others to join it
+        :return: the batcher.  Its ``load`` method takes an indicator value and returns an |Indicator| with the
+            attributes returned by |get_indicators_metadata|, or ``None`` if the indicator was not found.
+
+        Example:
+
+        >>> batcher = ts.get_indicator_metadata_batcher()
+        >>> with ThreadPoolExecutor() as executor:
+        ...     indicators = list(executor.map(batcher.load, values))
+        """
+
+        def get_metadata(values):
+            indicators = self.get_indicators_metadata([Indicator(value=value) for value in values],
+                                                      enclave_ids=enclave_ids)
+            return _by_requested_value(values, indicators)
+
+        return MicroBatcher(get_metadata, max_batch_size=max_batch_size, max_delay=max_delay)
+
+    def get_indicator_details_batcher(self, enclave_ids=None, max_batch_size=100, max_delay=0.01):
+        """
+        Creates a |MicroBatcher| that merges concurrent single-indicator lookups into |get_indicator_details| requests.
+
+        :param enclave_ids: Only find details for indicators in these enclaves.
+        :param int max_batch_size: the maximum number of indicators per request
+        :param float max_delay: the maximum number of seconds a lookup waits for others to join it
+        :return: the batcher.  Its ``load`` method takes an indicator value and returns its |Indicator|, or ``None`` if
+            it was not found.
+        """
+
+        def get_details(values):
+            indicators = self.get_indicator_details(values, enclave_ids=enclave_ids)
+            return _by_requested_value(values, indicators)
+
+        return MicroBatcher(get_details, max_batch_size=max_batch_size, max_delay=max_delay)
+
     def get_whitelist(self):
         """
         Uses the |get_whitelist_page| method to create a generator that returns each successive whitelisted indicator.
@@ -0,0 +1,306 @@
+# python 2 backwards compatibility
+from __future__ import print_function
+from builtins import object
+
+# external imports
+import bisect
+import threading
+
+# the path segments of the API's routes; any other segment is treated as a variable, e.g. an ID
+STATIC_PATH_SEGMENTS = frozenset([
+    'alter-tags', 'community-trending', 'copy', 'correlate', 'correlated', 'details', 'enclaves', 'indicators',
+    'metadata', 'move', 'ping', 'redaction', 'related', 'report', 'reports', 'request-quotas', 'search', 'status',
+    'submissions', 'summaries', 'tags', 'triage', 'version', 'whitelist',
+])
+
+# the upper bounds, in seconds, of the buckets of the latency histograms
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+
+def get_path_template(path):
+    """
+    Replaces the variable segments of a request path with ``{id}``, so that requests to the same endpoint are
+    aggregated together.
+
+    :param str path: the path of a request, e.g. ``reports/4d1fcaee-5009-4620-b239-2b22c3992b80/tags``
+    :return: the template of the path, e.g. ``reports/{id}/tags``
+    """
+
+    return '/'.join(segment if segment in STATIC_PATH_SEGMENTS else '{id}' for segment in path.strip('/').split('/'))
+
+
+class _EndpointMetrics(object):
+
+    def __init__(self):
+        self.requests = {}
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.coalesced = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.latency_buckets = [0] * len(LATENCY_BUCKETS)
+        self.latency_sum = 0.0
+        self.latency_count = 0
+
+
+class MetricsRegistry(object):
+    """
+    Records the requests made by an |ApiClient|, by method and path template:  the number of requests by status code,
+    a histogram of their latencies, the bytes sent and received, and the number of retries.  Also records the number
+    of token refreshes, and the total time spent waiting because of 429 responses.
+
+    When disabled, which is the default, every method returns immediately.  Enable it with the ``metrics`` config key
+    of |TruStar|, or by setting ``enabled`` to ``True``.
+
+    Example:
+
+    >>> ts = TruStar(config={..., 'metrics': True})
+    >>> reports = list(ts.get_reports())
+    >>> ts.get_metrics().snapshot()['endpoints']['GET reports']['latency']['mean']
+    0.183
+    >>> print(ts.get_metrics().to_prometheus())
+    """
+
+    def __init__(self, enabled=False):
+        """
+        :param boolean enabled: whether to record anything
+        """
+
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Discards everything recorded so far.
+        """
+
+        with self._lock:
+            self._endpoints = {}
+            self._token_refreshes = 0
+            self._rate_limit_wait_time = 0.0
+            self._circuit_state_changes = {}
+
+    def _get_endpoint(self, method, template):
+        key = (method, template)
+        endpoint = self._endpoints.get(key)
+        if endpoint is None:
+            endpoint = self._endpoints[key] = _EndpointMetrics()
+        return endpoint
+
+    def record_request(self, method, template, status_code, latency, bytes_sent=0, bytes_received=0):
+        """
+        Records a request.
+
+        :param str method: the method of the request
+        :param str template: the path template of the request, see |get_path_template|
+        :param int status_code: the status code of the response
+        :param float latency: the duration of the request, in seconds
+        :param int bytes_sent: the size of the request body
+        :param int bytes_received: the size of the response body
+        """
+
+        if not self.enabled:
+            return
+
+        with self._lock:
+            endpoint = self._get_endpoint(method, template)
+            endpoint.requests[status_code] = endpoint.requests.get(status_code, 0) + 1
+            endpoint.bytes_sent += bytes_sent
+            endpoint.bytes_received += bytes_received
+            endpoint.latency_buckets[bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+            endpoint.latency_sum += latency
+            endpoint.latency_count += 1
+
+    def record_retry(self, method, template):
+        """
+        Records that a request is retried, e.g. after a 429 or an expired token.
+
+        :param str method: the method of the request
+        :param str template: the path template of the request
+        """
+
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._get_endpoint(method, template).retries += 1
+
+    def record_hedge(self, method, template, won):
+        """
+        Records that a duplicate of a slow request was sent, see |Hedger|.
+
+        :param str method: the method of the request
+        :param str template: the path template of the request
+        :param boolean won: whether the duplicate answered first
+        """
+
+        if not self.enabled:
+            return
+
+        with self._lock:
+            endpoint = self._get_endpoint(method, template)
+            endpoint.hedges += 1
+            if won:
+                endpoint.hedge_wins += 1
+
+    def record_coalesced(self, method, template):
+        """
+        Records that a request was not sent because an identical request was already in flight, see |SingleFlight|.
+
+        :param str method: the method of the request
+        :param str template: the path template of the request
+        """
+
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._get_endpoint(method, template).coalesced += 1
+
+    def record_token_refresh(self):
+        """
+        Records that a new OAuth2 token was requested.
+        """
+
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._token_refreshes += 1
+
+    def record_rate_limit_wait(self, wait_time):
+        """
+        Records time spent waiting because of a 429 response.
+
+        :param float wait_time: the number of seconds waited
+        """
+
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._rate_limit_wait_time += wait_time
+
+    def record_circuit_state_change(self, template, state):
+        """
+        Records that the circuit of an endpoint changed state, see |CircuitBreaker|.
+
+        :param str template: the path template of the endpoint
+        :param str state: the new state of the circuit
+        """
+
+        if not self.enabled:
+            return
+
+        with self._lock:
+            key = (template, state)
+            self._circuit_state_changes[key] = self._circuit_state_changes.get(key, 0) + 1
+
+    def snapshot(self):
+        """
+        :return: a dictionary of everything recorded so far.  Its ``endpoints`` are keyed by method and path template,
+            e.g. ``GET reports/{id}``.
+        """
+
+        with self._lock:
+            endpoints = {}
+            for (method, template), endpoint in self._endpoints.items():
+                buckets = {}
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, endpoint.latency_buckets):
+                    cumulative += count
+                    buckets[bound] = cumulative
+                endpoints['%s %s' % (method, template)] = {
+                    'method': method,
+                    'template': template,
+                    'requests': dict(endpoint.requests),
+                    'retries': endpoint.retries,
+                    'hedges': endpoint.hedges,
+                    'hedgeWins': endpoint.hedge_wins,
+                    'coalesced': endpoint.coalesced,
+                    'bytesSent': endpoint.bytes_sent,
+                    'bytesReceived': endpoint.bytes_received,
+                    'latency': {
+                        'count': endpoint.latency_count,
+                        'sum': endpoint.latency_sum,
+                        'mean': endpoint.latency_sum / endpoint.latency_count if endpoint.latency_count else None,
+                        'buckets': buckets,
+                    },
+                }
+
+            return {
+                'endpoints': endpoints,
+                'tokenRefreshes': self._token_refreshes,
+                'rateLimitWaitTime': self._rate_limit_wait_time,
+                'circuitStateChanges': dict(('%s %s' % key, count)
+                                            for key, count in self._circuit_state_changes.items()),
+            }
+
+    def to_prometheus(self, prefix='trustar_sdk'):
+        """
+        :param str prefix: the prefix of the metric names
+        :return: everything recorded so far, in the Prometheus text exposition format
+        """
+
+        snapshot = self.snapshot()
+        endpoints = sorted(snapshot['endpoints'].values(), key=lambda e: (e['template'], e['method']))
+
+        def labels(endpoint, **extra):
+            pairs = [('method', endpoint['method']), ('path', endpoint['template'])] + sorted(extra.items())
+            return '{%s}' % ','.join('%s="%s"' % (key, value) for key, value in pairs)
+
+        def format_bound(bound):
+            return '+Inf' if bound == float('inf') else repr(bound)
+
+        lines = [
+            '# HELP %s_requests_total The number of API requests, by status code.' % prefix,
+            '# TYPE %s_requests_total counter' % prefix,
+        ]
+        for endpoint in endpoints:
+            for status_code, count in sorted(endpoint['requests'].items()):
+                lines.append('%s_requests_total%s %d' % (prefix, labels(endpoint, status=status_code), count))
+
+        lines += [
+            '# HELP %s_request_duration_seconds The latency of API requests.' % prefix,
+            '# TYPE %s_request_duration_seconds histogram' % prefix,
+        ]
+        for endpoint in endpoints:
+            latency = endpoint['latency']
+            for bound in LATENCY_BUCKETS:
+                lines.append('%s_request_duration_seconds_bucket%s %d'
+                             % (prefix, labels(endpoint, le=format_bound(bound)), latency['buckets'][bound]))
+            lines.append('%s_request_duration_seconds_sum%s %r' % (prefix, labels(endpoint), latency['sum']))
+            lines.append('%s_request_duration_seconds_count%s %d' % (prefix, labels(endpoint), latency['count']))
+
+        for name, key, description in (('request_bytes_total', 'bytesSent', 'The bytes sent in request bodies.'),
+                                       ('response_bytes_total', 'bytesReceived',
+                                        'The bytes received in response bodies.'),
+                                       ('retries_total', 'retries', 'The number of retried requests.'),
+                                       ('hedges_total', 'hedges', 'The number of hedged requests.'),
+                                       ('hedge_wins_total', 'hedgeWins',
+                                        'The number of hedged requests answered first by the hedge.'),
+                                       ('coalesced_requests_total', 'coalesced',
+                                        'The number of requests saved by sharing an identical request in flight.')):
+            lines += ['# HELP %s_%s %s' % (prefix, name, description), '# TYPE %s_%s counter' % (prefix, name)]
+            for endpoint in endpoints:
+                lines.append('%s_%s%s %d' % (prefix, name, labels(endpoint), endpoint[key]))
+
+        lines += [
+            '# HELP %s_token_refreshes_total The number of OAuth2 tokens requested.' % prefix,
+            '# TYPE %s_token_refreshes_total counter' % prefix,
+            '%s_token_refreshes_total %d' % (prefix, snapshot['tokenRefreshes']),
+            '# HELP %s_rate_limit_wait_seconds_total The time spent waiting because of 429 responses.' % prefix,
+            '# TYPE %s_rate_limit_wait_seconds_total counter' % prefix,
+            '%s_rate_limit_wait_seconds_total %r' % (prefix, snapshot['rateLimitWaitTime']),
+            '# HELP %s_circuit_state_changes_total The number of times the circuit of an endpoint changed state.'
+            % prefix,
+            '# TYPE %s_circuit_state_changes_total counter' % prefix,
+        ]
+        with self._lock:
+            changes = sorted(self._circuit_state_changes.items())
+        for (template, state), count in changes:
+            lines.append('%s_circuit_state_changes_total{path="%s",state="%s"} %d' % (prefix, template, state, count))
+
+        return '\n'.join(lines) + '\n'
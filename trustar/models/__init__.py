@@ -1,7 +1,9 @@
+from .bulk_result import BulkResult
 from .cursor_page import CursorPage
 from .enclave import Enclave, EnclavePermissions
 from .intelligence_source import IntelligenceSource
 from .indicator import Indicator
+from .indicator_graph import IndicatorGraph
 from .indicator_summary import *
 from .numbered_page import NumberedPage
 from .phishing_submission import PhishingIndicator, PhishingSubmission
@@ -0,0 +1,86 @@
+# python 2 backwards compatibility
+from __future__ import print_function
+from builtins import super
+
+# package imports
+from .base import ModelBase
+
+
+class BulkResult(ModelBase):
+    """
+    Models the outcome of a single item of a bulk operation, such as |submit_reports|.  Bulk operations do not stop
+    when an item fails; instead the error is recorded on the item's result.
+
+    :ivar key: the item the operation was applied to, i.e. a |Report| object or a report ID
+    :ivar result: the value returned by the operation, if it succeeded
+    :ivar error: the exception raised by the operation, if it failed
+    :ivar status_code: the HTTP status code of the failed request, if the error came from the API
+    """
+
+    def __init__(self, key=None, result=None, error=None, status_code=None):
+        """
+        Constructs a BulkResult object.
+
+        :param key: the item the operation was applied to
+        :param result: the value returned by the operation
+        :param error: the exception raised by the operation
+        :param status_code: the HTTP status code of the failed request
+        """
+
+        self.key = key
+        self.result = result
+        self.error = error
+        self.status_code = status_code
+
+        # default the status code to that of the HTTP response that caused the error, if there is one
+        if self.status_code is None and error is not None:
+            response = getattr(error, 'response', None)
+            self.status_code = getattr(response, 'status_code', None)
+
+    @property
+    def succeeded(self):
+        """
+        :return: ``True`` if the operation did not raise an error.
+        """
+
+        return self.error is None
+
+    @classmethod
+    def from_dict(cls, bulk_result):
+        """
+        Create a |BulkResult| object from a dictionary.  The error, if any, is kept as its string representation.
+
+        :param bulk_result: The dictionary.
+        :return: The |BulkResult| object.
+        """
+
+        return BulkResult(key=bulk_result.get('key'),
+                          result=bulk_result.get('result'),
+                          error=bulk_result.get('error'),
+                          status_code=bulk_result.get('statusCode'))
+
+    def to_dict(self, remove_nones=False):
+        """
+        Creates a dictionary representation of the result.
+
+        :param remove_nones: Whether ``None`` values should be filtered out of the dictionary.  Defaults to ``False``.
+        :return: A dictionary representation of the result.
+        """
+
+        if remove_nones:
+            return super(BulkResult, self).to_dict(remove_nones=True)
+
+        key = self.key
+        if hasattr(key, 'to_dict'):
+            key = key.to_dict(remove_nones=True)
+
+        result = self.result
+        if hasattr(result, 'to_dict'):
+            result = result.to_dict(remove_nones=True)
+
+        return {
+            'key': key,
+            'result': result,
+            'error': str(self.error) if self.error is not None else None,
+            'statusCode': self.status_code
+        }
@@ -4,6 +4,7 @@ from __future__ import print_function
 # package imports
 from .base import ModelBase
 from .page import Page
+from ..tracing import get_function_name, get_tracer
 
 # external imports
 import math
@@ -88,11 +89,20 @@ class CursorPage(Page):
                 next_cursor = response_metadata.get('nextCursor')
             return next_cursor
 
-        finished = False
-        while not finished:
-            # If cursor is None, no cursor value will be sent with request
-            page = get_page(cursor=cursor)
-            cursor = get_next_cursor(page)
-            # If there are no more pages, cursor == "", therefore -> not "" == True
-            finished = not cursor
-            yield page
+        tracer = get_tracer()
+        generator_span = tracer.start_span('trustar.pages', function=get_function_name(get_page))
+        pages = 0
+        try:
+            finished = False
+            while not finished:
+                # If cursor is None, no cursor value will be sent with request
+                with tracer.activate(generator_span), tracer.start_span('trustar.page', cursor=cursor):
+                    page = get_page(cursor=cursor)
+                pages += 1
+                generator_span.set_attribute('pages', pages)
+                cursor = get_next_cursor(page)
+                # If there are no more pages, cursor == "", therefore -> not "" == True
+                finished = not cursor
+                yield page
+        finally:
+            generator_span.finish()
@@ -68,6 +68,14 @@ class DistributionType(Enum):
     COMMUNITY = "COMMUNITY"
 
 
+class SubmissionStatus(Enum):
+
+    SUBMISSION_PROCESSING = "SUBMISSION_PROCESSING"
+    SUBMISSION_SUCCESS = "SUBMISSION_SUCCESS"
+    SUBMISSION_FAILURE = "SUBMISSION_FAILURE"
+    UNKNOWN = "UNKNOWN"
+
+
 class EnclaveType(Enum):
 
     OPEN = "OPEN"
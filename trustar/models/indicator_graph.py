@@ -0,0 +1,117 @@
+# python 2 backwards compatibility
+from __future__ import print_function
+
+# package imports
+from .base import ModelBase
+from .indicator import Indicator
+
+
+class IndicatorGraph(ModelBase):
+    """
+    Models the result of expanding related indicators hop by hop, as returned by |get_related_indicators_graph|.
+
+    :ivar nodes: a dict mapping each indicator value to its |Indicator| object
+    :ivar edges: a dict mapping each indicator value to the set of values of the indicators related to it
+    :ivar depths: a dict mapping each indicator value to the number of hops from the nearest starting indicator
+    :ivar truncated: ``True`` if the expansion stopped early because a node or request limit was reached, or because
+        some of the related indicators could not be retrieved
+    """
+
+    def __init__(self, nodes=None, edges=None, depths=None, truncated=False):
+        """
+        Constructs an IndicatorGraph object.
+
+        :param nodes: a dict mapping each indicator value to its |Indicator| object
+        :param edges: a dict mapping each indicator value to the set of values of the indicators related to it
+        :param depths: a dict mapping each indicator value to its distance from the starting indicators
+        :param truncated: whether the expansion stopped before the graph was fully explored
+        """
+
+        self.nodes = nodes if nodes is not None else {}
+        self.edges = edges if edges is not None else {}
+        self.depths = depths if depths is not None else {}
+        self.truncated = truncated
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, value):
+        return value in self.nodes
+
+    def add_node(self, indicator, depth):
+        """
+        Adds an indicator to the graph.  If a node with the same value already exists, it is only replaced when the
+        existing node carries no attributes beyond its value.
+
+        :param indicator: the |Indicator| object
+        :param depth: the number of hops from the starting indicators
+        """
+
+        existing = self.nodes.get(indicator.value)
+        if existing is None or existing.type is None:
+            self.nodes[indicator.value] = indicator
+        self.edges.setdefault(indicator.value, set())
+        self.depths.setdefault(indicator.value, depth)
+
+    def add_edge(self, value, related_value):
+        """
+        Records that ``related_value`` was returned as related to ``value``.
+
+        :param value: the value of the indicator that was expanded
+        :param related_value: the value of the related indicator
+        """
+
+        if value != related_value:
+            self.edges.setdefault(value, set()).add(related_value)
+
+    def get_related(self, value):
+        """
+        :param value: an indicator value
+        :return: a list of |Indicator| objects related to the given value
+        """
+
+        return [self.nodes[v] for v in sorted(self.edges.get(value, ())) if v in self.nodes]
+
+    @classmethod
+    def from_dict(cls, graph):
+        """
+        Create an |IndicatorGraph| object from a dictionary.
+
+        :param graph: The dictionary.
+        :return: The |IndicatorGraph| object.
+        """
+
+        nodes = {}
+        depths = {}
+        for node in graph.get('nodes', []):
+            indicator = Indicator.from_dict(node)
+            nodes[indicator.value] = indicator
+            depths[indicator.value] = node.get('depth')
+
+        edges = {value: set(related) for value, related in graph.get('edges', {}).items()}
+
+        return IndicatorGraph(nodes=nodes,
+                              edges=edges,
+                              depths=depths,
+                              truncated=graph.get('truncated', False))
+
+    def to_dict(self, remove_nones=False):
+        """
+        Creates a dictionary representation of the graph.
+
+        :param remove_nones: Whether ``None`` values should be filtered out of the node dictionaries.  Defaults to
+            ``False``.
+        :return: A dictionary representation of the graph.
+        """
+
+        nodes = []
+        for value, indicator in self.nodes.items():
+            node = indicator.to_dict(remove_nones=remove_nones)
+            node['depth'] = self.depths.get(value)
+            nodes.append(node)
+
+        return {
+            'nodes': nodes,
+            'edges': {value: sorted(related) for value, related in self.edges.items()},
+            'truncated': self.truncated
+        }
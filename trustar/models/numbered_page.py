@@ -4,6 +4,7 @@ from __future__ import print_function
 # package imports
 from .base import ModelBase
 from .page import Page
+from ..tracing import get_function_name, get_tracer
 from ..utils import get_time_based_page_generator
 
 # external imports
@@ -125,17 +126,24 @@ class NumberedPage(Page):
         page_number = start_page
         more_pages = True
 
-        # continuously request the next page as long as more pages exist
-        while more_pages:
+        tracer = get_tracer()
+        generator_span = tracer.start_span('trustar.pages', function=get_function_name(func))
+        try:
+            # continuously request the next page as long as more pages exist
+            while more_pages:
 
-            # get next page
-            page = func(page_number=page_number, page_size=page_size)
+                # get next page
+                with tracer.activate(generator_span), tracer.start_span('trustar.page', page_number=page_number):
+                    page = func(page_number=page_number, page_size=page_size)
+                generator_span.set_attribute('pages', page_number - start_page + 1)
 
-            yield page
+                yield page
 
-            # determine whether more pages exist
-            more_pages = page.has_more_pages()
-            page_number += 1
+                # determine whether more pages exist
+                more_pages = page.has_more_pages()
+                page_number += 1
+        finally:
+            generator_span.finish()
 
     @staticmethod
     def get_time_based_page_generator(get_page, get_next_to_time, from_time=None, to_time=None):
@@ -4,6 +4,9 @@ from builtins import object, super
 from future import standard_library
 from six import string_types
 
+# external imports
+import copy
+
 # package imports
 from ..utils import normalize_timestamp
 from .base import ModelBase
@@ -24,8 +27,17 @@ class Report(ModelBase):
     :ivar external_url: A URL to the report in an external system (if one exists).
     :ivar is_enclave: A boolean representing whether the distribution type of the report is ENCLAVE or COMMUNITY.
     :ivar enclave_ids: A list of IDs of enclaves that the report belongs to
+
+    Reports created with :meth:`from_dict` (i.e. every report retrieved from the API) remember the values of their
+    fields as they were retrieved, so that :meth:`get_changes` can tell which fields have been modified since.
     """
 
+    # fields that are set by the server and can not be updated
+    READ_ONLY_FIELDS = ('id', 'created', 'updated')
+
+    # the attributes behind the updatable fields, recorded by snapshot()
+    SNAPSHOT_ATTRIBUTES = ('title', 'body', 'time_began', 'external_url', 'is_enclave', 'external_id', 'enclave_ids')
+
     ID_TYPE_INTERNAL = IdType.INTERNAL
     ID_TYPE_EXTERNAL = IdType.EXTERNAL
 
@@ -75,6 +87,9 @@ class Report(ModelBase):
 
         self.set_time_began(time_began)
 
+        # the values of the updatable fields when the report was retrieved, if it was retrieved from the API
+        self._snapshot = None
+
         if isinstance(self.enclave_ids, string_types):
             self.enclave_ids = [self.enclave_ids]
 
@@ -91,6 +106,44 @@ class Report(ModelBase):
         else:
             return DistributionType.COMMUNITY
 
+    def _get_updatable_fields(self):
+        """
+        :return: A dictionary representation of the fields of the report that can be updated.
+        """
+
+        return {k: v for k, v in self.to_dict().items() if k not in self.READ_ONLY_FIELDS}
+
+    def snapshot(self):
+        """
+        Records the current values of the report's fields as unchanged.  This is done automatically when a report is
+        created by :meth:`from_dict`, and after it has been updated by |update_report|.
+        """
+
+        # a plain tuple keeps decoding cheap for the many reports that are never updated; enclave_ids is the only
+        # mutable value, so it is copied to detect in-place changes
+        enclave_ids = self.enclave_ids
+        self._snapshot = (self.title, self.body, self.time_began, self.external_url, self.is_enclave, self.external_id,
+                          list(enclave_ids) if isinstance(enclave_ids, list) else enclave_ids)
+
+    def get_changes(self):
+        """
+        Finds the fields that were modified since the report was retrieved (or since :meth:`snapshot` was last called).
+
+        :return: A dictionary containing only the modified fields, with the same keys as :meth:`to_dict`.  ``None`` if
+            the report was not retrieved from the API and has no snapshot, in which case every field must be assumed
+            to be modified.
+        """
+
+        if self._snapshot is None:
+            return None
+
+        original = copy.copy(self)
+        for name, value in zip(self.SNAPSHOT_ATTRIBUTES, self._snapshot):
+            setattr(original, name, value)
+        original_fields = original._get_updatable_fields()
+
+        return {k: v for k, v in self._get_updatable_fields().items() if original_fields.get(k) != v}
+
     def to_dict(self, remove_nones=False):
         """
         Creates a dictionary representation of the object.
@@ -140,13 +193,18 @@ class Report(ModelBase):
         else:
             is_enclave = None
 
-        return Report(id=report.get('id'),
-                      title=report.get('title'),
-                      body=report.get('reportBody'),
-                      time_began=report.get('timeBegan'),
-                      external_id=report.get('externalTrackingId'),
-                      external_url=report.get('externalUrl'),
-                      is_enclave=is_enclave,
-                      enclave_ids=report.get('enclaveIds'),
-                      created=report.get('created'),
-                      updated=report.get('updated'))
+        result = Report(id=report.get('id'),
+                        title=report.get('title'),
+                        body=report.get('reportBody'),
+                        time_began=report.get('timeBegan'),
+                        external_id=report.get('externalTrackingId'),
+                        external_url=report.get('externalUrl'),
+                        is_enclave=is_enclave,
+                        enclave_ids=report.get('enclaveIds'),
+                        created=report.get('created'),
+                        updated=report.get('updated'))
+
+        # remember the retrieved values so that later changes can be detected
+        result.snapshot()
+
+        return result
@@ -0,0 +1,496 @@
+# python 2 backwards compatibility
+from __future__ import print_function
+from builtins import object, str
+
+# external imports
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from requests import HTTPError
+from requests.exceptions import ConnectionError, Timeout
+
+# package imports
+from .log import get_logger
+from .models import Indicator, Report, Tag, IdType
+from .utils import iter_concurrently
+
+logger = get_logger(__name__)
+
+
+class Outbox(object):
+    """
+    A durable queue of pending API mutations, stored in a local SQLite database.  Submissions are written to disk when
+    they are enqueued, and are only removed from the queue once the API has accepted them, so that work is not lost if
+    the process restarts.
+
+    Each entry has an idempotency key:  one given by the caller, or the report's ``external_id``, or else a hash of the
+    submitted content.  Enqueuing an entry with an explicit key (given, or an ``external_id``) is a no-op while an
+    entry with that key is queued, or completed less than ``retention`` seconds ago, so work can safely be replayed.
+    A hash only identifies an operation while it is queued:  enqueuing the same content again once it has completed
+    is a legitimate repeat (e.g. adding a tag that was removed since) and queues it again.  Because of that, a report
+    without an ``external_id`` that was submitted just before the process stopped, and not yet marked as completed,
+    can be submitted twice; give reports an ``external_id`` to prevent this.
+
+    Entries are drained by |Outbox.drain| (or by a background thread started with |Outbox.start|), which submits
+    several entries at once, batches queued indicators into a single ``submit_indicators`` call per set of enclaves and
+    tags, and retries entries that fail with a 429, a 5xx or a connection error.  Entries that fail permanently, or
+    too many times, are moved to a dead-letter table.
+
+    Example:
+
+    >>> outbox = Outbox(ts, "outbox.db")
+    >>> outbox.enqueue_report(Report(title="Phishing", body="...", external_id="ticket-1234"))
+    >>> outbox.enqueue_indicators([Indicator(value="evil.com")], enclave_ids=ts.enclave_ids)
+    >>> outbox.start()
+    """
+
+    OPERATION_SUBMIT_REPORT = 'submit_report'
+    OPERATION_SUBMIT_INDICATORS = 'submit_indicators'
+    OPERATION_ALTER_REPORT_TAGS = 'alter_report_tags'
+
+    STATUS_PENDING = 'pending'
+    STATUS_IN_PROGRESS = 'in_progress'
+    STATUS_DONE = 'done'
+
+    def __init__(self, ts, path, max_attempts=5, retry_delay=5, max_retry_delay=300, batch_size=100,
+                 retention=7 * 24 * 60 * 60):
+        """
+        Opens (or creates) an outbox.  Entries that were being processed when the outbox was last closed are
+        returned to the queue.
+
+        :param ts: the |TruStar| object used to make the API calls
+        :param str path: the path of the SQLite database file
+        :param int max_attempts: the number of attempts after which an entry is moved to the dead-letter table
+        :param retry_delay: the number of seconds before the first retry of a failed entry; doubles on every attempt
+        :param max_retry_delay: the maximum number of seconds between two attempts of the same entry
+        :param int batch_size: the maximum number of indicators per ``submit_indicators`` call
+        :param retention: the number of seconds completed entries are kept, to ignore replays of explicit keys
+        """
+
+        self._ts = ts
+        self.path = path
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.batch_size = batch_size
+        self.retention = retention
+
+        # a single connection is shared by all threads; every use of it must hold the lock
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                idempotency_key TEXT PRIMARY KEY,
+                operation TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt REAL NOT NULL,
+                created REAL NOT NULL,
+                last_error TEXT,
+                completed REAL
+            );
+            CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt);
+            CREATE TABLE IF NOT EXISTS dead_letter (
+                idempotency_key TEXT PRIMARY KEY,
+                operation TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                attempts INTEGER NOT NULL,
+                error TEXT,
+                failed REAL NOT NULL
+            );
+        """)
+
+        # recover entries that were claimed by a process that did not finish them
+        with self._lock, self._connection:
+            self._connection.execute("UPDATE outbox SET status = ? WHERE status = ?",
+                                     (self.STATUS_PENDING, self.STATUS_IN_PROGRESS))
+
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def close(self):
+        """
+        Stops the background thread, if it is running, and closes the database.
+        """
+
+        self.stop()
+        with self._lock:
+            self._connection.close()
+
+    ###############
+    ### Enqueue ###
+    ###############
+
+    @staticmethod
+    def _hash(operation, payload):
+        content = json.dumps([operation, payload], sort_keys=True)
+        return "%s:%s" % (operation, hashlib.sha256(content.encode('utf-8')).hexdigest())
+
+    def _enqueue(self, key, operation, payload, explicit_key=False):
+        """
+        Stores an entry, unless an entry with the same key is already queued or dead-lettered, or, if the key is
+        explicit rather than a hash of the content, was completed within the retention period.
+
+        :return: ``True`` if the entry was added.
+        """
+
+        now = time.time()
+        with self._lock, self._connection:
+            if self._connection.execute("SELECT 1 FROM dead_letter WHERE idempotency_key = ?", (key,)).fetchone():
+                return False
+            # a completed entry with the same hash is an earlier operation, not a replay of this one
+            self._connection.execute("DELETE FROM outbox WHERE idempotency_key = ? AND status = ? AND "
+                                     "(? OR COALESCE(completed, created) < ?)",
+                                     (key, self.STATUS_DONE, not explicit_key, now - self.retention))
+            cursor = self._connection.execute(
+                "INSERT OR IGNORE INTO outbox (idempotency_key, operation, payload, status, next_attempt, created) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, operation, json.dumps(payload), self.STATUS_PENDING, now, now))
+            return cursor.rowcount > 0
+
+    def enqueue_report(self, report, idempotency_key=None):
+        """
+        Queues a report for submission with |submit_report|.
+
+        :param report: the |Report| object
+        :param str idempotency_key: a key identifying the submission (by default, the report's ``external_id`` if it
+            has one, otherwise a hash of the report)
+        :return: the idempotency key of the entry
+        """
+
+        payload = report.to_dict()
+        if idempotency_key is not None:
+            key = "%s:key:%s" % (self.OPERATION_SUBMIT_REPORT, idempotency_key)
+        elif report.external_id is not None:
+            key = "%s:external:%s" % (self.OPERATION_SUBMIT_REPORT, report.external_id)
+        else:
+            key = self._hash(self.OPERATION_SUBMIT_REPORT, payload)
+
+        self._enqueue(key, self.OPERATION_SUBMIT_REPORT, payload,
+                      explicit_key=idempotency_key is not None or report.external_id is not None)
+        return key
+
+    def enqueue_indicators(self, indicators, enclave_ids=None, tags=None):
+        """
+        Queues indicators for submission with |submit_indicators|.  Each indicator is stored as its own entry;
+        indicators with the same enclaves and tags are submitted together when the outbox is drained.
+
+        :param list(Indicator) indicators: a list of |Indicator| objects
+        :param list(string) enclave_ids: a list of enclave IDs (defaults to the enclave IDs of the |TruStar| object)
+        :param list(Tag) tags: a list of |Tag| objects that will be applied to all of the indicators
+        :return: the list of idempotency keys of the entries
+        """
+
+        if enclave_ids is None:
+            enclave_ids = self._ts.enclave_ids
+
+        if tags is not None:
+            tags = [tag.to_dict() for tag in tags]
+
+        keys = []
+        for indicator in indicators:
+            payload = {
+                'indicator': indicator.to_dict(),
+                'enclaveIds': enclave_ids,
+                'tags': tags
+            }
+            key = self._hash(self.OPERATION_SUBMIT_INDICATORS, payload)
+            self._enqueue(key, self.OPERATION_SUBMIT_INDICATORS, payload)
+            keys.append(key)
+
+        return keys
+
+    def enqueue_report_tags(self, report_id, added_tags, removed_tags, id_type=None, idempotency_key=None):
+        """
+        Queues a change to the tags of a report, to be made with |alter_report_tags|.
+
+        :param report_id: the ID of the report
+        :param added_tags: a list of strings, the names of tags to add
+        :param removed_tags: a list of strings, the names of tags to remove
+        :param id_type: indicates whether the ID is an internal or external ID
+        :param str idempotency_key: a key identifying the change (by default, a hash of the change)
+        :return: the idempotency key of the entry
+        """
+
+        payload = {
+            'reportId': report_id,
+            'addedTags': list(added_tags),
+            'removedTags': list(removed_tags),
+            'idType': id_type
+        }
+        if idempotency_key is not None:
+            key = "%s:key:%s" % (self.OPERATION_ALTER_REPORT_TAGS, idempotency_key)
+        else:
+            key = self._hash(self.OPERATION_ALTER_REPORT_TAGS, payload)
+        self._enqueue(key, self.OPERATION_ALTER_REPORT_TAGS, payload, explicit_key=idempotency_key is not None)
+        return key
+
+    #############
+    ### Drain ###
+    #############
+
+    def _claim(self, limit):
+        """
+        Marks up to ``limit`` due entries as in progress and returns them.
+
+        :return: a list of ``(key, operation, payload, attempts)`` tuples
+        """
+
+        with self._lock, self._connection:
+            rows = self._connection.execute(
+                "SELECT idempotency_key, operation, payload, attempts FROM outbox "
+                "WHERE status = ? AND next_attempt <= ? ORDER BY next_attempt LIMIT ?",
+                (self.STATUS_PENDING, time.time(), limit)).fetchall()
+            self._connection.executemany(
+                "UPDATE outbox SET status = ?, attempts = attempts + 1 WHERE idempotency_key = ?",
+                [(self.STATUS_IN_PROGRESS, row[0]) for row in rows])
+
+        return [(key, operation, json.loads(payload), attempts + 1) for key, operation, payload, attempts in rows]
+
+    def _group(self, entries):
+        """
+        Groups claimed entries into units of work.  Indicator entries with the same enclaves and tags are combined
+        into chunks of at most ``batch_size``; every other entry is a unit by itself.
+
+        :return: a list of ``(operation, entries)`` tuples
+        """
+
+        units = []
+        indicator_groups = {}
+        for entry in entries:
+            operation, payload = entry[1], entry[2]
+            if operation == self.OPERATION_SUBMIT_INDICATORS:
+                group_key = json.dumps([payload['enclaveIds'], payload['tags']], sort_keys=True)
+                indicator_groups.setdefault(group_key, []).append(entry)
+            else:
+                units.append((operation, [entry]))
+
+        for group in indicator_groups.values():
+            for i in range(0, len(group), self.batch_size):
+                units.append((self.OPERATION_SUBMIT_INDICATORS, group[i:i + self.batch_size]))
+
+        return units
+
+    def _execute(self, unit):
+        """
+        Makes the API call for a unit of work.
+        """
+
+        operation, entries = unit
+
+        if operation == self.OPERATION_SUBMIT_REPORT:
+            _, _, payload, attempts = entries[0]
+            report = Report.from_dict(payload)
+            # a previous attempt may have reached the server before the process stopped;
+            # if the report can be found by its external ID, it must not be submitted again
+            if attempts > 1 and report.external_id is not None:
+                try:
+                    self._ts.get_report_details(report.external_id, id_type=IdType.EXTERNAL)
+                    return
+                except HTTPError as e:
+                    if e.response is None or e.response.status_code != 404:
+                        raise
+            self._ts.submit_report(report)
+
+        elif operation == self.OPERATION_SUBMIT_INDICATORS:
+            payload = entries[0][2]
+            tags = payload['tags']
+            if tags is not None:
+                tags = [Tag.from_dict(tag) for tag in tags]
+            indicators = [Indicator.from_dict(entry[2]['indicator']) for entry in entries]
+            self._ts.submit_indicators(indicators, enclave_ids=payload['enclaveIds'], tags=tags)
+
+        elif operation == self.OPERATION_ALTER_REPORT_TAGS:
+            payload = entries[0][2]
+            self._ts.alter_report_tags(report_id=payload['reportId'],
+                                       added_tags=payload['addedTags'],
+                                       removed_tags=payload['removedTags'],
+                                       id_type=payload['idType'])
+
+        else:
+            raise ValueError("Unknown outbox operation: %s" % operation)
+
+    @staticmethod
+    def _is_transient(error):
+        """
+        :return: ``True`` if an entry that failed with the given error should be retried.
+        """
+
+        if isinstance(error, (ConnectionError, Timeout)):
+            return True
+
+        if isinstance(error, HTTPError) and error.response is not None:
+            status_code = error.response.status_code
+            return status_code == 429 or status_code >= 500
+
+        return False
+
+    def _complete(self, entries, error):
+        """
+        Records the outcome of a unit of work.
+
+        :return: one of ``'succeeded'``, ``'retried'`` or ``'failed'``
+        """
+
+        with self._lock, self._connection:
+            if error is None:
+                now = time.time()
+                self._connection.executemany(
+                    "UPDATE outbox SET status = ?, last_error = NULL, completed = ? WHERE idempotency_key = ?",
+                    [(self.STATUS_DONE, now, entry[0]) for entry in entries])
+                return 'succeeded'
+
+            now = time.time()
+            outcome = 'retried'
+            for key, operation, payload, attempts in entries:
+                if self._is_transient(error) and attempts < self.max_attempts:
+                    delay = min(self.retry_delay * 2 ** (attempts - 1), self.max_retry_delay)
+                    self._connection.execute(
+                        "UPDATE outbox SET status = ?, next_attempt = ?, last_error = ? WHERE idempotency_key = ?",
+                        (self.STATUS_PENDING, now + delay, str(error), key))
+                else:
+                    outcome = 'failed'
+                    self._connection.execute(
+                        "INSERT OR REPLACE INTO dead_letter (idempotency_key, operation, payload, attempts, error, "
+                        "failed) VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, operation, json.dumps(payload), attempts, str(error), now))
+                    self._connection.execute("DELETE FROM outbox WHERE idempotency_key = ?", (key,))
+
+            return outcome
+
+    def drain(self, max_workers=4):
+        """
+        Processes every entry that is due, until none remain.  Entries scheduled for a later retry are left in the
+        queue.
+
+        :param int max_workers: the maximum number of API calls in flight at the same time
+        :return: a dict with the number of units of work that ``succeeded``, were ``retried`` later, or ``failed``
+            permanently
+        """
+
+        counts = {'succeeded': 0, 'retried': 0, 'failed': 0}
+        self.prune()
+
+        while not self._stop_event.is_set():
+            entries = self._claim(limit=self.batch_size * max_workers)
+            if not entries:
+                break
+
+            units = self._group(entries)
+            for unit, _, error in iter_concurrently(self._execute, units, max_workers=max_workers):
+                if error is not None:
+                    logger.warning("Outbox %s failed: %s" % (unit[0], error))
+                counts[self._complete(unit[1], error)] += 1
+
+        return counts
+
+    def prune(self):
+        """
+        Deletes the entries that completed more than ``retention`` seconds ago.  Called by |Outbox.drain|.
+
+        :return: the number of entries deleted
+        """
+
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                "DELETE FROM outbox WHERE status = ? AND COALESCE(completed, created) < ?",
+                (self.STATUS_DONE, time.time() - self.retention))
+            return cursor.rowcount
+
+    def start(self, max_workers=4, poll_interval=1):
+        """
+        Starts a background thread that drains the outbox continuously.
+
+        :param int max_workers: the maximum number of API calls in flight at the same time
+        :param poll_interval: the number of seconds to wait when the outbox has nothing due
+        """
+
+        if self._thread is not None and self._thread.is_alive():
+            # the thread may still be finishing its last drain after a stop that timed out; let it carry on instead
+            self._stop_event.clear()
+            return
+
+        def run():
+            while not self._stop_event.is_set():
+                try:
+                    self.drain(max_workers=max_workers)
+                except Exception as e:
+                    logger.error("Error while draining outbox: %s" % e)
+                self._stop_event.wait(poll_interval)
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=run, name="trustar-outbox")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """
+        Stops the background thread after the units of work in progress have completed.
+
+        :param timeout: the maximum number of seconds to wait for the thread to stop
+        """
+
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                # keep the thread, and the stop request, so that it exits once done and is not started twice
+                logger.warning("Background thread %s did not stop within %s seconds." % (self._thread.name, timeout))
+                return
+            self._thread = None
+        self._stop_event.clear()
+
+    ##################
+    ### Inspection ###
+    ##################
+
+    def get_pending_count(self):
+        """
+        :return: the number of entries that have not completed yet, including entries scheduled for a retry.
+        """
+
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM outbox WHERE status != ?",
+                                            (self.STATUS_DONE,)).fetchone()[0]
+
+    def get_dead_letters(self):
+        """
+        :return: a list of dicts, one per entry that failed permanently, with keys ``idempotencyKey``, ``operation``,
+            ``payload``, ``attempts``, ``error`` and ``failed``.
+        """
+
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT idempotency_key, operation, payload, attempts, error, failed FROM dead_letter "
+                "ORDER BY failed").fetchall()
+
+        return [{
+            'idempotencyKey': key,
+            'operation': operation,
+            'payload': json.loads(payload),
+            'attempts': attempts,
+            'error': error,
+            'failed': failed
+        } for key, operation, payload, attempts, error, failed in rows]
+
+    def requeue_dead_letters(self):
+        """
+        Moves every dead-lettered entry back into the queue, with its attempt count reset.
+
+        :return: the number of entries that were requeued
+        """
+
+        now = time.time()
+        with self._lock, self._connection:
+            rows = self._connection.execute("SELECT idempotency_key, operation, payload FROM dead_letter").fetchall()
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO outbox (idempotency_key, operation, payload, status, next_attempt, created) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(key, operation, payload, self.STATUS_PENDING, now, now) for key, operation, payload in rows])
+            self._connection.execute("DELETE FROM dead_letter")
+
+        return len(rows)
@@ -6,10 +6,12 @@ from future import standard_library
 # external imports
 import json
 import functools
+from collections import OrderedDict
 
 # package imports
 from .log import get_logger
-from .models import CursorPage, PhishingIndicator, PhishingSubmission
+from .models import BulkResult, CursorPage, PhishingIndicator, PhishingSubmission
+from .utils import iter_concurrently
 
 # python 2 backwards compatibility
 standard_library.install_aliases()
@@ -134,6 +136,80 @@ class PhishingTriageClient(object):
         return self._client.post("triage/submissions/{submission_id}/status"
                                  .format(submission_id=submission_id), params=params)
 
+    def mark_triage_statuses(self, updates, max_workers=8, progress=None):
+        """
+        Marks the triage status of many phishing submissions, using concurrent calls to |mark_triage_status|.  If the
+        same submission appears more than once, only its last status is applied.
+
+        :param updates: an iterable of ``(submission_id, status)`` tuples
+        :param int max_workers: the maximum number of requests in flight at the same time
+        :param progress: an optional function, called after each submission is done as
+            ``progress(completed, total, result)``, where ``result`` is the |BulkResult| of that submission
+        :return: A list of |BulkResult| objects, one per distinct submission, in order of completion.  The ``key`` of each
+            result is the submission ID and its ``result`` is the status that was applied.
+
+        Example:
+
+        >>> results = ts.mark_triage_statuses([("1234", "CONFIRMED"), ("5678", "IGNORED")])
+        >>> failed = [result.key for result in results if not result.succeeded]
+        """
+
+        statuses = OrderedDict()
+        for submission_id, status in updates:
+            statuses[str(submission_id)] = status
+
+        def mark(submission_id):
+            self.mark_triage_status(submission_id=submission_id, status=statuses[submission_id])
+            return statuses[submission_id]
+
+        results = []
+        for submission_id, status, error in iter_concurrently(mark, statuses, max_workers=max_workers):
+            if error is not None:
+                logger.warning("Failed to mark triage status of submission %s: %s" % (submission_id, error))
+            result = BulkResult(key=submission_id, result=status, error=error)
+            results.append(result)
+            if progress is not None:
+                progress(len(results), len(statuses), result)
+
+        logger.debug("Marked triage status of %d of %d submissions."
+                     % (sum(1 for result in results if result.succeeded), len(results)))
+        return results
+
+    def mark_triage_statuses_where(self, predicate, status, from_time=None, to_time=None, priority_event_score=None,
+                                   enclave_ids=None, current_status=None, max_workers=8, progress=None):
+        """
+        Marks the triage status of every phishing submission, returned by |get_phishing_submissions| for the given
+        criteria, that satisfies a predicate.  All matching submissions are listed before any of them is marked, since
+        marking them while paging could change the pages that are still to be fetched.
+
+        :param predicate: a function that takes a |PhishingSubmission| and returns whether it should be marked
+        :param string status: the triage status to mark the matching submissions with
+        :param int from_time: Start of time window in milliseconds since epoch (optional)
+        :param int to_time: End of time window in milliseconds since epoch (optional)
+        :param list(int) priority_event_score: List of desired scores of phishing submission on a scale of 0-3
+                                             (default: [3]).
+        :param list(string) enclave_ids: List of enclave ids to pull submissions from.
+                                         (defaults to all of a user's enclaves).
+        :param list(string) current_status: List of statuses to filter submissions by (default: ['UNRESOLVED']).
+        :param int max_workers: the maximum number of requests in flight at the same time
+        :param progress: an optional progress function, as for |mark_triage_statuses|
+        :return: A list of |BulkResult| objects, as for |mark_triage_statuses|.
+
+        Example:
+
+        >>> results = ts.mark_triage_statuses_where(lambda submission: "newsletter" in submission.title.lower(),
+        ...                                         status="IGNORED", priority_event_score=[0, 1])
+        """
+
+        submissions = self.get_phishing_submissions(from_time=from_time,
+                                                    to_time=to_time,
+                                                    priority_event_score=priority_event_score,
+                                                    enclave_ids=enclave_ids,
+                                                    status=current_status)
+        updates = [(submission.submission_id, status) for submission in submissions if predicate(submission)]
+
+        return self.mark_triage_statuses(updates, max_workers=max_workers, progress=progress)
+
     def get_phishing_indicators(self, from_time=None, to_time=None, normalized_indicator_score=None,
                                 priority_event_score=None, status=None, enclave_ids=None, cursor=None):
         """
@@ -0,0 +1,204 @@
+# python 2 backwards compatibility
+from __future__ import print_function
+from builtins import object, range
+
+# external imports
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# package imports
+from .models import RedactedReport, Report
+
+
+class Redactor(object):
+    """
+    Redacts report titles and bodies locally, without a round-trip to the ``redaction/report`` endpoint.  The
+    redaction terms are compiled once into an Aho-Corasick automaton, so that each text is scanned in a single pass
+    whatever the number of terms.  Where matches overlap, the leftmost match is redacted, and the longest term among
+    those starting at the same position.
+
+    The output is meant to match that of |redact_report|, but this depends on the terms given; use |Redactor.verify| to
+    compare the two on a sample of reports.  Obtain a redactor with |get_redactor| to include the company's whitelist.
+
+    Example:
+
+    >>> redactor = ts.get_redactor(terms=["Acme Corp", "project falcon"])
+    >>> redactor.redact(title="Acme Corp phishing", report_body="...").title
+    '[REDACTED] phishing'
+    >>> redacted_reports = redactor.redact_many(reports, processes=4)
+    """
+
+    def __init__(self, terms, replacement='[REDACTED]', case_sensitive=False, whole_words=False):
+        """
+        :param terms: an iterable of terms to redact
+        :param str replacement: the string each redacted term is replaced with
+        :param boolean case_sensitive: whether terms only match text with the same case
+        :param boolean whole_words: whether terms only match whole words, i.e. not when the text immediately before or
+            after the match is a letter or a digit
+        """
+
+        self.replacement = replacement
+        self.case_sensitive = case_sensitive
+        self.whole_words = whole_words
+
+        # the trie: the transitions of each state, the state reached on a mismatch, and the lengths of the terms that
+        # end at each state (including, via the failure links, terms that are suffixes of the state's string)
+        self._transitions = [{}]
+        self._failures = [0]
+        self._outputs = [()]
+
+        for term in terms:
+            if not term:
+                continue
+            if not case_sensitive:
+                term = term.lower()
+            state = 0
+            for char in term:
+                next_state = self._transitions[state].get(char)
+                if next_state is None:
+                    next_state = len(self._transitions)
+                    self._transitions[state][char] = next_state
+                    self._transitions.append({})
+                    self._failures.append(0)
+                    self._outputs.append(())
+                state = next_state
+            if len(term) not in self._outputs[state]:
+                self._outputs[state] += (len(term),)
+
+        # compute the failure links breadth-first, so that those of shorter strings are known first
+        queue = deque(self._transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._transitions[state].items():
+                queue.append(next_state)
+                failure = self._failures[state]
+                while failure and char not in self._transitions[failure]:
+                    failure = self._failures[failure]
+                failure = self._transitions[failure].get(char, 0)
+                self._failures[next_state] = failure
+                self._outputs[next_state] += self._outputs[failure]
+
+    def __len__(self):
+        """
+        :return: the number of states of the automaton
+        """
+
+        return len(self._transitions)
+
+    def _normalize(self, text):
+        if self.case_sensitive:
+            return text
+        lowered = text.lower()
+        if len(lowered) == len(text):
+            return lowered
+        # a few characters change length when lowered; leave those as they are, so that positions still line up
+        return ''.join(char if len(char.lower()) != 1 else char.lower() for char in text)
+
+    def find(self, text):
+        """
+        Finds the terms in a text.
+
+        :param str text: the text
+        :return: the list of ``(start, end)`` positions of the terms that would be redacted, in order
+        """
+
+        if not text:
+            return []
+
+        transitions = self._transitions
+        failures = self._failures
+        outputs = self._outputs
+
+        matches = []
+        state = 0
+        for i, char in enumerate(self._normalize(text)):
+            while state and char not in transitions[state]:
+                state = failures[state]
+            state = transitions[state].get(char, 0)
+            for length in outputs[state]:
+                matches.append((i + 1 - length, i + 1))
+
+        if self.whole_words:
+            matches = [(start, end) for start, end in matches
+                       if (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum())]
+
+        # keep the leftmost-longest matches that do not overlap
+        matches.sort(key=lambda match: (match[0], -match[1]))
+        selected = []
+        position = 0
+        for start, end in matches:
+            if start >= position:
+                selected.append((start, end))
+                position = end
+        return selected
+
+    def redact_text(self, text):
+        """
+        :param str text: a text
+        :return: the text, with the terms replaced
+        """
+
+        if not text:
+            return text
+
+        parts = []
+        position = 0
+        for start, end in self.find(text):
+            parts.append(text[position:start])
+            parts.append(self.replacement)
+            position = end
+        parts.append(text[position:])
+        return ''.join(parts)
+
+    def redact(self, title=None, report_body=None):
+        """
+        Redacts a report's title and body, like |redact_report|.
+
+        :param str title: The title of the report to apply redaction to.
+        :param str report_body: The body of the report to apply redaction to.
+        :return: a |RedactedReport| object.
+        """
+
+        return RedactedReport(title=self.redact_text(title), body=self.redact_text(report_body))
+
+    def _redact_chunk(self, chunk):
+        return [self.redact(title, body) for title, body in chunk]
+
+    def redact_many(self, reports, processes=None, chunk_size=500):
+        """
+        Redacts many reports, in parallel processes.  The redactor is sent to each process once per chunk of reports.
+
+        :param reports: an iterable of |Report| objects or of ``(title, body)`` tuples
+        :param int processes: the number of processes to use (defaults to the number of CPUs); if 1, the reports are
+            redacted in this process
+        :param int chunk_size: the number of reports sent to a process at a time
+        :return: a list of |RedactedReport| objects, in the same order as ``reports``
+        """
+
+        items = [(report.title, report.body) if isinstance(report, Report) else tuple(report) for report in reports]
+        if processes == 1 or len(items) <= chunk_size:
+            return self._redact_chunk(items)
+
+        chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = [executor.submit(_redact_chunk, self, chunk) for chunk in chunks]
+            return [redacted for future in futures for redacted in future.result()]
+
+    def verify(self, ts, title=None, report_body=None):
+        """
+        Compares the local redaction of a report to that of the ``redaction/report`` endpoint.
+
+        :param ts: the |TruStar| object used to call |redact_report|
+        :param str title: The title of the report.
+        :param str report_body: The body of the report.
+        :return: a tuple of the local |RedactedReport|, the server's |RedactedReport|, and whether they are the same
+        """
+
+        local = self.redact(title, report_body)
+        server = ts.redact_report(title=title, report_body=report_body)
+        return local, server, (local.title, local.body) == (server.title, server.body)
+
+
+def _redact_chunk(redactor, chunk):
+    # a module-level function, so that it can be called in another process
+    return redactor._redact_chunk(chunk)
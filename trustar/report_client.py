@@ -6,15 +6,20 @@ from future import standard_library
 from six import string_types
 
 # external imports
+import heapq
 import json
+import os
+import time
+from collections import OrderedDict
 from datetime import datetime
 import functools
 from requests.exceptions import BaseHTTPError
 
 # package imports
 from .log import get_logger
-from .models import NumberedPage, Report, RedactedReport, DistributionType, IdType
-from .utils import get_time_based_page_generator, DAY
+from .models import BulkResult, NumberedPage, Report, RedactedReport, DistributionType, IdType, SubmissionStatus
+from .redaction import Redactor
+from .utils import get_time_based_page_generator, iter_concurrently, merge_page_generators, DAY
 
 # python 2 backwards compatibility
 standard_library.install_aliases()
@@ -56,6 +61,63 @@ class ReportClient(object):
         resp = self._client.get("reports/%s" % report_id, params=params)
         return Report.from_dict(resp.json())
 
+    def get_reports_details(self, reports, id_type=None, max_workers=8, cache=None):
+        """
+        Retrieves many reports by their IDs, concurrently, using |get_report_details| for each one.
+
+        :param reports: an iterable of report IDs, or of |Report| objects (such as those returned by |get_reports|).
+            When a |Report| object is given, a cached copy is only used if it is at least as recent as the object's
+            ``updated`` field.
+        :param str id_type: Indicates whether the IDs are internal or external.
+        :param int max_workers: the maximum number of requests in flight at the same time
+        :param ReportCache cache: a |ReportCache| to look reports up in before requesting them, and to store the
+            retrieved reports in (optional)
+        :return: A list of |BulkResult| objects, in the same order as ``reports``.  The ``key`` of each result is the
+            report ID and its ``result`` is the |Report| object.  Each ID is only requested once, even if it appears
+            several times.
+
+        Example:
+
+        >>> results = ts.get_reports_details(report_ids, max_workers=16)
+        >>> reports = [result.result for result in results if result.succeeded]
+        """
+
+        keys = []
+        freshness = {}
+        for report in reports:
+            updated = None
+            if isinstance(report, Report):
+                updated = report.updated
+                report = report.external_id if id_type == IdType.EXTERNAL else report.id
+            keys.append(report)
+            # if the same report is given with several timestamps, the most recent one is required
+            if updated is not None and (freshness.get(report) or 0) < updated:
+                freshness[report] = updated
+            else:
+                freshness.setdefault(report, updated)
+
+        found = {}
+        errors = {}
+        missing = []
+        for report_id, updated in freshness.items():
+            cached = cache.get(report_id, id_type=id_type, updated=updated) if cache is not None else None
+            if cached is not None:
+                found[report_id] = cached
+            else:
+                missing.append(report_id)
+
+        get_details = functools.partial(self.get_report_details, id_type=id_type)
+        for report_id, report, error in iter_concurrently(get_details, missing, max_workers=max_workers):
+            if error is not None:
+                errors[report_id] = error
+                continue
+            found[report_id] = report
+            if cache is not None:
+                cache.put(report)
+
+        return [BulkResult(key=report_id, result=found.get(report_id), error=errors.get(report_id))
+                for report_id in keys]
+
     def get_reports_page(self, is_enclave=None, enclave_ids=None, tag=None, excluded_tags=None,
                          from_time=None, to_time=None):
         """
@@ -163,6 +225,32 @@ class ReportClient(object):
 
         return report
 
+    def submit_reports(self, reports, max_workers=4):
+        """
+        Submits many reports concurrently, using |submit_report| for each one.  Reports are consumed lazily from the
+        iterable, and the requests share this client's rate limit:  when any of them receives a 429, all of them wait.
+        A report that cannot be submitted (for instance, a 413 because it contains more indicators than are supported)
+        does not stop the others.
+
+        :param reports: an iterable (or generator) of |Report| objects
+        :param int max_workers: the maximum number of reports being submitted at the same time
+        :return: A generator of |BulkResult| objects, in the order the submissions complete.  The ``key`` of each result
+            is the |Report| object; on success its ``id`` field has been filled in.
+
+        Example:
+
+        >>> for result in ts.submit_reports(reports):
+        >>>     if result.succeeded:
+        >>>         print(result.key.id)
+        >>>     elif result.status_code == 413:
+        >>>         print("Too many indicators in %s" % result.key.title)
+        """
+
+        for report, _, error in iter_concurrently(self.submit_report, reports, max_workers=max_workers):
+            if error is not None:
+                logger.warning("Failed to submit report '%s': %s" % (report.title, error))
+            yield BulkResult(key=report, result=report.id, error=error)
+
     def update_report(self, report):
         """
         Updates the report identified by the ``report.id`` field; if this field does not exist, then
@@ -170,6 +258,10 @@ class ReportClient(object):
         will overwrite values on the report in TruSTAR's system.   Any fields that are  ``None`` will simply be ignored;
         their values will be unchanged.
 
+        If the report was retrieved from the API (e.g. with |get_report_details|), only the fields that were modified
+        since it was retrieved are sent, and no request is made at all if none were.  This avoids re-uploading the
+        report body when only the title or another small field has changed.
+
         :param report: A |Report| object with the updated values.
         :return: The |Report| object.
 
@@ -196,16 +288,48 @@ class ReportClient(object):
         else:
             raise Exception("Cannot update report without either an ID or an external ID.")
 
-        # not allowed to update value of 'reportId', so remove it
-        report_dict = {k: v for k, v in report.to_dict().items() if k != 'reportId'}
+        # only send the fields that changed since the report was retrieved, if this is known
+        report_dict = report.get_changes()
+        if report_dict is None:
+            # not allowed to update value of 'reportId', so remove it
+            report_dict = {k: v for k, v in report.to_dict().items() if k != 'reportId'}
+        elif not report_dict:
+            logger.debug("Report %s has no changes, not updating it." % report_id)
+            return report
 
         params = {'idType': id_type}
 
-        data = json.dumps(report.to_dict())
+        data = json.dumps(report_dict)
         self._client.put("reports/%s" % report_id, data=data, params=params)
 
+        # the values that were sent are now the values on the server
+        report.snapshot()
+
         return report
 
+    def update_reports(self, reports, max_workers=4):
+        """
+        Updates many reports concurrently, using |update_report| for each one.  Reports retrieved from the API only
+        send the fields that were modified since they were retrieved.
+
+        :param reports: an iterable (or generator) of |Report| objects with the updated values
+        :param int max_workers: the maximum number of reports being updated at the same time
+        :return: A generator of |BulkResult| objects, in the order the updates complete.  The ``key`` of each result is
+            the |Report| object.
+
+        Example:
+
+        >>> reports = [result.result for result in ts.get_reports_details(report_ids) if result.succeeded]
+        >>> for report in reports:
+        >>>     report.title = "[CLOSED] " + report.title
+        >>> failed = [result.key for result in ts.update_reports(reports) if not result.succeeded]
+        """
+
+        for report, _, error in iter_concurrently(self.update_report, reports, max_workers=max_workers):
+            if error is not None:
+                logger.warning("Failed to update report %s: %s" % (report.id or report.external_id, error))
+            yield BulkResult(key=report, result=report.id, error=error)
+
     def delete_report(self, report_id, id_type=None):
         """
         Deletes the report with the given ID.
@@ -222,7 +346,8 @@ class ReportClient(object):
         params = {'idType': id_type}
         self._client.delete("reports/%s" % report_id, params=params)
 
-    def copy_report(self, src_report_id, dest_enclave_id, from_provided_submission=False, report=None, tags=None):
+    def copy_report(self, src_report_id, dest_enclave_id, from_provided_submission=False, report=None, tags=None,
+                    id_type=None):
         """
         Copy a report to another enclave.  All properties of the report, including tags, will be copied.
         A reference to the original report will still be stored on the child, allowing the system to track the
@@ -245,12 +370,14 @@ class ReportClient(object):
         :param list(str) tags: (required if ``from_provided_submission`` is ``True``) a list of tags to use if ``from_provided_submission`` is ``True``.
             **NOTE:** if ``from_provided_submission`` is True, the tags from the source report will be completely
             ignored, and this list of tags will be used instead.  MUST be provided if ``from_provided_submission`` is ``True``.
+        :param str id_type: indicates whether the ID is an internal or external ID
         :return: the ID of the newly-created copy
         """
 
         params = {
             'destEnclaveId': dest_enclave_id,
-            'copyFromProvidedSubmission': from_provided_submission
+            'copyFromProvidedSubmission': from_provided_submission,
+            'idType': id_type
         }
 
         # determine if edits are being made to the copy
@@ -273,7 +400,7 @@ class ReportClient(object):
         response = self._client.post('reports/copy/{id}'.format(id=src_report_id), params=params, data=json.dumps(body))
         return response.json().get('id')
 
-    def move_report(self, report_id, dest_enclave_id):
+    def move_report(self, report_id, dest_enclave_id, id_type=None):
         """
         Move a report from one enclave to another.
 
@@ -281,16 +408,133 @@ class ReportClient(object):
 
         :param report_id: the ID of the report to move
         :param dest_enclave_id: the ID of the enclave to move the report to
+        :param str id_type: indicates whether the ID is an internal or external ID
         :return: the ID of the report
         """
 
         params = {
-            'destEnclaveId': dest_enclave_id
+            'destEnclaveId': dest_enclave_id,
+            'idType': id_type
         }
 
         response = self._client.post('reports/move/{id}'.format(id=report_id), params=params)
         return response.json().get('id')
 
+    def _apply_to_reports(self, operation, reports, id_type=None, max_workers=8, checkpoint=None):
+        """
+        Applies an operation to many reports concurrently, skipping and recording the IDs listed in a checkpoint file.
+
+        :param operation: a function that takes a report ID and returns the result of the operation
+        :param reports: an iterable of report IDs, or of |Report| objects
+        :param str id_type: Indicates whether the IDs are internal or external.
+        :param int max_workers: the maximum number of requests in flight at the same time
+        :param str checkpoint: the path of the checkpoint file (optional)
+        :return: the list of |BulkResult| objects of the reports that were not skipped, in order of completion
+        """
+
+        completed = set()
+        if checkpoint is not None and os.path.exists(checkpoint):
+            with open(checkpoint) as f:
+                completed = set(line.split('\t')[0] for line in f.read().splitlines() if line)
+
+        # do not apply the operation twice at once if the same report is given again; a report that failed is tried
+        # again if it is given again after its failure
+        in_flight = set()
+
+        def get_report_ids():
+            for report in reports:
+                if isinstance(report, Report):
+                    report = report.external_id if id_type == IdType.EXTERNAL else report.id
+                if report in completed or report in in_flight:
+                    continue
+                in_flight.add(report)
+                yield report
+
+        results = []
+        f = open(checkpoint, 'a') if checkpoint is not None else None
+        try:
+            for report_id, result, error in iter_concurrently(operation, get_report_ids(), max_workers=max_workers):
+                in_flight.discard(report_id)
+                if error is not None:
+                    logger.warning("Failed to process report %s: %s" % (report_id, error))
+                else:
+                    completed.add(report_id)
+                    if f is not None:
+                        f.write('%s\t%s\n' % (report_id, result or ''))
+                        f.flush()
+                results.append(BulkResult(key=report_id, result=result, error=error))
+        finally:
+            if f is not None:
+                f.close()
+
+        logger.info("Processed %d reports: %d succeeded, %d failed."
+                    % (len(results), sum(1 for result in results if result.succeeded),
+                       sum(1 for result in results if not result.succeeded)))
+        return results
+
+    def delete_reports(self, reports, id_type=None, max_workers=8, checkpoint=None):
+        """
+        Deletes many reports, using concurrent calls to |delete_report|.
+
+        If a ``checkpoint`` path is given, the ID of each report that is deleted is appended to that file, and reports
+        already listed in it are skipped; an interrupted run can thus be resumed by calling this method again with the
+        same file.  Reports can be streamed from |get_reports|, whose time-based pagination is not affected by the
+        deletions; do not stream them from a method paginated by page number, since each deletion shifts the pages.
+
+        :param reports: an iterable of report IDs, or of |Report| objects
+        :param str id_type: Indicates whether the IDs are internal or external.
+        :param int max_workers: the maximum number of requests in flight at the same time
+        :param str checkpoint: the path of the checkpoint file (optional)
+        :return: A list of |BulkResult| objects, one per report that was not skipped, in order of completion.  The
+            ``key`` of each result is the report ID.
+
+        Example:
+
+        >>> results = ts.delete_reports(ts.get_reports(from_time=from_time, to_time=to_time, is_enclave=True),
+        ...                             checkpoint="deleted_reports.txt")
+        """
+
+        return self._apply_to_reports(functools.partial(self.delete_report, id_type=id_type), reports,
+                                      id_type=id_type, max_workers=max_workers, checkpoint=checkpoint)
+
+    def copy_reports(self, reports, dest_enclave_id, id_type=None, max_workers=8, checkpoint=None):
+        """
+        Copies many reports to another enclave, using concurrent calls to |copy_report|.  The ``checkpoint`` file works
+        as for |delete_reports|, and also records the ID of each copy.
+
+        :param reports: an iterable of report IDs, or of |Report| objects
+        :param str dest_enclave_id: the ID of the enclave to copy the reports to
+        :param str id_type: Indicates whether the IDs are internal or external.
+        :param int max_workers: the maximum number of requests in flight at the same time
+        :param str checkpoint: the path of the checkpoint file (optional)
+        :return: A list of |BulkResult| objects, one per report that was not skipped, in order of completion.  The
+            ``key`` of each result is the ID of the source report and its ``result`` is the ID of the copy.
+        """
+
+        def copy(report_id):
+            return self.copy_report(report_id, dest_enclave_id, id_type=id_type)
+
+        return self._apply_to_reports(copy, reports, id_type=id_type, max_workers=max_workers, checkpoint=checkpoint)
+
+    def move_reports(self, reports, dest_enclave_id, id_type=None, max_workers=8, checkpoint=None):
+        """
+        Moves many reports to another enclave, using concurrent calls to |move_report|.  The ``checkpoint`` file works
+        as for |delete_reports|.
+
+        :param reports: an iterable of report IDs, or of |Report| objects
+        :param str dest_enclave_id: the ID of the enclave to move the reports to
+        :param str id_type: Indicates whether the IDs are internal or external.
+        :param int max_workers: the maximum number of requests in flight at the same time
+        :param str checkpoint: the path of the checkpoint file (optional)
+        :return: A list of |BulkResult| objects, one per report that was not skipped, in order of completion.  The
+            ``key`` of each result is the report ID.
+        """
+
+        def move(report_id):
+            return self.move_report(report_id, dest_enclave_id, id_type=id_type)
+
+        return self._apply_to_reports(move, reports, id_type=id_type, max_workers=max_workers, checkpoint=checkpoint)
+
     def get_correlated_report_ids(self, indicators):
         """
         DEPRECATED!
@@ -430,7 +674,8 @@ class ReportClient(object):
             to_time=to_time
         )
 
-    def get_reports(self, is_enclave=None, enclave_ids=None, tag=None, excluded_tags=None, from_time=None, to_time=None):
+    def get_reports(self, is_enclave=None, enclave_ids=None, tag=None, excluded_tags=None, from_time=None, to_time=None,
+                    fan_out=False, max_workers=8):
         """
         Uses the |get_reports_page| method to create a generator that returns each successive report as a trustar
         report object.
@@ -446,6 +691,11 @@ class ReportClient(object):
         :param list(str) excluded_tags: a list of tags; reports containing ANY of these tags will not be returned. 
         :param int from_time: start of time window in milliseconds since epoch (optional)
         :param int to_time: end of time window in milliseconds since epoch (optional)
+        :param boolean fan_out: if ``True``, each enclave in ``enclave_ids`` (by default, the configured enclaves, or
+            else all of the user's enclaves) is queried separately and concurrently, and the results are merged in
+            order of updated time, with each report returned only once.  This avoids failures when a tag name exists in
+            more than one enclave, and narrow per-enclave queries are usually faster on large accounts.
+        :param int max_workers: when ``fan_out`` is ``True``, the maximum number of requests in flight at the same time
         :return: A generator of Report objects.
 
         Note:  If a report contains all of the tags in the list passed as argument to the 'tag' parameter and also 
@@ -464,6 +714,16 @@ class ReportClient(object):
 
         """
 
+        if fan_out:
+            page_generators = [self._get_reports_page_generator(is_enclave, [enclave_id], tag, excluded_tags,
+                                                                from_time, to_time)
+                               for enclave_id in self._get_fan_out_enclave_ids(enclave_ids)]
+            return merge_page_generators(page_generators,
+                                         key=lambda report: report.updated or 0,
+                                         reverse=True,
+                                         unique_key=lambda report: report.id,
+                                         max_workers=max_workers)
+
         return NumberedPage.get_generator(page_generator=self._get_reports_page_generator(is_enclave, enclave_ids, tag,
                                                                                   excluded_tags, from_time, to_time))
 
@@ -530,7 +790,9 @@ class ReportClient(object):
                        from_time=None,
                        to_time=None,
                        tags=None,
-                       excluded_tags=None):
+                       excluded_tags=None,
+                       fan_out=False,
+                       max_workers=8):
         """
         Uses the |search_reports_page| method to create a generator that returns each successive report.
 
@@ -543,22 +805,38 @@ class ReportClient(object):
         :param list(str) tags: Name (or list of names) of tag(s) to filter reports by.  Only reports containing
             ALL of these tags will be returned. (optional)
         :param list(str) excluded_tags: Reports containing ANY of these tags will be excluded from the results.
+        :param boolean fan_out: if ``True``, each enclave in ``enclave_ids`` (by default, the configured enclaves, or
+            else all of the user's enclaves) is searched separately and concurrently, and the pages of results are
+            interleaved, with each report returned only once.
+        :param int max_workers: when ``fan_out`` is ``True``, the maximum number of requests in flight at the same time
         :return: The generator of Report objects.  Note that the body attributes of these reports will be ``None``.
         """
 
+        if fan_out:
+            page_generators = [self._search_reports_page_generator(search_term, [enclave_id], from_time, to_time,
+                                                                   tags, excluded_tags)
+                               for enclave_id in self._get_fan_out_enclave_ids(enclave_ids)]
+            return merge_page_generators(page_generators,
+                                         unique_key=lambda report: report.id,
+                                         max_workers=max_workers)
+
         return NumberedPage.get_generator(page_generator=self._search_reports_page_generator(search_term, enclave_ids,
                                                                                      from_time, to_time, tags,
                                                                                      excluded_tags))
 
-    def redact_report(self, title=None, report_body=None):
+    def redact_report(self, title=None, report_body=None, redactor=None):
         """
         Redacts a report's title and body.
 
         :param str title: The title of the report to apply redaction to.
         :param str report_body: The body of the report to apply redaction to.
+        :param redactor: a |Redactor| to redact the report locally with, instead of calling the API (optional)
         :return: a |RedactedReport| object.
         """
 
+        if redactor is not None:
+            return redactor.redact(title=title, report_body=report_body)
+
         body = {
             'title': title,
             'reportBody': report_body
@@ -568,6 +846,23 @@ class ReportClient(object):
 
         return RedactedReport.from_dict(resp.json())
     
+    def get_redactor(self, terms=None, include_whitelist=True, **kwargs):
+        """
+        Creates a |Redactor|, to redact reports locally rather than with |redact_report|.
+
+        :param terms: an iterable of terms to redact, e.g. company-specific names (optional)
+        :param boolean include_whitelist: whether to also redact the values of the company's whitelisted indicators,
+            as returned by |get_whitelist|
+        :param kwargs: any other arguments of the |Redactor| constructor
+        :return: the |Redactor| object
+        """
+
+        terms = list(terms or [])
+        if include_whitelist:
+            terms.extend(indicator.value for indicator in self.get_whitelist())
+
+        return Redactor(terms, **kwargs)
+
     def get_report_deeplink(self, report):
         """
         Retrieves the Station's report deeplink.
@@ -637,3 +932,110 @@ class ReportClient(object):
         response.raise_for_status()
         result = response.json()
         return result
+
+    def wait_for_reports(self, reports, timeout=None, initial_interval=1, max_interval=60, backoff=2,
+                         max_workers=4, max_requests=None, max_errors=5):
+        """
+        Polls the processing status of many reports until each of them has either succeeded or failed, and yields the
+        status of each report as soon as it reaches one of these final states.  Only reports that are still processing
+        are polled, and each report is polled less and less often the longer it stays in processing, starting at
+        ``initial_interval`` seconds and multiplying by ``backoff`` after every poll, up to ``max_interval`` seconds.
+
+        :param reports: an iterable of |Report| objects or report IDs, i.e. the keys of the results of |submit_reports|
+        :param timeout: the maximum number of seconds to wait for all reports (optional - by default, waits forever)
+        :param initial_interval: the number of seconds before a report is polled for the second time
+        :param max_interval: the maximum number of seconds between two polls of the same report
+        :param backoff: the factor by which the interval between polls of a report grows after each poll
+        :param int max_workers: the maximum number of status requests in flight at the same time
+        :param int max_requests: the maximum total number of status requests (optional - by default, unlimited)
+        :param int max_errors: the number of failed status requests (e.g. 429, 5xx or connection errors) after which a
+            report is given up on
+        :return: A generator of status dicts, as returned by |get_report_status|, one per element of ``reports``; a
+            report given more than once is polled once, and its status yielded once per occurrence.  A report whose
+            status cannot be obtained, because the request fails with a 4xx error other than 429 (e.g. an unknown ID)
+            or fails ``max_errors`` times, is yielded with the status ``SUBMISSION_FAILURE``, the error as
+            ``errorMessage`` and the status code of the last response, if any, as ``statusCode``.  If the timeout or the maximum number
+            of requests is reached, the generator stops, and the reports that were still processing are not yielded.
+
+        Example:
+
+        >>> report_ids = [result.key.id for result in ts.submit_reports(reports) if result.succeeded]
+        >>> for status in ts.wait_for_reports(report_ids, timeout=600):
+        >>>     print(status['id'], status['status'])
+        """
+
+        final_statuses = (SubmissionStatus.SUBMISSION_SUCCESS, SubmissionStatus.SUBMISSION_FAILURE)
+
+        deadline = None
+        if timeout is not None:
+            deadline = time.time() + timeout
+
+        # the number of times each report was given, so that duplicates are polled once but yielded once each
+        counts = OrderedDict()
+        for report in reports:
+            report_id = report.id if isinstance(report, Report) else report
+            counts[report_id] = counts.get(report_id, 0) + 1
+
+        # heap of (time of next poll, interval since previous poll, report id); all reports are due immediately
+        now = time.time()
+        queue = [(now, initial_interval, report_id) for report_id in counts]
+        heapq.heapify(queue)
+        errors = {}
+
+        request_count = 0
+        while queue:
+            now = time.time()
+            if deadline is not None and now >= deadline:
+                logger.warning("Timed out waiting for %d reports to finish processing." % len(queue))
+                return
+
+            # collect the reports that are due, without exceeding the request budget
+            due = []
+            while queue and queue[0][0] <= now:
+                if max_requests is not None and request_count + len(due) >= max_requests:
+                    break
+                due.append(heapq.heappop(queue))
+
+            if not due:
+                if max_requests is not None and request_count >= max_requests:
+                    logger.warning("Reached the maximum of %d status requests with %d reports still processing."
+                                   % (max_requests, len(queue)))
+                    return
+
+                # sleep until the next report is due, or until the deadline
+                next_poll = queue[0][0]
+                if deadline is not None:
+                    next_poll = min(next_poll, deadline)
+                time.sleep(max(next_poll - now, 0))
+                continue
+
+            request_count += len(due)
+            intervals = {report_id: interval for _, interval, report_id in due}
+            for report_id, result, error in iter_concurrently(self.get_report_status,
+                                                              list(intervals),
+                                                              max_workers=max_workers):
+                if error is None and result.get('status') in final_statuses:
+                    for _ in range(counts[report_id]):
+                        yield result
+                    continue
+
+                if error is not None:
+                    logger.warning("Failed to get the status of report %s: %s" % (report_id, error))
+                    errors[report_id] = errors.get(report_id, 0) + 1
+                    status_code = getattr(getattr(error, 'response', None), 'status_code', None)
+                    # a client error, e.g. an unknown ID, will not go away by polling again, but a rate limit will
+                    permanent = status_code is not None and 400 <= status_code < 500 and status_code != 429
+                    if permanent or errors[report_id] >= max_errors:
+                        failure = {
+                            'id': report_id,
+                            'status': SubmissionStatus.SUBMISSION_FAILURE,
+                            'errorMessage': str(error),
+                            'statusCode': status_code
+                        }
+                        for _ in range(counts[report_id]):
+                            yield failure
+                        continue
+
+                # still processing; poll again later, less often
+                interval = intervals[report_id]
+                heapq.heappush(queue, (time.time() + interval, min(interval * backoff, max_interval), report_id))
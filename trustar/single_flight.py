@@ -0,0 +1,69 @@
+# python 2 backwards compatibility
+from __future__ import print_function
+from builtins import object
+
+# external imports
+import threading
+
+
+class _Call(object):
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Coalesces concurrent identical calls:  while a call with a given key is in flight, other threads making a call with
+    the same key wait for it and get its result (or its exception) instead of making their own.  Calls made once it
+    has finished are made again, so nothing is cached.
+
+    An |ApiClient| uses one to coalesce identical ``GET`` requests when the ``coalesce_requests`` config key of
+    |TruStar| is ``True``.
+
+    Example:
+
+    >>> single_flight = SingleFlight()
+    >>> result, shared = single_flight.do(('GET', 'enclaves'), lambda: ts.get_user_enclaves())
+    """
+
+    def __init__(self):
+        self.saved = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        """
+        :param key: a hashable key identifying the call
+        :param func: a function without arguments that makes the call
+        :return: a tuple of the result of the call and a boolean that is ``True`` if the result came from a call made
+            by another thread
+        """
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.saved += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result, False
@@ -4,10 +4,13 @@ from builtins import object, str
 from future import standard_library
 from six import string_types
 import json
+from collections import OrderedDict
 
 # package imports
+from .cache import TagIndex
 from .log import get_logger
-from .models import Tag
+from .models import BulkResult, Indicator, Tag
+from .utils import iter_concurrently
 
 # python 2 backwards compatibility
 standard_library.install_aliases()
@@ -48,6 +51,53 @@ class TagClient(object):
         resp = self._client.post("reports/{}/alter-tags".format(report_id), params=params, data=json.dumps(body))
         return resp.json().get('id')
 
+    def alter_reports_tags(self, changes, id_type=None, max_workers=8):
+        """
+        Bulk add/remove tags from many reports.  All the changes to the same report are merged, so that a single
+        |alter_report_tags| call is made per report, and the calls for different reports are made concurrently.  When
+        the same tag is both added to and removed from a report, the change that comes last wins.
+
+        :param changes: an iterable of ``(report_id, added_tags, removed_tags)`` tuples, where ``added_tags`` and
+            ``removed_tags`` are lists of tag names
+        :param id_type: indicates whether the IDs are internal or external IDs
+        :param int max_workers: the maximum number of requests in flight at the same time
+        :return: A generator of |BulkResult| objects, one per report, in the order the calls complete.  The ``key`` of
+            each result is the report ID.  No call is made for a report without any tag to add or remove; its result
+            is ``None``.
+
+        Example:
+
+        >>> changes = ((report_id, ["triaged"], ["new"]) for report_id in report_ids)
+        >>> failed = [result.key for result in ts.alter_reports_tags(changes) if not result.succeeded]
+        """
+
+        # for each report, map each tag name to whether it should be added (True) or removed (False)
+        merged = OrderedDict()
+        for report_id, added_tags, removed_tags in changes:
+            report_changes = merged.setdefault(report_id, OrderedDict())
+            for name in added_tags or []:
+                report_changes.pop(name, None)
+                report_changes[name] = True
+            for name in removed_tags or []:
+                report_changes.pop(name, None)
+                report_changes[name] = False
+
+        def alter(report_id):
+            report_changes = merged[report_id]
+            return self.alter_report_tags(report_id=report_id,
+                                          added_tags=[name for name, added in report_changes.items() if added],
+                                          removed_tags=[name for name, added in report_changes.items() if not added],
+                                          id_type=id_type)
+
+        for report_id in [report_id for report_id, report_changes in merged.items() if not report_changes]:
+            del merged[report_id]
+            yield BulkResult(key=report_id)
+
+        for report_id, result, error in iter_concurrently(alter, list(merged), max_workers=max_workers):
+            if error is not None:
+                logger.warning("Failed to alter the tags of report %s: %s" % (report_id, error))
+            yield BulkResult(key=report_id, result=result, error=error)
+
     def add_enclave_tag(self, report_id, name, enclave_id=None, id_type=None):
         """
         Adds a tag to a specific report, for a specific enclave.
@@ -107,6 +157,41 @@ class TagClient(object):
         resp = self._client.get("reports/tags", params=params)
         return [Tag.from_dict(indicator) for indicator in resp.json()]
 
+    def get_tag_index(self, enclave_ids=None, refresh=False):
+        """
+        Gets an index of the report tags and indicator tags in the given enclaves, built from |get_all_enclave_tags| and
+        |get_all_indicator_tags|.  The index is cached, and only rebuilt when ``refresh`` is ``True``.
+
+        :param (string) list enclave_ids: list of enclave IDs (defaults to the enclave IDs of this object)
+        :param boolean refresh: whether to retrieve the tags again, even if an index of these enclaves is cached
+        :return: A |TagIndex| object.
+        """
+
+        if enclave_ids is None:
+            enclave_ids = self.enclave_ids
+
+        key = tuple(sorted(enclave_ids or []))
+        with self._tag_indexes_lock:
+            index = self._tag_indexes.get(key)
+        if index is None or refresh:
+            # built without holding the lock, so that other threads can use the cached indexes in the meantime
+            index = TagIndex(report_tags=self.get_all_enclave_tags(enclave_ids=enclave_ids),
+                             indicator_tags=self.get_all_indicator_tags(enclave_ids=enclave_ids))
+            with self._tag_indexes_lock:
+                self._tag_indexes[key] = index
+
+        return index
+
+    def _add_to_tag_indexes(self, tag, enclave_id):
+        """
+        Adds a newly created indicator tag to the cached tag indexes that cover its enclave.
+        """
+
+        with self._tag_indexes_lock:
+            indexes = [index for key, index in self._tag_indexes.items() if enclave_id in key]
+        for index in indexes:
+            index.add_indicator_tag(tag)
+
     def get_all_indicator_tags(self, enclave_ids=None):
         """
         Get all indicator tags for a set of enclaves.
@@ -156,3 +241,116 @@ class TagClient(object):
         }
 
         self._client.delete("indicators/tags/%s" % tag_id, params=params)
+
+    def add_indicator_tags(self, items, max_workers=8, via_submit=False, chunk_size=1000):
+        """
+        Adds many tags to many indicators.  Duplicate items are only applied once, and the requests are made
+        concurrently; they share this client's rate limit, so a 429 on any of them pauses all of them.
+
+        By default, one |add_indicator_tag| call is made per item.  If ``via_submit`` is ``True``, the items are instead
+        grouped by enclave and sent with |submit_indicators|, in chunks of at most ``chunk_size`` indicators, each
+        carrying all of its tags in that enclave.  This takes far fewer requests, but note that it submits the
+        indicators to the enclave, i.e. an indicator that was not already in the enclave will be added to it.
+
+        :param items: an iterable of ``(indicator_value, tag_name, enclave_id)`` tuples
+        :param int max_workers: the maximum number of requests in flight at the same time
+        :param boolean via_submit: whether to tag the indicators by submitting them
+        :param int chunk_size: when ``via_submit`` is ``True``, the maximum number of indicators per submission
+        :return: A generator of |BulkResult| objects, one per distinct item, in the order they complete.  The ``key`` of
+            each result is the item tuple; when ``via_submit`` is ``False``, its ``result`` is the |Tag| object.  When
+            ``via_submit`` is ``True``, items without an enclave ID fail with a ``ValueError``, since indicators can
+            only be submitted to an enclave.
+
+        Example:
+
+        >>> items = ((value, "campaign-x", enclave_id) for value in values)
+        >>> failed = [result.key for result in ts.add_indicator_tags(items, via_submit=True) if not result.succeeded]
+        """
+
+        items = list(OrderedDict.fromkeys(tuple(item) for item in items))
+
+        if not via_submit:
+            def add(item):
+                tag = self.add_indicator_tag(*item)
+                # keep cached tag indexes aware of tags that were just created
+                self._add_to_tag_indexes(tag, item[2])
+                return tag
+
+            for item, tag, error in iter_concurrently(add, items, max_workers=max_workers):
+                if error is not None:
+                    logger.warning("Failed to add tag '%s' to indicator %s: %s" % (item[1], item[0], error))
+                yield BulkResult(key=item, result=tag, error=error)
+            return
+
+        # group the tags of each indicator by enclave, then split each enclave into chunks of indicators
+        enclaves = OrderedDict()
+        for item in items:
+            value, name, enclave_id = item
+            if enclave_id is None:
+                yield BulkResult(key=item, error=ValueError("Cannot submit indicator %s without an enclave ID" % value))
+                continue
+            enclaves.setdefault(enclave_id, OrderedDict()).setdefault(value, []).append(item)
+
+        chunks = []
+        for enclave_id, indicators in enclaves.items():
+            values = list(indicators)
+            for i in range(0, len(values), chunk_size):
+                chunks.append((enclave_id, [(value, indicators[value]) for value in values[i:i + chunk_size]]))
+
+        def submit(chunk):
+            enclave_id, indicators = chunk
+            self.submit_indicators([Indicator(value=value, tags=[Tag(name=item[1], enclave_id=enclave_id)
+                                                                 for item in value_items])
+                                    for value, value_items in indicators],
+                                   enclave_ids=[enclave_id])
+
+        for chunk, _, error in iter_concurrently(submit, chunks, max_workers=max_workers):
+            if error is not None:
+                logger.warning("Failed to submit %d tagged indicators to enclave %s: %s"
+                               % (len(chunk[1]), chunk[0], error))
+            for value, value_items in chunk[1]:
+                for item in value_items:
+                    yield BulkResult(key=item, error=error)
+
+    def delete_indicator_tags(self, items, max_workers=8):
+        """
+        Deletes many tags from many indicators.  The tags are identified by name and enclave; their IDs are resolved
+        once, using |get_tag_index|.  Duplicate items are only applied once, and the requests are made concurrently.
+
+        :param items: an iterable of ``(indicator_value, tag_name, enclave_id)`` tuples
+        :param int max_workers: the maximum number of requests in flight at the same time
+        :return: A generator of |BulkResult| objects, one per distinct item, in the order they complete.  The ``key`` of
+            each result is the item tuple.  Items whose tag does not exist fail with a ``KeyError``, and items without
+            an enclave ID whose tag name exists in several enclaves fail with a ``ValueError``.
+        """
+
+        items = list(OrderedDict.fromkeys(tuple(item) for item in items))
+
+        # a tag given without an enclave is looked up in this object's enclaves too
+        enclave_ids = set(item[2] for item in items if item[2] is not None)
+        if any(item[2] is None for item in items):
+            enclave_ids.update(self.enclave_ids or [])
+        index = self.get_tag_index(enclave_ids=sorted(enclave_ids))
+
+        resolved = []
+        for item in items:
+            value, name, enclave_id = item
+            try:
+                tag_id = index.get_indicator_tag_id(name, enclave_id)
+            except ValueError as e:
+                yield BulkResult(key=item, error=e)
+                continue
+            if tag_id is None:
+                yield BulkResult(key=item, error=KeyError("No indicator tag named '%s' in enclave %s"
+                                                          % (name, enclave_id)))
+            else:
+                resolved.append((item, tag_id))
+
+        def delete(resolved_item):
+            item, tag_id = resolved_item
+            self.delete_indicator_tag(item[0], tag_id)
+
+        for (item, _), _, error in iter_concurrently(delete, resolved, max_workers=max_workers):
+            if error is not None:
+                logger.warning("Failed to delete tag '%s' from indicator %s: %s" % (item[1], item[0], error))
+            yield BulkResult(key=item, error=error)
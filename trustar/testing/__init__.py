@@ -0,0 +1,4 @@
+from __future__ import absolute_import
+
+from .server import StandInApi, StandInServer
+from .http2 import Http2StandInServer
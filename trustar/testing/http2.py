@@ -0,0 +1,275 @@
+# python 2 backwards compatibility
+from __future__ import print_function
+from builtins import object, str
+
+# external imports
+import ssl
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from six.moves.urllib.parse import parse_qs, urlsplit
+
+# package imports
+from ..log import get_logger
+from .server import StandInApi
+
+logger = get_logger(__name__)
+
+# headers that are specific to an HTTP/1.1 connection, and not allowed over HTTP/2
+_CONNECTION_HEADERS = frozenset(['connection', 'keep-alive', 'proxy-connection', 'transfer-encoding', 'upgrade'])
+
+
+class _Http2Connection(object):
+    """
+    The ``asyncio`` protocol of a connection to a |Http2StandInServer|.  Each request is handled by the |StandInApi| in
+    a worker thread as soon as its stream ends, so that the requests multiplexed over the connection are served
+    concurrently; the responses are written by the event loop, within the flow control windows of the client.
+    """
+
+    def __init__(self, server):
+        from h2.config import H2Configuration
+        from h2.connection import H2Connection
+
+        self._server = server
+        self._connection = H2Connection(config=H2Configuration(client_side=False, header_encoding='utf-8'))
+        self._transport = None
+        # the headers and body chunks of the requests still being received, and the bodies still being sent, by stream
+        self._requests = {}
+        self._outgoing = {}
+
+    def connection_made(self, transport):
+        self._transport = transport
+        self._server._connections.add(self)
+        self._connection.initiate_connection()
+        self._send()
+
+    def connection_lost(self, exc):
+        self._server._connections.discard(self)
+        self._transport = None
+
+    def eof_received(self):
+        return False
+
+    def pause_writing(self):
+        pass
+
+    def resume_writing(self):
+        pass
+
+    def data_received(self, data):
+        from h2.events import (ConnectionTerminated, DataReceived, RequestReceived, StreamEnded, StreamReset,
+                               WindowUpdated)
+        from h2.exceptions import ProtocolError
+
+        try:
+            events = self._connection.receive_data(data)
+        except ProtocolError as e:
+            logger.warning("HTTP/2 protocol error: %s" % e)
+            self._send()
+            self._transport.close()
+            return
+
+        for event in events:
+            if isinstance(event, RequestReceived):
+                self._requests[event.stream_id] = (dict(event.headers), [])
+            elif isinstance(event, DataReceived):
+                if event.stream_id in self._requests:
+                    self._requests[event.stream_id][1].append(event.data)
+                self._connection.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+            elif isinstance(event, StreamEnded):
+                request = self._requests.pop(event.stream_id, None)
+                if request is not None:
+                    self._respond(event.stream_id, *request)
+            elif isinstance(event, StreamReset):
+                self._requests.pop(event.stream_id, None)
+                self._outgoing.pop(event.stream_id, None)
+            elif isinstance(event, WindowUpdated):
+                stream_ids = list(self._outgoing) if event.stream_id == 0 else [event.stream_id]
+                for stream_id in stream_ids:
+                    self._flush(stream_id)
+            elif isinstance(event, ConnectionTerminated):
+                self._transport.close()
+                return
+
+        self._send()
+
+    def _send(self):
+        data = self._connection.data_to_send()
+        if data and self._transport is not None:
+            self._transport.write(data)
+
+    def _respond(self, stream_id, headers, chunks):
+        url = urlsplit(headers.get(':path', '/'))
+        request_headers = dict((name, value) for name, value in headers.items() if not name.startswith(':'))
+        body = b''.join(chunks) or None
+        future = self._server._loop.run_in_executor(self._server._executor, self._server.api.handle,
+                                                    headers.get(':method'), url.path, parse_qs(url.query),
+                                                    request_headers, body)
+        # the callback runs in the event loop
+        future.add_done_callback(lambda result: self._send_response(stream_id, result))
+
+    def _send_response(self, stream_id, result):
+        if self._transport is None:
+            return
+        if result.exception() is not None:
+            logger.error("Error while handling a request: %s" % result.exception())
+            status, response_headers, payload = 500, {}, b''
+        else:
+            status, response_headers, payload = result.result()
+
+        headers = [(':status', str(status))]
+        headers.extend((name.lower(), str(value)) for name, value in response_headers.items()
+                       if name.lower() not in _CONNECTION_HEADERS and name.lower() != 'content-length')
+        headers.append(('content-length', str(len(payload))))
+        self._connection.send_headers(stream_id, headers)
+        self._outgoing[stream_id] = payload
+        self._flush(stream_id)
+        self._send()
+
+    def _flush(self, stream_id):
+        # sends as much of the body of a response as the flow control windows allow
+        from h2.exceptions import StreamClosedError
+
+        data = self._outgoing.pop(stream_id, None)
+        if data is None:
+            return
+        try:
+            while data:
+                size = min(self._connection.local_flow_control_window(stream_id),
+                           self._connection.max_outbound_frame_size, len(data))
+                if size <= 0:
+                    self._outgoing[stream_id] = data
+                    return
+                self._connection.send_data(stream_id, data[:size])
+                data = data[size:]
+            self._connection.end_stream(stream_id)
+        except StreamClosedError:
+            pass
+
+
+class Http2StandInServer(object):
+    """
+    Serves a |StandInApi| over HTTP/2 with TLS on a local port, in a background thread, so that the multiplexing of
+    |HttpxTransport| can be measured against the HTTP/1.1 |StandInServer|.  ``h2`` is negotiated with ALPN;
+    clients that do not offer it are not supported.
+
+    It requires the ``h2`` package (part of the optional ``http2`` dependencies), and a certificate for the host, e.g.
+    a self-signed one.  The configuration it returns does not verify the certificate.
+
+    Example:
+
+    >>> with Http2StandInServer(api, certfile="cert.pem", keyfile="key.pem") as server:
+    ...     ts = TruStar(config=server.get_config())
+    ...     ts.set_transport(HttpxTransport())
+    ...     ts.ping()
+    """
+
+    def __init__(self, api=None, certfile=None, keyfile=None, host='127.0.0.1', port=0, max_workers=32):
+        """
+        :param api: the |StandInApi| to serve (by default, one with the default settings and no data)
+        :param str certfile: the path of the PEM file of the certificate of the server
+        :param str keyfile: the path of the PEM file of its private key (if it is not in ``certfile``)
+        :param str host: the host to listen on
+        :param int port: the port to listen on (by default, any free port)
+        :param int max_workers: the maximum number of requests handled at the same time
+        """
+
+        try:
+            import h2
+        except ImportError:
+            raise ImportError("Http2StandInServer requires h2; install it with: pip install trustar[http2]")
+
+        self.api = api if api is not None else StandInApi()
+        self.certfile = certfile
+        self.keyfile = keyfile
+        self.host = host
+        self.port = port
+        self.max_workers = max_workers
+
+        self._loop = None
+        self._executor = None
+        self._thread = None
+        self._connections = set()
+
+    @property
+    def url(self):
+        """
+        :return: the base URL of the server, e.g. ``https://127.0.0.1:54321``
+        """
+
+        return 'https://%s:%d' % (self.host, self.port)
+
+    def get_config(self, **overrides):
+        """
+        :param overrides: any other configuration options
+        :return: a configuration dictionary for a |TruStar| object that uses this server
+        """
+
+        return self.api.get_config(self.url, **overrides)
+
+    def start(self):
+        """
+        Starts serving in a background thread.
+        """
+
+        import asyncio
+
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(self.certfile, self.keyfile)
+        context.set_alpn_protocols(['h2'])
+
+        self._loop = asyncio.new_event_loop()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        started = threading.Event()
+        errors = []
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            try:
+                server = self._loop.run_until_complete(
+                    self._loop.create_server(lambda: _Http2Connection(self), self.host, self.port, ssl=context))
+            except Exception as e:
+                errors.append(e)
+                started.set()
+                return
+            self.port = server.sockets[0].getsockname()[1]
+            started.set()
+            try:
+                self._loop.run_forever()
+            finally:
+                server.close()
+                for connection in list(self._connections):
+                    if connection._transport is not None:
+                        connection._transport.abort()
+                # let the aborted connections be cleaned up
+                self._loop.run_until_complete(asyncio.sleep(0))
+                self._loop.close()
+
+        self._thread = threading.Thread(target=run, name="trustar-http2-stand-in-server")
+        self._thread.daemon = True
+        self._thread.start()
+        started.wait()
+        if errors:
+            self._thread.join()
+            self._thread = None
+            raise errors[0]
+        logger.info("Stand-in TruSTAR API listening on %s over HTTP/2" % self.url)
+
+    def stop(self):
+        """
+        Stops serving.
+        """
+
+        if self._thread is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._executor.shutdown(wait=True)
+            self._thread = None
+            self._loop = None
+            self._executor = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
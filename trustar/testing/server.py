@@ -0,0 +1,696 @@
+# python 2 backwards compatibility
+from __future__ import print_function
+from builtins import object, range, str
+
+# external imports
+import argparse
+import base64
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from six.moves.BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from six.moves.socketserver import ThreadingMixIn
+from six.moves.urllib.parse import parse_qs, urlsplit
+
+# package imports
+from ..log import get_logger
+from ..utils import get_current_time_millis
+
+logger = get_logger(__name__)
+
+DAY = 24 * 60 * 60 * 1000
+
+
+class StandInApi(object):
+    """
+    An in-memory emulation of the endpoints of the TruSTAR API that |ApiClient| uses, for load, latency and failure
+    testing without a network.  It issues OAuth2 tokens that expire, paginates reports by time, indicators and
+    summaries by page number and phishing triage data by cursor, answers with ``waitTime`` 429s when a request quota is
+    exhausted, and can inject latency and 5xx errors.
+
+    This class only maps requests to responses; serve it over HTTP with |StandInServer|, or call |StandInApi.handle|
+    directly.
+
+    Example:
+
+    >>> api = StandInApi(quota=100, quota_window=1, latency=0.02, error_rate=0.01, seed=42)
+    >>> api.populate(reports=5000, indicators=20000, submissions=1000)
+    >>> with StandInServer(api) as server:
+    ...     ts = TruStar(config=server.get_config())
+    ...     reports = list(ts.get_reports(from_time=0))
+    """
+
+    API_PATH = '/api/1.3'
+    TOKEN_PATH = '/oauth/token'
+
+    EXPIRED_TOKEN_MESSAGE = "Expired oauth2 access token"
+    INVALID_TOKEN_MESSAGE = "Invalid oauth2 access token"
+
+    def __init__(self, api_key='api-key', api_secret='api-secret', token_lifetime=3600, quota=None, quota_window=60,
+                 latency=0, error_rate=0, seed=None, reports_page_size=100, default_page_size=25, max_page_size=1000):
+        """
+        :param str api_key: the API key that tokens are issued to
+        :param str api_secret: the API secret that tokens are issued to
+        :param token_lifetime: the number of seconds a token is valid for
+        :param int quota: the number of API requests allowed per ``quota_window`` (by default, unlimited)
+        :param quota_window: the length of a quota window, in seconds
+        :param latency: the number of seconds every request takes, or a function returning such a number
+        :param float error_rate: the probability of any API request failing with a 503
+        :param seed: the seed of the random numbers used for injected errors and generated data
+        :param int reports_page_size: the number of reports per page of ``GET /reports``
+        :param int default_page_size: the page size of numbered and cursor pagination, if the request gives none
+        :param int max_page_size: the maximum page size of numbered and cursor pagination
+        """
+
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.token_lifetime = token_lifetime
+        self.quota = quota
+        self.quota_window = quota_window
+        self.latency = latency
+        self.error_rate = error_rate
+        self.reports_page_size = reports_page_size
+        self.default_page_size = default_page_size
+        self.max_page_size = max_page_size
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens = {}
+        self._window_start = time.time()
+        self._window_requests = 0
+
+        self.enclaves = [{'id': 'enclave-%d' % i, 'name': 'Enclave %d' % i, 'type': 'INTERNAL',
+                          'read': True, 'create': True, 'update': True} for i in range(1, 3)]
+        self.reports = {}
+        self.indicators = []
+        self.whitelist = []
+        self.submissions = []
+        self.phishing_indicators = []
+
+        # the number of responses sent, by status code
+        self.stats = {}
+
+        self._routes = [
+            ('GET', r'ping', self._ping),
+            ('GET', r'version', self._version),
+            ('GET', r'enclaves', self._get_enclaves),
+            ('GET', r'reports', self._get_reports),
+            ('POST', r'reports', self._submit_report),
+            ('POST', r'reports/search', self._search_reports),
+            ('POST', r'reports/copy/(?P<id>[^/]+)', self._copy_report),
+            ('POST', r'reports/move/(?P<id>[^/]+)', self._move_report),
+            ('GET', r'reports/(?P<id>[^/]+)/status', self._get_report_status),
+            ('GET', r'reports/(?P<id>[^/]+)', self._get_report),
+            ('PUT', r'reports/(?P<id>[^/]+)', self._update_report),
+            ('DELETE', r'reports/(?P<id>[^/]+)', self._delete_report),
+            ('GET', r'indicators', self._get_indicators),
+            ('POST', r'indicators', self._submit_indicators),
+            ('POST', r'indicators/search', self._search_indicators),
+            ('POST', r'indicators/summaries', self._get_indicator_summaries),
+            ('GET', r'whitelist', self._get_whitelist),
+            ('POST', r'triage/submissions', self._get_phishing_submissions),
+            ('POST', r'triage/submissions/(?P<id>[^/]+)/status', self._mark_triage_status),
+            ('POST', r'triage/indicators', self._get_phishing_indicators),
+        ]
+        self._routes = [(method, re.compile('^%s$' % pattern), handler) for method, pattern, handler in self._routes]
+
+    ############
+    ### Data ###
+    ############
+
+    def populate(self, reports=0, indicators=0, submissions=0, time_span=7 * DAY):
+        """
+        Generates data, with timestamps spread over a time span that ends now.
+
+        :param int reports: the number of reports to generate
+        :param int indicators: the number of indicators to generate
+        :param int submissions: the number of phishing submissions to generate, each with one phishing indicator
+        :param int time_span: the length of the time span, in milliseconds
+        """
+
+        now = get_current_time_millis()
+        enclave_ids = [enclave['id'] for enclave in self.enclaves]
+
+        with self._lock:
+            for i in range(reports):
+                timestamp = now - self._random.randint(0, time_span)
+                report_id = str(uuid.UUID(int=self._random.getrandbits(128)))
+                self.reports[report_id] = {
+                    'id': report_id,
+                    'title': 'Report %d' % i,
+                    'reportBody': 'Seen 10.0.%d.%d and evil-%d.com' % (i // 256 % 256, i % 256, i),
+                    'timeBegan': timestamp,
+                    'created': timestamp,
+                    'updated': timestamp,
+                    'distributionType': 'ENCLAVE',
+                    'enclaveIds': [enclave_ids[i % len(enclave_ids)]],
+                    'externalTrackingId': 'external-%d' % i,
+                }
+
+            for i in range(indicators):
+                timestamp = now - self._random.randint(0, time_span)
+                self.indicators.append({
+                    'value': 'evil-%d.com' % i,
+                    'indicatorType': 'URL',
+                    'priorityLevel': self._random.choice(['LOW', 'MEDIUM', 'HIGH']),
+                    'firstSeen': timestamp,
+                    'lastSeen': timestamp,
+                    'enclaveIds': [enclave_ids[i % len(enclave_ids)]],
+                })
+
+            for i in range(submissions):
+                timestamp = now - self._random.randint(0, time_span)
+                submission_id = str(len(self.submissions) + 1)
+                score = self._random.randint(0, 3)
+                self.submissions.append({
+                    'submissionId': submission_id,
+                    'title': 'Suspicious email %d' % i,
+                    'priorityEventScore': score,
+                    'status': 'UNRESOLVED',
+                    'context': [],
+                    '_created': timestamp,
+                })
+                self.phishing_indicators.append({
+                    'indicatorType': 'URL',
+                    'value': 'phish-%d.com' % i,
+                    'sourceKey': self._random.choice(['virustotal', 'crowdstrike_indicator']),
+                    'normalizedIndicatorScore': score,
+                    'originalIndicatorScore': score * 30,
+                    '_created': timestamp,
+                    '_submission': submission_id,
+                })
+
+    ################
+    ### Handling ###
+    ################
+
+    def handle(self, method, path, query=None, headers=None, body=None):
+        """
+        Computes the response to a request.
+
+        :param str method: the method of the request
+        :param str path: the path of the request URL, e.g. ``/api/1.3/reports``
+        :param dict query: the query parameters, as a dictionary from name to list of values
+        :param dict headers: the headers of the request
+        :param body: the body of the request, as bytes or a string
+        :return: a tuple of the status code, a dictionary of headers, and the body (bytes)
+        """
+
+        query = query or {}
+        headers = dict((key.lower(), value) for key, value in (headers or {}).items())
+        if isinstance(body, bytes):
+            body = body.decode('utf-8')
+
+        latency = self.latency() if callable(self.latency) else self.latency
+        if latency:
+            time.sleep(latency)
+
+        try:
+            status, payload = self._handle(method.upper(), path, query, headers, body)
+        except Exception as e:
+            logger.error("Stand-in API failed to handle %s %s: %s" % (method, path, e))
+            status, payload = 500, {'message': str(e)}
+
+        with self._lock:
+            self.stats[status] = self.stats.get(status, 0) + 1
+
+        response_headers = {'Trace-Id': uuid.uuid4().hex}
+        if isinstance(payload, (dict, list)):
+            payload = json.dumps(payload)
+            response_headers['Content-Type'] = 'application/json'
+        else:
+            response_headers['Content-Type'] = 'text/plain'
+        return status, response_headers, (payload or '').encode('utf-8')
+
+    def _handle(self, method, path, query, headers, body):
+        if path == self.TOKEN_PATH:
+            return self._issue_token(method, headers)
+
+        if not path.startswith(self.API_PATH + '/'):
+            return 404, {'message': "Not found: %s" % path}
+
+        # authentication
+        authorization = headers.get('authorization', '')
+        token = authorization[len('Bearer '):] if authorization.startswith('Bearer ') else None
+        with self._lock:
+            expiry = self._tokens.get(token)
+        if expiry is None:
+            return 400, {'error': 'invalid_token', 'error_description': self.INVALID_TOKEN_MESSAGE}
+        if expiry < time.time():
+            return 400, {'error': 'invalid_token', 'error_description': self.EXPIRED_TOKEN_MESSAGE}
+
+        # quota
+        wait_time = self._consume_quota()
+        if wait_time is not None:
+            return 429, {'message': "Too many requests", 'waitTime': wait_time}
+
+        # injected errors
+        if self.error_rate and self._random.random() < self.error_rate:
+            return 503, {'message': "Injected error"}
+
+        route = path[len(self.API_PATH) + 1:]
+        matched_path = False
+        for route_method, pattern, handler in self._routes:
+            match = pattern.match(route)
+            if match is None:
+                continue
+            matched_path = True
+            if route_method == method:
+                data = json.loads(body) if body else None
+                return handler(query=query, data=data, **match.groupdict())
+        if matched_path:
+            return 405, {'message': "Method not allowed: %s %s" % (method, path)}
+        return 404, {'message': "Not found: %s" % path}
+
+    def _issue_token(self, method, headers):
+        if method != 'POST':
+            return 405, {'message': "Method not allowed"}
+
+        authorization = headers.get('authorization', '')
+        expected = base64.b64encode(('%s:%s' % (self.api_key, self.api_secret)).encode('utf-8')).decode('utf-8')
+        if authorization != 'Basic ' + expected:
+            return 401, {'error': 'unauthorized', 'error_description': "Bad credentials"}
+
+        token = uuid.uuid4().hex
+        with self._lock:
+            self._tokens[token] = time.time() + self.token_lifetime
+        return 200, {'access_token': token, 'token_type': 'bearer', 'expires_in': self.token_lifetime}
+
+    def get_config(self, url='http://stand-in', **overrides):
+        """
+        :param str url: the base URL the API is served at, e.g. by a |StandInServer|.  With an |InMemoryTransport|,
+            any URL works.
+        :param overrides: any other configuration options
+        :return: a configuration dictionary for a |TruStar| object that uses this API
+        """
+
+        config = {
+            'auth_endpoint': url + self.TOKEN_PATH,
+            'api_endpoint': url + self.API_PATH,
+            'user_api_key': self.api_key,
+            'user_api_secret': self.api_secret,
+            'enclave_ids': [enclave['id'] for enclave in self.enclaves],
+            'verify': False,
+        }
+        config.update(overrides)
+        return config
+
+    def expire_tokens(self):
+        """
+        Expires all tokens issued so far, e.g. to test that clients obtain new ones.
+        """
+
+        with self._lock:
+            for token in self._tokens:
+                self._tokens[token] = 0
+
+    def _consume_quota(self):
+        """
+        :return: ``None`` if the request is within the quota, else the number of milliseconds until the next window
+        """
+
+        if self.quota is None:
+            return None
+
+        with self._lock:
+            now = time.time()
+            if now - self._window_start >= self.quota_window:
+                self._window_start = now
+                self._window_requests = 0
+            if self._window_requests >= self.quota:
+                return int((self._window_start + self.quota_window - now) * 1000) + 1
+            self._window_requests += 1
+            return None
+
+    ##################
+    ### Pagination ###
+    ##################
+
+    @staticmethod
+    def _get_param(query, name, default=None, parse=None):
+        values = query.get(name)
+        if not values or values[0] in ('', None):
+            return default
+        return parse(values[0]) if parse is not None else values[0]
+
+    @staticmethod
+    def _public(item):
+        return dict((key, value) for key, value in item.items() if not key.startswith('_'))
+
+    def _numbered_page(self, items, query):
+        page_number = self._get_param(query, 'pageNumber', 0, int)
+        page_size = min(self._get_param(query, 'pageSize', self.default_page_size, int), self.max_page_size)
+        start = page_number * page_size
+        return 200, {
+            'items': [self._public(item) for item in items[start:start + page_size]],
+            'pageNumber': page_number,
+            'pageSize': page_size,
+            'totalElements': len(items),
+            'hasNext': start + page_size < len(items),
+        }
+
+    def _cursor_page(self, items, query, data):
+        cursor = data.get('cursor')
+        if cursor:
+            position = json.loads(base64.b64decode(cursor.encode('utf-8')).decode('utf-8'))
+            page_number, page_size = position['pageNumber'], position['pageSize']
+        else:
+            page_number = 0
+            page_size = min(self._get_param(query, 'pageSize', self.default_page_size, int), self.max_page_size)
+
+        start = page_number * page_size
+        next_cursor = ''
+        if start + page_size < len(items):
+            position = {'pageNumber': page_number + 1, 'pageSize': page_size}
+            next_cursor = base64.b64encode(json.dumps(position).encode('utf-8')).decode('utf-8')
+
+        return 200, {
+            'items': [self._public(item) for item in items[start:start + page_size]],
+            'responseMetadata': {'nextCursor': next_cursor},
+        }
+
+    #################
+    ### Endpoints ###
+    #################
+
+    def _ping(self, **kwargs):
+        return 200, 'pong\n'
+
+    def _version(self, **kwargs):
+        return 200, '1.3\n'
+
+    def _get_enclaves(self, **kwargs):
+        return 200, self.enclaves
+
+    def _find_report(self, report_id, query):
+        with self._lock:
+            if self._get_param(query, 'idType') == 'EXTERNAL':
+                for report in self.reports.values():
+                    if report.get('externalTrackingId') == report_id:
+                        return report
+                return None
+            return self.reports.get(report_id)
+
+    def _get_reports(self, query, **kwargs):
+        to_time = self._get_param(query, 'to', get_current_time_millis(), int)
+        from_time = self._get_param(query, 'from', to_time - DAY, int)
+        enclave_ids = set(query.get('enclaveIds', []))
+
+        with self._lock:
+            reports = [report for report in self.reports.values()
+                       if from_time <= report['updated'] <= to_time
+                       and (not enclave_ids or enclave_ids.intersection(report.get('enclaveIds') or []))]
+        reports.sort(key=lambda report: report['updated'], reverse=True)
+
+        page = reports[:self.reports_page_size]
+        return 200, {'items': page, 'pageNumber': 0, 'pageSize': len(page), 'totalElements': len(reports),
+                     'hasNext': len(reports) > len(page)}
+
+    def _get_report(self, query, id, **kwargs):
+        report = self._find_report(id, query)
+        if report is None:
+            return 404, {'message': "Report not found: %s" % id}
+        return 200, report
+
+    def _get_report_status(self, query, id, **kwargs):
+        report = self._find_report(id, query)
+        if report is None:
+            return 404, {'message': "Report not found: %s" % id}
+        return 200, {'id': report['id'], 'status': 'SUBMISSION_SUCCESS', 'errorMessage': ''}
+
+    def _submit_report(self, data, **kwargs):
+        now = get_current_time_millis()
+        report = dict((key, value) for key, value in (data or {}).items() if value is not None)
+        report['id'] = str(uuid.uuid4())
+        report['created'] = report['updated'] = now
+        with self._lock:
+            self.reports[report['id']] = report
+        return 200, report['id']
+
+    def _update_report(self, query, data, id, **kwargs):
+        report = self._find_report(id, query)
+        if report is None:
+            return 404, {'message': "Report not found: %s" % id}
+        with self._lock:
+            for key, value in (data or {}).items():
+                if key not in ('id', 'created', 'updated'):
+                    report[key] = value
+            report['updated'] = get_current_time_millis()
+        return 200, ''
+
+    def _delete_report(self, query, id, **kwargs):
+        report = self._find_report(id, query)
+        if report is None:
+            return 404, {'message': "Report not found: %s" % id}
+        with self._lock:
+            self.reports.pop(report['id'], None)
+        return 200, ''
+
+    def _copy_report(self, query, data, id, **kwargs):
+        report = self._find_report(id, {})
+        if report is None:
+            return 404, {'message': "Report not found: %s" % id}
+        copy = dict(data) if data else dict(report)
+        copy.pop('tags', None)
+        copy['enclaveIds'] = [self._get_param(query, 'destEnclaveId')]
+        copy['id'] = str(uuid.uuid4())
+        copy['created'] = copy['updated'] = get_current_time_millis()
+        with self._lock:
+            self.reports[copy['id']] = copy
+        return 200, {'id': copy['id']}
+
+    def _move_report(self, query, id, **kwargs):
+        report = self._find_report(id, {})
+        if report is None:
+            return 404, {'message': "Report not found: %s" % id}
+        with self._lock:
+            report['enclaveIds'] = [self._get_param(query, 'destEnclaveId')]
+            report['updated'] = get_current_time_millis()
+        return 200, {'id': report['id']}
+
+    def _search_reports(self, query, data, **kwargs):
+        term = ((data or {}).get('searchTerm') or '').lower()
+        with self._lock:
+            reports = [report for report in self.reports.values()
+                       if term in (report.get('title') or '').lower() or term in (report.get('reportBody') or '').lower()]
+        return self._numbered_page(reports, query)
+
+    def _get_indicators(self, query, **kwargs):
+        with self._lock:
+            indicators = list(self.indicators)
+        return self._numbered_page(indicators, query)
+
+    def _submit_indicators(self, data, **kwargs):
+        indicators = (data or {}).get('content') or []
+        with self._lock:
+            self.indicators.extend(indicators)
+        return 200, ''
+
+    def _search_indicators(self, query, data, **kwargs):
+        term = ((data or {}).get('searchTerm') or '').lower()
+        with self._lock:
+            indicators = [indicator for indicator in self.indicators if term in indicator['value'].lower()]
+        return self._numbered_page(indicators, query)
+
+    def _get_indicator_summaries(self, query, data, **kwargs):
+        values = set(data or [])
+        with self._lock:
+            indicators = [indicator for indicator in self.indicators if indicator['value'] in values]
+
+        # one summary per indicator and source, with a severity derived from the value so that it is stable
+        summaries = []
+        for indicator in indicators:
+            for i, source in enumerate(('virustotal', 'crowdstrike_indicator')):
+                severity = (len(indicator['value']) + i) % 4
+                summaries.append({
+                    'value': indicator['value'],
+                    'type': indicator.get('indicatorType'),
+                    'source': {'key': source, 'name': source.title()},
+                    'score': {'name': 'Risk Score', 'value': str(severity * 25)},
+                    'severityLevel': severity,
+                    'created': indicator.get('firstSeen'),
+                    'updated': indicator.get('lastSeen'),
+                    'attributes': [],
+                })
+        return self._numbered_page(summaries, query)
+
+    def _get_whitelist(self, query, **kwargs):
+        with self._lock:
+            whitelist = list(self.whitelist)
+        return self._numbered_page(whitelist, query)
+
+    def _filter_triage(self, items, data):
+        data = data or {}
+        from_time = data.get('from')
+        to_time = data.get('to')
+        statuses = data.get('status') or ['UNRESOLVED']
+        scores = data.get('priorityEventScore')
+
+        submissions = dict((submission['submissionId'], submission) for submission in self.submissions)
+        result = []
+        for item in items:
+            submission = submissions.get(item.get('_submission', item.get('submissionId')))
+            if from_time is not None and item['_created'] < from_time:
+                continue
+            if to_time is not None and item['_created'] > to_time:
+                continue
+            if submission is not None and submission['status'] not in statuses:
+                continue
+            if scores is not None and submission is not None and submission['priorityEventScore'] not in scores:
+                continue
+            result.append(item)
+        return result
+
+    def _get_phishing_submissions(self, query, data, **kwargs):
+        with self._lock:
+            submissions = self._filter_triage(self.submissions, data)
+        return self._cursor_page(submissions, query, data or {})
+
+    def _get_phishing_indicators(self, query, data, **kwargs):
+        with self._lock:
+            indicators = self._filter_triage(self.phishing_indicators, data)
+        return self._cursor_page(indicators, query, data or {})
+
+    def _mark_triage_status(self, query, id, **kwargs):
+        with self._lock:
+            for submission in self.submissions:
+                if submission['submissionId'] == id:
+                    submission['status'] = self._get_param(query, 'status')
+                    return 200, ''
+        return 404, {'message': "Submission not found: %s" % id}
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class StandInServer(object):
+    """
+    Serves a |StandInApi| over HTTP on a local port, in a background thread.
+
+    Example:
+
+    >>> with StandInServer(StandInApi(quota=50, quota_window=1)) as server:
+    ...     ts = TruStar(config=server.get_config())
+    ...     ts.ping()
+    """
+
+    def __init__(self, api=None, host='127.0.0.1', port=0):
+        """
+        :param api: the |StandInApi| to serve (by default, one with the default settings and no data)
+        :param str host: the host to listen on
+        :param int port: the port to listen on (by default, any free port)
+        """
+
+        self.api = api if api is not None else StandInApi()
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        """
+        :return: the base URL of the server, e.g. ``http://127.0.0.1:54321``
+        """
+
+        return 'http://%s:%d' % (self.host, self.port)
+
+    def get_config(self, **overrides):
+        """
+        :param overrides: any other configuration options
+        :return: a configuration dictionary for a |TruStar| object that uses this server
+        """
+
+        return self.api.get_config(self.url, **overrides)
+
+    def start(self):
+        """
+        Starts serving in a background thread.
+        """
+
+        api = self.api
+
+        class Handler(BaseHTTPRequestHandler):
+            # keep connections alive, so that clients can pool them
+            protocol_version = 'HTTP/1.1'
+
+            def _handle(self):
+                url = urlsplit(self.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else None
+                status, headers, payload = api.handle(self.command, url.path, parse_qs(url.query),
+                                                      dict(self.headers.items()), body)
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = _ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="trustar-stand-in-server")
+        self._thread.daemon = True
+        self._thread.start()
+        logger.info("Stand-in TruSTAR API listening on %s" % self.url)
+
+    def stop(self):
+        """
+        Stops serving.
+        """
+
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+            self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serves a stand-in TruSTAR API on a local port, for load testing.")
+    parser.add_argument('--host', default='127.0.0.1', help="The host to listen on.")
+    parser.add_argument('--port', type=int, default=8080, help="The port to listen on.")
+    parser.add_argument('--reports', type=int, default=1000, help="The number of reports to generate.")
+    parser.add_argument('--indicators', type=int, default=10000, help="The number of indicators to generate.")
+    parser.add_argument('--submissions', type=int, default=1000, help="The number of phishing submissions to generate.")
+    parser.add_argument('--quota', type=int, help="The number of requests allowed per quota window.")
+    parser.add_argument('--quota-window', type=float, default=60, help="The length of a quota window, in seconds.")
+    parser.add_argument('--latency', type=float, default=0, help="The latency of every request, in seconds.")
+    parser.add_argument('--error-rate', type=float, default=0, help="The probability of a request failing.")
+    parser.add_argument('--token-lifetime', type=float, default=3600, help="The lifetime of tokens, in seconds.")
+    parser.add_argument('--seed', type=int, help="The random seed.")
+    args = parser.parse_args()
+
+    api = StandInApi(token_lifetime=args.token_lifetime, quota=args.quota, quota_window=args.quota_window,
+                     latency=args.latency, error_rate=args.error_rate, seed=args.seed)
+    api.populate(reports=args.reports, indicators=args.indicators, submissions=args.submissions)
+
+    server = StandInServer(api, host=args.host, port=args.port)
+    server.start()
+    print(json.dumps(server.get_config(), indent=2))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+# python 2 backwards compatibility
+from __future__ import print_function
+from builtins import object
+
+# external imports
+import threading
+import time
+
+
+class _NoOpContext(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+class NoOpSpan(_NoOpContext):
+    """
+    The span returned by the default |Tracer|, which records nothing.
+    """
+
+    name = None
+    parent = None
+    attributes = {}
+
+    def set_attribute(self, key, value):
+        pass
+
+    def finish(self, error=None):
+        pass
+
+
+_NO_OP_SPAN = NoOpSpan()
+_NO_OP_CONTEXT = _NoOpContext()
+
+
+class Tracer(object):
+    """
+    The interface of the tracing hooks of the SDK.  Every API request, every page fetched by a paginated method and
+    every generator of pages opens a span; spans nest, so that the span of a generator contains the spans of its
+    pages, each of which contains the span of its request.
+
+    This base class is the default tracer, and does nothing.  Install a tracer with |set_tracer|, e.g. an
+    |InMemoryTracer|, or a subclass that forwards the spans to a tracing system.
+    """
+
+    def start_span(self, name, parent=None, **attributes):
+        """
+        Creates a span.  Use it as a context manager to make it the current span of the thread while the block runs,
+        and finish it at the end of the block; or call its ``finish`` method.
+
+        :param str name: the name of the span
+        :param parent: the parent span (by default, the current span of the thread)
+        :param attributes: the initial attributes of the span
+        :return: the span
+        """
+
+        return _NO_OP_SPAN
+
+    def activate(self, span):
+        """
+        :param span: a span that was started but not finished, or ``None``
+        :return: a context manager that makes the span the current span of the thread while it is active, without
+            finishing it
+        """
+
+        return _NO_OP_CONTEXT
+
+    def current_span(self):
+        """
+        :return: the current span of the thread, or ``None``
+        """
+
+        return None
+
+
+class Span(object):
+    """
+    A timed operation recorded by an |InMemoryTracer|.
+
+    :ivar name: the name of the span, e.g. ``trustar.request``
+    :ivar parent: the span that contains this one, or ``None``
+    :ivar children: the spans contained in this one
+    :ivar attributes: a dictionary of attributes, e.g. the Trace-Id of a request, or the number of a page
+    :ivar start_time: when the span started, in seconds since epoch
+    :ivar end_time: when the span finished, in seconds since epoch, or ``None`` if it has not finished yet
+    :ivar error: the exception that ended the span, if any
+    """
+
+    def __init__(self, tracer, name, parent=None, attributes=None):
+        self._tracer = tracer
+        self.name = name
+        self.parent = parent
+        self.children = []
+        self.attributes = dict(attributes or {})
+        self.start_time = time.time()
+        self.end_time = None
+        self.error = None
+
+    @property
+    def duration(self):
+        """
+        :return: the duration of the span in seconds, or ``None`` if it has not finished yet
+        """
+
+        return self.end_time - self.start_time if self.end_time is not None else None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def finish(self, error=None):
+        if self.end_time is not None:
+            return
+        self.end_time = time.time()
+        self.error = error
+        self._tracer._on_finish(self)
+
+    def __enter__(self):
+        self._tracer._push(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._tracer._pop(self)
+        self.finish(exc_value)
+        return False
+
+    def __repr__(self):
+        return "Span(%s, %s)" % (self.name, self.attributes)
+
+
+class _Activation(object):
+
+    def __init__(self, tracer, span):
+        self._tracer = tracer
+        self._span = span
+
+    def __enter__(self):
+        self._tracer._push(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._tracer._pop(self._span)
+        return False
+
+
+class InMemoryTracer(Tracer):
+    """
+    A |Tracer| that keeps every finished |Span| in memory, e.g. for tests or to profile a script.
+
+    Example:
+
+    >>> tracer = InMemoryTracer()
+    >>> set_tracer(tracer)
+    >>> reports = list(ts.get_reports())
+    >>> for span in tracer.get_root_spans():
+    ...     print(span.name, span.duration, [child.attributes for child in span.children])
+    """
+
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _push(self, span):
+        self._stack().append(span)
+
+    def _pop(self, span):
+        stack = self._stack()
+        if stack and stack[-1] is span:
+            stack.pop()
+        elif span in stack:
+            stack.remove(span)
+
+    def _on_finish(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def start_span(self, name, parent=None, **attributes):
+        if parent is None:
+            parent = self.current_span()
+        span = Span(self, name, parent=parent, attributes=attributes)
+        if parent is not None:
+            with self._lock:
+                parent.children.append(span)
+        return span
+
+    def activate(self, span):
+        if span is None:
+            return _NO_OP_CONTEXT
+        return _Activation(self, span)
+
+    def current_span(self):
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    def get_root_spans(self):
+        """
+        :return: the finished spans that have no parent, in the order they finished
+        """
+
+        with self._lock:
+            return [span for span in self.spans if span.parent is None]
+
+    def get_spans(self, name=None):
+        """
+        :param str name: the name of the spans to return (by default, all of them)
+        :return: the finished spans, in the order they finished
+        """
+
+        with self._lock:
+            return [span for span in self.spans if name is None or span.name == name]
+
+    def clear(self):
+        """
+        Discards the spans recorded so far.
+        """
+
+        with self._lock:
+            self.spans = []
+
+
+_tracer = Tracer()
+
+
+def set_tracer(tracer):
+    """
+    Installs the tracer used by all |TruStar| objects.
+
+    :param tracer: a |Tracer|, or ``None`` to restore the default tracer, which does nothing
+    """
+
+    global _tracer
+    _tracer = tracer if tracer is not None else Tracer()
+
+
+def get_tracer():
+    """
+    :return: the installed |Tracer|
+    """
+
+    return _tracer
+
+
+def get_function_name(func):
+    """
+    :param func: a function, or a ``functools.partial`` of one
+    :return: the name of the function, for naming spans
+    """
+
+    while hasattr(func, 'func'):
+        func = func.func
+    return getattr(func, '__name__', repr(func))
@@ -0,0 +1,234 @@
+# python 2 backwards compatibility
+from __future__ import print_function
+from builtins import object, str
+
+# external imports
+import io
+import os
+import requests
+import ssl
+import threading
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from six.moves.http_client import responses
+from six.moves.http_cookiejar import DefaultCookiePolicy
+from six.moves.urllib.parse import parse_qs, urlsplit
+
+
+class Transport(object):
+    """
+    The interface through which an |ApiClient| sends its HTTP requests.  The |ApiClient| still obtains tokens, retries
+    requests, and turns error responses into exceptions, so every feature of the SDK works over every transport.
+
+    A transport sends a ``requests.PreparedRequest`` and returns a ``requests.Response`` holding the status code, the
+    headers and a stream of the body, so that the rest of the SDK can use the response the same way regardless of the
+    transport.  The default transport is a |RequestsTransport|; install another one with |set_transport|.
+    """
+
+    def prepare(self, request):
+        """
+        :param request: a ``requests.Request``
+        :return: the ``requests.PreparedRequest`` to pass to |send|
+        """
+
+        return request.prepare()
+
+    def send(self, request, verify=True, proxies=None, timeout=None, **kwargs):
+        """
+        Sends a request.
+
+        :param request: a ``requests.PreparedRequest``
+        :param verify: whether to use SSL verification, or the path of a CA bundle
+        :param dict proxies: the proxies to use, by scheme
+        :param timeout: the number of seconds to wait for the server
+        :param kwargs: any other options, e.g. ``stream``
+        :return: a ``requests.Response``
+        """
+
+        raise NotImplementedError()
+
+    def close(self):
+        """
+        Releases the resources of the transport, e.g. its open connections.
+        """
+
+        pass
+
+
+class RequestsTransport(Transport):
+    """
+    The default |Transport|, which sends requests with the ``requests`` library.  Connections are pooled, and kept
+    alive between requests, by a ``requests.Session``.  Unless a session is given, cookies set by the server are
+    ignored, so that, as with the separate calls of ``requests.request`` this transport replaced, no request depends on
+    the responses to earlier ones.
+    """
+
+    def __init__(self, session=None):
+        """
+        :param session: the ``requests.Session`` to use (by default, a new one that does not keep cookies)
+        """
+
+        if session is None:
+            session = requests.Session()
+            session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        self.session = session
+
+    def prepare(self, request):
+        return self.session.prepare_request(request)
+
+    def send(self, request, verify=True, proxies=None, timeout=None, **kwargs):
+        # honor the environment, e.g. HTTPS_PROXY and REQUESTS_CA_BUNDLE, as requests.request does
+        settings = self.session.merge_environment_settings(request.url, proxies or {}, kwargs.pop('stream', None),
+                                                           verify, kwargs.pop('cert', None))
+        settings.update(kwargs)
+        return self.session.send(request, timeout=timeout, **settings)
+
+    def close(self):
+        self.session.close()
+
+
+class InMemoryTransport(Transport):
+    """
+    A |Transport| that passes requests to a Python object instead of sending them over the network, e.g. a
+    |StandInApi| for tests and benchmarks that should not depend on sockets.
+
+    Example:
+
+    >>> api = StandInApi()
+    >>> ts = TruStar(config=api.get_config())
+    >>> ts.set_transport(InMemoryTransport(api))
+    >>> ts.ping()
+    'pong'
+    """
+
+    def __init__(self, handler):
+        """
+        :param handler: an object with a ``handle(method, path, query, headers, body)`` method that returns a tuple of
+            the status code, a dictionary of headers, and the body as bytes, e.g. a |StandInApi|
+        """
+
+        self.handler = handler
+
+    def send(self, request, verify=True, proxies=None, timeout=None, **kwargs):
+        url = urlsplit(request.url)
+        query = parse_qs(url.query, keep_blank_values=True)
+        status, headers, body = self.handler.handle(request.method, url.path, query, dict(request.headers),
+                                                    request.body)
+
+        response = requests.Response()
+        response.status_code = status
+        response.reason = responses.get(status)
+        response.headers = CaseInsensitiveDict(headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.raw = io.BytesIO(body)
+        response.url = request.url
+        response.request = request
+        return response
+
+
+class HttpxTransport(Transport):
+    """
+    A |Transport| that sends requests with ``httpx``, over HTTP/2 where the server negotiates it during the TLS
+    handshake.  Over HTTP/2, all the concurrent requests of a |TruStar| object to a host are multiplexed over a single
+    TLS connection, with compressed headers, instead of each needing its own connection.  The protocol used is stored
+    in the ``http_version`` attribute of each response, e.g. ``'HTTP/2'``.
+
+    Like the rest of the SDK, it is synchronous:  the requests made concurrently from several threads, e.g. by the
+    ``fan_out`` options, share the connection.  There is no ``asyncio`` client; coroutines can look up indicators with
+    |MicroBatcher.load_async|.  Measure it against an HTTP/2 server with |Http2StandInServer|.
+
+    It requires the optional ``http2`` dependencies:  ``pip install trustar[http2]``.  As with the default transport,
+    the ``http_proxy``, ``https_proxy`` and ``verify`` config keys are combined with the environment by ``requests``
+    itself (``HTTPS_PROXY``, ``NO_PROXY``, ``REQUESTS_CA_BUNDLE``, ...), and redirects are followed.
+
+    Example:
+
+    >>> ts = TruStar()
+    >>> ts.set_transport(HttpxTransport())
+    >>> reports = list(ts.get_reports())
+    """
+
+    def __init__(self, http2=True, max_connections=100):
+        """
+        :param boolean http2: whether to use HTTP/2 with servers that support it
+        :param int max_connections: the maximum number of open connections
+        """
+
+        try:
+            import httpx
+        except ImportError:
+            raise ImportError("HttpxTransport requires httpx; install it with: pip install trustar[http2]")
+
+        self._httpx = httpx
+        # only used to read the proxies and CA bundle from the environment, the way requests does
+        self._session = requests.Session()
+        self.http2 = http2
+        self.max_connections = max_connections
+
+        # httpx binds SSL verification and proxies to its clients, so there is one client per combination of them
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def _get_client(self, verify, proxies):
+        key = (verify, tuple(sorted((proxies or {}).items())))
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                httpx = self._httpx
+                limits = httpx.Limits(max_connections=self.max_connections)
+                if isinstance(verify, str):
+                    # a CA bundle, or a directory of CA certificates
+                    verify = ssl.create_default_context(**{'capath' if os.path.isdir(verify) else 'cafile': verify})
+                mounts = dict(('%s://' % scheme, httpx.HTTPTransport(proxy=proxy, verify=verify, http2=self.http2,
+                                                                     limits=limits))
+                              for scheme, proxy in (proxies or {}).items())
+                # the environment has already been applied by send
+                client = self._clients[key] = httpx.Client(http2=self.http2, verify=verify, limits=limits,
+                                                           mounts=mounts or None, trust_env=False)
+            return client
+
+    def _get_timeout(self, timeout):
+        # requests waits forever by default, and takes a (connect, read) tuple
+        if isinstance(timeout, tuple):
+            return self._httpx.Timeout(timeout[1], connect=timeout[0])
+        return self._httpx.Timeout(timeout)
+
+    def send(self, request, verify=True, proxies=None, timeout=None, **kwargs):
+        httpx = self._httpx
+        body = request.body
+        if isinstance(body, str) and not isinstance(body, bytes):
+            body = body.encode('utf-8')
+
+        settings = self._session.merge_environment_settings(request.url, proxies or {}, None, verify, None)
+        # requests only uses the proxy of the scheme of the URL, and falls back to the 'all' proxy
+        scheme = urlsplit(request.url).scheme
+        proxy = settings['proxies'].get(scheme) or settings['proxies'].get('all')
+        proxies = {scheme: proxy} if proxy else None
+
+        try:
+            result = self._get_client(settings['verify'], proxies).request(
+                request.method, request.url, headers=dict(request.headers), content=body,
+                timeout=self._get_timeout(timeout), follow_redirects=kwargs.get('allow_redirects', True))
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(e, request=request)
+        except httpx.TransportError as e:
+            # so that retries, the circuit breaker and the Outbox treat it like any other connection error
+            raise requests.exceptions.ConnectionError(e, request=request)
+
+        response = requests.Response()
+        response.status_code = result.status_code
+        response.reason = result.reason_phrase
+        response.headers = CaseInsensitiveDict(result.headers.items())
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.raw = io.BytesIO(result.content)
+        response.url = str(result.url)
+        response.request = request
+        response.http_version = result.http_version
+        return response
+
+    def close(self):
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients = {}
+        self._session.close()
@@ -0,0 +1,281 @@
+# python 2 backwards compatibility
+from __future__ import print_function
+from builtins import object
+
+# external imports
+import json
+import os
+import threading
+from collections import OrderedDict
+
+# package imports
+from .log import get_logger
+from .utils import get_current_time_millis
+
+logger = get_logger(__name__)
+
+
+class TriageTail(object):
+    """
+    Follows the phishing triage endpoints, handing each new |PhishingSubmission| and |PhishingIndicator| to the
+    registered callbacks as soon as the page containing it has been fetched.
+
+    Each poll reads the time window from the last high-water mark (less ``overlap`` milliseconds, so that late arrivals
+    are not missed) up to the current time.  Items that were already delivered are recognized and skipped:
+    submissions by ``submission_id``, and indicators by their type, value and source.  If a ``state_path`` is given,
+    the high-water mark, the cursor of a window that is still being read, and the keys of recently delivered items are
+    saved to that file after every page, so that a restarted process resumes where the previous one stopped.
+
+    Polling is adaptive: while new items keep arriving, the tail polls every ``min_interval`` seconds; every poll that
+    finds nothing multiplies the interval by ``backoff``, up to ``max_interval`` seconds.
+
+    Example:
+
+    >>> tail = TriageTail(ts, state_path="triage.json", priority_event_score=[3])
+    >>> tail.on_submission(lambda submission: print(submission.submission_id, submission.title))
+    >>> tail.start()
+    """
+
+    SUBMISSIONS = 'submissions'
+    INDICATORS = 'indicators'
+
+    def __init__(self, ts, state_path=None, from_time=None, overlap=60000, min_interval=1, max_interval=60,
+                 backoff=2, max_seen=10000, page_size=None, priority_event_score=None, normalized_indicator_score=None,
+                 enclave_ids=None, status=None):
+        """
+        :param ts: the |TruStar| object used to make the API calls
+        :param str state_path: the path of the JSON file the tail's position is saved to (optional)
+        :param int from_time: where to start reading, in milliseconds since epoch, if there is no saved position
+            (defaults to the current time)
+        :param int overlap: the number of milliseconds by which successive windows overlap
+        :param min_interval: the number of seconds between polls while new items are arriving
+        :param max_interval: the maximum number of seconds between polls while idle
+        :param backoff: the factor the interval is multiplied by after each poll that finds nothing new
+        :param int max_seen: the number of recently delivered item keys to remember, per endpoint
+        :param int page_size: the size of the pages to request (optional)
+        :param list(int) priority_event_score: List of desired scores of phishing submissions on a scale of 0-3
+        :param list(int) normalized_indicator_score: List of desired scores of intel sources on a scale of 0-3
+            (indicators only)
+        :param list(string) enclave_ids: A list of enclave IDs to filter by
+        :param list(string) status: List of statuses to filter by
+        """
+
+        self._ts = ts
+        self.state_path = state_path
+        self.overlap = overlap
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.max_seen = max_seen
+        self.page_size = page_size
+
+        self._filters = {
+            'priority_event_score': priority_event_score,
+            'enclave_ids': enclave_ids,
+            'status': status,
+        }
+        self._normalized_indicator_score = normalized_indicator_score
+
+        self._callbacks = {self.SUBMISSIONS: [], self.INDICATORS: []}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop_event = threading.Event()
+        self.interval = min_interval
+
+        start = from_time if from_time is not None else get_current_time_millis()
+        self._state = {}
+        for endpoint in (self.SUBMISSIONS, self.INDICATORS):
+            self._state[endpoint] = {'high_water': start, 'window': None, 'cursor': None, 'seen': OrderedDict()}
+        self._load()
+
+    #################
+    ### Callbacks ###
+    #################
+
+    def on_submission(self, callback):
+        """
+        Registers a function to be called with each new |PhishingSubmission|.
+
+        :param callback: the function
+        """
+
+        self._callbacks[self.SUBMISSIONS].append(callback)
+
+    def on_indicator(self, callback):
+        """
+        Registers a function to be called with each new |PhishingIndicator|.
+
+        :param callback: the function
+        """
+
+        self._callbacks[self.INDICATORS].append(callback)
+
+    @staticmethod
+    def _get_key(endpoint, item):
+        if endpoint == TriageTail.SUBMISSIONS:
+            return str(item.submission_id)
+        return "%s|%s|%s" % (item.indicator_type, item.value, item.source_key)
+
+    #############
+    ### State ###
+    #############
+
+    def _load(self):
+        if self.state_path is None or not os.path.exists(self.state_path):
+            return
+
+        with open(self.state_path) as f:
+            saved = json.load(f)
+
+        for endpoint, state in saved.items():
+            if endpoint not in self._state:
+                continue
+            self._state[endpoint] = {
+                'high_water': state.get('highWater'),
+                'window': state.get('window'),
+                'cursor': state.get('cursor'),
+                'seen': OrderedDict((key, True) for key in state.get('seen', [])),
+            }
+
+    def _save(self):
+        if self.state_path is None:
+            return
+
+        saved = {}
+        for endpoint, state in self._state.items():
+            saved[endpoint] = {
+                'highWater': state['high_water'],
+                'window': state['window'],
+                'cursor': state['cursor'],
+                'seen': list(state['seen']),
+            }
+
+        # write to a temporary file first, so that a crash never leaves a partially written state file
+        temp_path = self.state_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(saved, f)
+        getattr(os, 'replace', os.rename)(temp_path, self.state_path)
+
+    def get_high_water_mark(self, endpoint=SUBMISSIONS):
+        """
+        :param str endpoint: ``TriageTail.SUBMISSIONS`` or ``TriageTail.INDICATORS``
+        :return: the end of the last window that was read completely, in milliseconds since epoch
+        """
+
+        return self._state[endpoint]['high_water']
+
+    ###############
+    ### Polling ###
+    ###############
+
+    def _get_page(self, endpoint, from_time, to_time, cursor):
+        if endpoint == self.SUBMISSIONS:
+            return self._ts.get_phishing_submissions_page(from_time=from_time, to_time=to_time, cursor=cursor,
+                                                          page_size=self.page_size, **self._filters)
+        return self._ts.get_phishing_indicators_page(from_time=from_time, to_time=to_time, cursor=cursor,
+                                                     page_size=self.page_size,
+                                                     normalized_indicator_score=self._normalized_indicator_score,
+                                                     **self._filters)
+
+    def _poll_endpoint(self, endpoint):
+        state = self._state[endpoint]
+
+        # resume a window that was interrupted part of the way through, or start a new one
+        if state['window'] is None:
+            state['window'] = [max(0, state['high_water'] - self.overlap), get_current_time_millis()]
+            state['cursor'] = None
+        from_time, to_time = state['window']
+
+        new_items = 0
+        while True:
+            page = self._get_page(endpoint, from_time, to_time, state['cursor'])
+
+            for item in page.items:
+                key = self._get_key(endpoint, item)
+                if key in state['seen']:
+                    continue
+                state['seen'][key] = True
+                new_items += 1
+                for callback in self._callbacks[endpoint]:
+                    try:
+                        callback(item)
+                    except Exception as e:
+                        logger.error("Error in phishing triage %s callback: %s" % (endpoint, e))
+
+            while len(state['seen']) > self.max_seen:
+                state['seen'].popitem(last=False)
+
+            cursor = (page.response_metadata or {}).get('nextCursor')
+            if not page.items or not cursor:
+                break
+            state['cursor'] = cursor
+            self._save()
+
+        state['high_water'] = to_time
+        state['window'] = None
+        state['cursor'] = None
+        self._save()
+
+        return new_items
+
+    def poll(self):
+        """
+        Reads every endpoint that has callbacks registered once, up to the current time, and delivers the new items.
+        Also adjusts the interval until the next poll.
+
+        :return: the number of new items delivered
+        """
+
+        with self._lock:
+            new_items = 0
+            for endpoint, callbacks in self._callbacks.items():
+                if callbacks:
+                    new_items += self._poll_endpoint(endpoint)
+
+            if new_items:
+                self.interval = self.min_interval
+            else:
+                self.interval = min(self.interval * self.backoff, self.max_interval)
+
+            return new_items
+
+    def start(self):
+        """
+        Starts a background thread that polls continuously.
+        """
+
+        if self._thread is not None and self._thread.is_alive():
+            # the thread may still be finishing its last poll after a stop that timed out; let it carry on instead
+            self._stop_event.clear()
+            return
+
+        def run():
+            while not self._stop_event.is_set():
+                try:
+                    self.poll()
+                except Exception as e:
+                    logger.error("Error while polling phishing triage: %s" % e)
+                    self.interval = min(self.interval * self.backoff, self.max_interval)
+                self._stop_event.wait(self.interval)
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=run, name="trustar-triage-tail")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """
+        Stops the background thread after the poll in progress, if any, has completed.
+
+        :param timeout: the maximum number of seconds to wait for the thread to stop
+        """
+
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                # keep the thread, and the stop request, so that it exits once done and is not started twice
+                logger.warning("Background thread %s did not stop within %s seconds." % (self._thread.name, timeout))
+                return
+            self._thread = None
+        self._stop_event.clear()
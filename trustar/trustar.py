@@ -7,6 +7,7 @@ from six import string_types
 # external imports
 import configparser
 import os
+import threading
 import yaml
 
 # package imports
@@ -56,7 +57,11 @@ class TruStar(ReportClient, IndicatorClient, TagClient, PhishingTriageClient):
         'retry': True,
         'max_wait_time': 60,
         'http_proxy': None,
-        'https_proxy': None
+        'https_proxy': None,
+        'metrics': False,
+        'circuit_breaker': False,
+        'hedging': False,
+        'coalesce_requests': False
     }
 
     def __init__(self, config_file=None, config_role=None, config=None):
@@ -101,6 +106,14 @@ class TruStar(ReportClient, IndicatorClient, TagClient, PhishingTriageClient):
         +-------------------------+-----------+--------------------------------------------------+--------------------------------------------------------+
         | ``https_proxy``         | No        | ``None``                                         | https proxy being used - http(s)://user:pwd@{ip}:{port}|
         +-------------------------+-----------+--------------------------------------------------+--------------------------------------------------------+
+        | ``metrics``             | No        | ``False``                                        | whether to record request metrics                      |
+        +-------------------------+-----------+--------------------------------------------------+--------------------------------------------------------+
+        | ``circuit_breaker``     | No        | ``False``                                        | whether to fail fast on endpoints that keep failing    |
+        +-------------------------+-----------+--------------------------------------------------+--------------------------------------------------------+
+        | ``hedging``             | No        | ``False``                                        | whether to hedge slow idempotent requests              |
+        +-------------------------+-----------+--------------------------------------------------+--------------------------------------------------------+
+        | ``coalesce_requests``   | No        | ``False``                                        | whether concurrent identical GETs share one request    |
+        +-------------------------+-----------+--------------------------------------------------+--------------------------------------------------------+
 
         (*): It will become mandatory on future versions of trustar, please try and update your code accordingly
 
@@ -150,6 +163,22 @@ class TruStar(ReportClient, IndicatorClient, TagClient, PhishingTriageClient):
         retry = config.get('retry')
         config['retry'] = self.parse_boolean(retry)
 
+        # coerce value to boolean
+        metrics = config.get('metrics')
+        config['metrics'] = self.parse_boolean(metrics)
+
+        # coerce value to boolean
+        circuit_breaker = config.get('circuit_breaker')
+        config['circuit_breaker'] = self.parse_boolean(circuit_breaker)
+
+        # coerce value to boolean
+        hedging = config.get('hedging')
+        config['hedging'] = self.parse_boolean(hedging)
+
+        # coerce value to boolean
+        coalesce_requests = config.get('coalesce_requests')
+        config['coalesce_requests'] = self.parse_boolean(coalesce_requests)
+
         max_wait_time = config.get('max_wait_time')
         if max_wait_time is not None:
             config['max_wait_time'] = int(max_wait_time)
@@ -199,6 +228,11 @@ class TruStar(ReportClient, IndicatorClient, TagClient, PhishingTriageClient):
         # initialize token property
         self.token = None
 
+        # tag indexes cached by get_tag_index, keyed by the enclave IDs they were built from; the lock guards the dict
+        # itself, each index has its own lock
+        self._tag_indexes = {}
+        self._tag_indexes_lock = threading.Lock()
+
 
     @staticmethod
     def parse_boolean(value):
@@ -275,6 +309,74 @@ class TruStar(ReportClient, IndicatorClient, TagClient, PhishingTriageClient):
     def normalize_timestamp(date_time):
         return normalize_timestamp(date_time)
 
+    def _get_fan_out_enclave_ids(self, enclave_ids=None):
+        """
+        Determines the enclaves to query separately when a query is fanned out per enclave.
+
+        :param list(str) enclave_ids: the enclave IDs passed to the query
+        :return: ``enclave_ids`` if given, else the enclave IDs configured on this object, else the IDs of all enclaves
+            the user can read
+        """
+
+        if enclave_ids is None:
+            enclave_ids = self.enclave_ids
+
+        if not enclave_ids:
+            enclave_ids = [enclave.id for enclave in self.get_user_enclaves() if enclave.read]
+
+        return enclave_ids
+
+    def get_metrics(self):
+        """
+        :return: the |MetricsRegistry| of the requests made by this object.  It only records anything if the
+            ``metrics`` config key is ``True``, or once its ``enabled`` attribute is set to ``True``.
+        """
+
+        return self._client.metrics
+
+    def get_circuit_breaker(self):
+        """
+        :return: the |CircuitBreaker| of the requests made by this object, or ``None`` if the ``circuit_breaker`` config
+            key is ``False`` and none was installed with |set_circuit_breaker|
+        """
+
+        return self._client.circuit_breaker
+
+    def set_circuit_breaker(self, circuit_breaker):
+        """
+        Installs a circuit breaker on the requests made by this object.
+
+        :param circuit_breaker: a |CircuitBreaker|, or ``None`` to disable circuit breaking
+        """
+
+        self._client.set_circuit_breaker(circuit_breaker)
+
+    def get_hedger(self):
+        """
+        :return: the |Hedger| of the requests made by this object, or ``None`` if the ``hedging`` config key is
+            ``False`` and none was installed with |set_hedger|
+        """
+
+        return self._client.hedger
+
+    def set_hedger(self, hedger):
+        """
+        Installs a hedger on the idempotent requests made by this object.
+
+        :param hedger: a |Hedger|, or ``None`` to disable hedging
+        """
+
+        self._client.set_hedger(hedger)
+
+    def set_transport(self, transport):
+        """
+        Installs the transport through which this object sends its requests, e.g. an |InMemoryTransport| in tests.
+
+        :param transport: a |Transport|, or ``None`` to restore the default |RequestsTransport|
+        """
+
+        self._client.set_transport(transport)
+
     #####################
     ### API Endpoints ###
     #####################
@@ -3,14 +3,20 @@ from __future__ import print_function
 from six import string_types
 
 # external imports
+import heapq
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
 import dateutil.parser
 import pytz
 from tzlocal import get_localzone
 
+from six.moves import queue
+
 # local imports
 from .log import get_logger
+from .tracing import get_function_name, get_tracer
 
 
 DAY = 24 * 60 * 60 * 1000
@@ -105,21 +111,203 @@ def get_time_based_page_generator(get_page, get_next_to_time, from_time=None, to
     if from_time is None:
         from_time = to_time - DAY
 
-    # stop iteration if get_next_to_time returns either None, or a to_time before from_time
-    while to_time is not None and from_time <= to_time:
-        # query the API for the next page
-        result = get_page(from_time, to_time)
-        # return the page
-        yield result
-        # use the given function to calculate the to_time of the next query
-        new_to_time = get_next_to_time(result, to_time)
-        # to_time should never increase between pages
-        if new_to_time is not None:
-            if new_to_time > to_time:
-                raise Exception("to_time should not increase between page iterations.  "
-                                "This can result in an endless loop.")
-        # set the to_time for the next query
-        to_time = new_to_time
+    tracer = get_tracer()
+    generator_span = tracer.start_span('trustar.pages', function=get_function_name(get_page))
+    pages = 0
+    try:
+        # stop iteration if get_next_to_time returns either None, or a to_time before from_time
+        while to_time is not None and from_time <= to_time:
+            # query the API for the next page
+            with tracer.activate(generator_span), tracer.start_span('trustar.page', from_time=from_time,
+                                                                    to_time=to_time):
+                result = get_page(from_time, to_time)
+            pages += 1
+            generator_span.set_attribute('pages', pages)
+            # return the page
+            yield result
+            # use the given function to calculate the to_time of the next query
+            new_to_time = get_next_to_time(result, to_time)
+            # to_time should never increase between pages
+            if new_to_time is not None:
+                if new_to_time > to_time:
+                    raise Exception("to_time should not increase between page iterations.  "
+                                    "This can result in an endless loop.")
+            # set the to_time for the next query
+            to_time = new_to_time
+    finally:
+        generator_span.finish()
+
+
+def iter_concurrently(func, items, max_workers=8, max_pending=None):
+    """
+    Applies a function to each item of an iterable using a pool of threads, and yields the outcome of each call as soon
+    as it completes.  Items are consumed lazily, so that no more than ``max_pending`` calls are waiting to run or
+    running at any time; this allows very long iterables (or generators) to be processed without holding all of them
+    in memory.  Exceptions raised by ``func`` do not stop the iteration.
+
+    :param func: the function to apply to each item
+    :param items: an iterable of items
+    :param int max_workers: the maximum number of calls running at the same time
+    :param int max_pending: the maximum number of items that have been consumed but not yielded yet (defaults to twice
+        ``max_workers``)
+    :return: a generator of ``(item, result, error)`` tuples, in order of completion; ``error`` is the exception
+        raised by ``func``, or ``None`` if the call succeeded
+    """
+
+    if max_pending is None:
+        max_pending = 2 * max_workers
+
+    items = iter(items)
+    exhausted = False
+    pending = {}
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        while True:
+            # top up the calls in flight from the iterable
+            while not exhausted and len(pending) < max_pending:
+                try:
+                    item = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending[executor.submit(func, item)] = item
+
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                error = future.exception()
+                yield item, future.result() if error is None else None, error
+    finally:
+        # if the caller stopped iterating early, do not start the calls that are still queued
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+class _MergeEntry(object):
+    """
+    An item being merged by |merge_page_generators|, ordered by its key and then by the generator it comes from, so
+    that ``heapq.merge`` needs neither its ``key`` nor its ``reverse`` argument, which Python 2 lacks.
+    """
+
+    __slots__ = ('key', 'source', 'item', 'reverse')
+
+    def __init__(self, key, source, item, reverse):
+        self.key = key
+        self.source = source
+        self.item = item
+        self.reverse = reverse
+
+    def __lt__(self, other):
+        if self.key != other.key:
+            return other.key < self.key if self.reverse else self.key < other.key
+        return self.source < other.source
+
+
+def merge_page_generators(page_generators, key=None, reverse=False, unique_key=None, max_workers=8,
+                          max_buffered_pages=2):
+    """
+    Consumes several page generators concurrently, each in its own thread, and merges their items into a single
+    generator.  At most ``max_workers`` pages are requested at the same time, and each generator is allowed to get at
+    most ``max_buffered_pages`` pages ahead of the consumer.
+
+    :param page_generators: a list of generators of pages (e.g. |NumberedPage| objects)
+    :param key: if given, the items are merged in the order of this function of each item; every generator must
+        already yield its items in this order.  Otherwise, the pages are interleaved:  the first page of each
+        generator, then the second page of each generator, etc.
+    :param reverse: whether the generators yield their items in descending order of ``key``
+    :param unique_key: if given, only the first item with each value of this function is yielded
+    :param int max_workers: the maximum number of pages being requested at the same time
+    :param int max_buffered_pages: the maximum number of pages retrieved by each generator but not yet consumed
+    :return: a generator of items
+    """
+
+    stop = threading.Event()
+    request_slots = threading.Semaphore(max_workers)
+
+    # the pages requested by the threads belong to the span that was current when iteration started
+    tracer = get_tracer()
+    parent_span = tracer.current_span()
+    queues = [queue.Queue(maxsize=max_buffered_pages) for _ in page_generators]
+
+    def put(q, message):
+        # give up if the consumer has stopped iterating, rather than blocking forever on a full queue
+        while not stop.is_set():
+            try:
+                q.put(message, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce(page_generator, q):
+        try:
+            while not stop.is_set():
+                with request_slots, tracer.activate(parent_span):
+                    try:
+                        page = next(page_generator)
+                    except StopIteration:
+                        break
+                if not put(q, ('page', page)):
+                    return
+            put(q, ('done', None))
+        except Exception as e:
+            put(q, ('error', e))
+
+    def consume(q):
+        while True:
+            kind, value = q.get()
+            if kind == 'done':
+                return
+            if kind == 'error':
+                raise value
+            yield value
+
+    def entries_of(source, pages):
+        for page in pages:
+            for item in page.items:
+                yield _MergeEntry(key(item), source, item, reverse)
+
+    def interleave(page_iterators):
+        active = list(page_iterators)
+        while active:
+            for pages in list(active):
+                try:
+                    page = next(pages)
+                except StopIteration:
+                    active.remove(pages)
+                    continue
+                for item in page.items:
+                    yield item
+
+    threads = []
+    for page_generator, q in zip(page_generators, queues):
+        thread = threading.Thread(target=produce, args=(page_generator, q))
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+
+    if key is not None:
+        items = (entry.item for entry in heapq.merge(*[entries_of(source, consume(q))
+                                                       for source, q in enumerate(queues)]))
+    else:
+        items = interleave([consume(q) for q in queues])
+
+    seen = set()
+    try:
+        for item in items:
+            if unique_key is not None:
+                item_key = unique_key(item)
+                if item_key in seen:
+                    continue
+                seen.add(item_key)
+            yield item
+    finally:
+        stop.set()
 
 
 def parse_boolean(value):